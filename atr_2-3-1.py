@@ -1,289 +1,607 @@
+import os
+import threading
 import tkinter as tk
 from tkinter import messagebox, scrolledtext
-import random
+from avalon_rules import RuleSet, STANDARD
+from avalon_journal import Journal, JOURNAL_PATH
+from avalon_archive import ArchiveWriter, ARCHIVE_PATH, connect, game_record, game_count, pass_rates, win_rate
+from avalon_deduce import EvilConstraints, EvilPosterior, best_teams, rank_merlin
+from avalon_engine import AvalonEngine, ROLE_NAMES, GOOD_ROLES, EVIL_ROLES, ASSASSIN, OVER, setup_error
+from avalon_events import LEADER, PROPOSAL, VOTE, REJECTED, APPROVED, AUTO_FAIL, MISSION_RESULT
+from avalon_winprob import WinTable, WINPROB_PATH
+
+class LogPanel:
+    # Append-only view of the metadata log, newest entry on top.
+    # Only entries it has not seen are inserted; at most WINDOW entries are
+    # rendered, older ones are paged in on request.  Filters pick event kinds and read
+    # their entries off the log's per-kind index instead of rescanning it.
+    WINDOW = 200
+    FILTERS = {
+        'All': None,
+        'Proposals': (LEADER, PROPOSAL, VOTE, REJECTED, APPROVED),
+        'Missions': (AUTO_FAIL, MISSION_RESULT),
+    }
+
+    def __init__(self, parent, log):
+        self.log = log  # the engine's EventLog; only ever appended to
+        self.seen = 0
+        self.rendered = []  # text tags of the rendered entries, newest first
+        self.offset = 0     # newest entries skipped while paging back
+        self.filter_var = tk.StringVar(value='All')
+        self.status_var = tk.StringVar()
+
+        bar = tk.Frame(parent)
+        for name in self.FILTERS:
+            tk.Radiobutton(bar, text=name, value=name, variable=self.filter_var, command=self.set_filter).pack(side='left')
+        bar.pack()
+        self.txt = scrolledtext.ScrolledText(parent, width=40, height=10)
+        self.txt.config(state='disabled')
+        self.txt.pack()
+        nav = tk.Frame(parent)
+        tk.Button(nav, text="Newer", command=lambda: self.page(-1)).pack(side='left')
+        tk.Label(nav, textvariable=self.status_var, font=("Arial", 8), fg='gray').pack(side='left', padx=5)
+        tk.Button(nav, text="Older", command=lambda: self.page(1)).pack(side='left')
+        nav.pack()
+
+    def kinds(self):
+        return self.FILTERS[self.filter_var.get()]
+
+    def entries(self):
+        return self.log.ids(self.kinds())
+
+    def refresh(self):
+        # shows the entries appended since the last call that the filter keeps
+        new = self.log.ids(self.kinds(), self.seen)
+        self.seen = len(self.log)
+        if self.offset:
+            # paged back: keep the same entries in view
+            self.offset += len(new)
+        else:
+            self.txt.config(state='normal')
+            for i in new:
+                self._insert(i, '1.0')
+            self._trim()
+            self.txt.config(state='disabled')
+        self._status()
+
+    def set_filter(self):
+        self.offset = 0
+        self.render()
+
+    def rewind(self):
+        # after an undo the log may be shorter: forget the entries that are gone and redraw
+        n = len(self.log)
+        if n >= self.seen:
+            return
+        self.seen = n
+        self.offset = 0
+        self.render()
+
+    def render(self):
+        # redraws the window for the current filter and page
+        self.txt.config(state='normal')
+        for tag in self.rendered:
+            self.txt.delete(*self.txt.tag_ranges(tag)[:2])
+            self.txt.tag_delete(tag)
+        self.rendered = []
+        ids = self.entries()
+        end = len(ids) - self.offset
+        for i in reversed(ids[max(0, end - self.WINDOW):end]):
+            self._insert(i, 'end', newest=False)
+        self.txt.config(state='disabled')
+        self._status()
+
+    def page(self, step):
+        total = self.log.count(self.kinds())
+        self.offset = min(max(0, self.offset + step * self.WINDOW), max(0, total - 1))
+        self.render()
+
+    def _insert(self, i, where, newest=True):
+        tag = f"e{i}"
+        self.txt.insert(where, self.log[i] + "\n", (tag,))
+        if newest:
+            self.rendered.insert(0, tag)
+        else:
+            self.rendered.append(tag)
+
+    def _trim(self):
+        while len(self.rendered) > self.WINDOW:
+            tag = self.rendered.pop()
+            self.txt.delete(*self.txt.tag_ranges(tag)[:2])
+            self.txt.tag_delete(tag)
+
+    def _status(self):
+        total = self.log.count(self.kinds())
+        shown = min(self.WINDOW, total - self.offset)
+        first = self.offset + 1 if total else 0
+        self.status_var.set(f"{first}–{self.offset + shown} of {total}")
+
 
 class AvalonApp:
-    def __init__(self, root):
+    def __init__(self, root, rules=STANDARD, seed=None, journal_path=JOURNAL_PATH, archive_path=ARCHIVE_PATH,
+                 winprob_path=WINPROB_PATH):
         self.root = root
+        self.rules = rules  # evil counts, mission sizes etc.; swap in a RuleSet for house rules
+        self.seed = seed    # fixes the deal and first leader, e.g. to replay a reported game
+        # every action is journaled so a crashed game can be resumed; None switches it off
+        self.journal_path = journal_path
+        self.journal = None
+        self.replaying = False
+        # finished games go to the SQLite archive on a writer thread; None switches it off
+        self.archive_path = archive_path
+        self.archive = None
+        self.archive_conn = None  # read connection for the archive screen
+        # Good's win probability per public state, loaded on a background thread;
+        # None switches it off
+        self.winprob_path = winprob_path
+        self.win_table = None      # (generation, WinTable) from the last load that finished
+        self.win_generation = 0    # bumped per game, so a load that finishes late is dropped
         self.root.title('"The Resistance: Avalon" v2.3.1')
 
         # Player setup
         self.original_players = []
 
-        self.leader_index = None  # index in original_players for rotating leadership
-
         self.entries = []
         self.use_merlin = tk.BooleanVar(value=True)
         self.use_percival = tk.BooleanVar(value=True)
         self.use_oberon = tk.BooleanVar(value=False)
         self.use_mordred = tk.BooleanVar(value=False)
-        self.roles = {}
         self.current_player_index = 0
 
-        # Game state
-        self.round_number = 1
-        self.failed_proposals = 0
-        self.current_leader = None
-        self.selected_team = []
-        self.mission_results = []  # True=pass, False=fail
-        self.metadata = []
-        self.past_missions = []
-        self.winning_team = None  # "Good", "Evil", or None
-
-        # Config
-        self.max_failed_proposals = 5
+        # Game state lives in the headless engine; this class is only the view
+        self.engine = None
+        self.posterior = None  # public "probability Evil" per player, updated after each mission
+        self.constraints = None  # who the mission history proves Evil or Good
+        self.log_panel = None
+
+        # Every screen is built once, stacked in the same grid cell, and raised when needed;
+        # its changing text lives in StringVars so a transition only updates variables.
+        # undo / redo bar under every screen
+        bar = tk.Frame(self.root)
+        tk.Button(bar, text="Undo", command=self.undo).pack(side='left', padx=5)
+        tk.Button(bar, text="Redo", command=self.redo).pack(side='left', padx=5)
+        bar.pack(side='bottom', pady=5)
+        self.root.bind('<Control-z>', lambda e: self.undo())
+        self.root.bind('<Control-y>', lambda e: self.redo())
+
+        self.stack = tk.Frame(self.root)
+        self.stack.pack(fill='both', expand=True)
+        self.stack.grid_rowconfigure(0, weight=1)
+        self.stack.grid_columnconfigure(0, weight=1)
+        self.screens = {}
+        self.current_screen = None
 
         self.setup_ui()
+        self.offer_resume()
+
+    # ---------- JOURNAL ----------
+    def record(self, code, arg=None, undoable=True):
+        # every action comes through here and is journaled; all but the private role
+        # reveal can be undone, so undo never walks back onto a role screen
+        if undoable:
+            self.engine.checkpoint((self.current_screen, self.current_player_index))
+        self.journal_write(code, arg)
+
+    def journal_write(self, code, arg=None):
+        if self.journal and not self.replaying:
+            self.journal.write(code, arg)
+
+    def offer_resume(self):
+        try:
+            found = Journal.resume(self.journal_path) if self.journal_path else None
+        except ValueError:
+            self.discard_journal(None, "The saved game could not be read")
+            return
+        if found is None:
+            return
+        journal, header, records = found
+        try:
+            players = ', '.join(header['players'])
+        except (KeyError, TypeError):
+            self.discard_journal(journal, "The saved game could not be read")
+            return
+        if not messagebox.askyesno("Resume Game", f"An unfinished game with {players} was found.\n"
+                                                  "Resume it where it was left?"):
+            journal.close()
+            return
+        try:
+            self.replay(header, records)
+        except (KeyError, TypeError, ValueError, RuntimeError):
+            self.discard_journal(journal, "The saved game could not be replayed")
+            return
+        self.journal = journal
+
+    def discard_journal(self, journal, why):
+        # a journal that cannot be resumed is deleted, and the app starts over at setup
+        messagebox.showwarning("Resume Game", f"{why}, so it was discarded.")
+        if journal:
+            journal.close()
+        try:
+            os.remove(self.journal_path)
+        except OSError:
+            pass
+        self.replaying = False
+        self.engine = self.posterior = self.constraints = self.log_panel = None
+        self.win_generation += 1
+        # screens built during the replay show the abandoned game
+        for name in [k for k in self.screens if k != 'setup']:
+            self.screens.pop(name).destroy()
+        self.show_screen('setup')
+
+    def replay(self, header, records):
+        # feeds the journaled actions back through the same handlers the buttons call
+        self.rules = RuleSet.from_dict(header['rules'])
+        for var, on in zip((self.use_merlin, self.use_percival, self.use_oberon, self.use_mordred), header['toggles']):
+            var.set(on)
+        self.original_players = header['players']
+        self.engine = AvalonEngine(self.original_players, *header['toggles'], self.rules, seed=header['seed'])
+        self.load_win_table()
+        actions = {
+            'R': self.assign_roles, 'V': self.show_actual_role, 'N': self.next_reveal,
+            'T': self.propose, 'W': self.team_vote,
+            'P': lambda: self.submit_mission_vote('Pass'), 'F': lambda: self.submit_mission_vote('Fail'),
+            'M': self.show_mission_result, 'C': self.continue_game,
+            'L': lambda: self.assassin_phase(True), 'K': self.assassinate,
+            'U': self.undo, 'Y': self.redo,
+        }
+        # a role left on screen is not shown again to whoever restarts the app
+        if records and records[-1][0] == 'V':
+            records = records[:-1]
+        self.replaying = True
+        self.show_confirmation()
+        for code, arg in records:
+            if arg is None:
+                actions[code]()
+            else:
+                actions[code](arg)
+        self.replaying = False
+
+    # ---------- UNDO / REDO ----------
+    def undo(self):
+        # nothing to undo before the game starts or once it is over
+        eng = self.engine
+        if eng is None or not eng.undo_stack or self.current_screen in ('final_stats', 'archive'):
+            return
+        self.journal_write('U')
+        self.render(eng.undo((self.current_screen, self.current_player_index)))
+
+    def redo(self):
+        eng = self.engine
+        if eng is None or not eng.redo_stack or self.current_screen in ('final_stats', 'archive'):
+            return
+        self.journal_write('Y')
+        self.render(eng.redo((self.current_screen, self.current_player_index)))
+
+    def render(self, view):
+        # redraws the saved screen from the restored engine state
+        screen, self.current_player_index = view
+        eng = self.engine
+        self.posterior = EvilPosterior.from_missions(eng.n, eng.evil_count, eng.missions)
+        self.constraints = EvilConstraints.from_missions(eng.n, eng.evil_count, eng.missions)
+        if self.log_panel:
+            self.log_panel.rewind()
+        if screen == 'proposal':
+            self.start_team_proposal()
+        elif screen == 'team_vote':
+            self.show_team_vote()
+        elif screen == 'mission_vote':
+            self.show_next_mission_vote()
+        elif screen == 'mission_result':
+            self.render_mission_result()
+        elif screen == 'assassin':
+            self.assassin_phase()
+        else:
+            self.show_screen(screen)
+
+    # ---------- WIN PROBABILITY ----------
+    def load_win_table(self):
+        # the screens only look values up, once the table is loaded; the file is read on a
+        # background thread.  A table without this setup, for other rules, or no table at all
+        # leaves the chances blank: it is built offline with `python avalon_winprob.py`.
+        # Each load is tagged with the game it was started for, so a slow read for a game
+        # that has since been replaced never shows up in the new one.
+        self.win_generation += 1
+        generation = self.win_generation
+        if not self.winprob_path:
+            return
+        eng = self.engine
+        n, rules, path = eng.n, self.rules, self.winprob_path
+        toggles = (eng.use_merlin, eng.use_percival, eng.use_oberon, eng.use_mordred)
+
+        def work():
+            table = WinTable.load(path)
+            if table is not None and table.rules.to_dict() == rules.to_dict() and table.has(n, toggles):
+                if generation == self.win_generation:
+                    self.win_table = (generation, table)
+
+        threading.Thread(target=work, name="avalon-winprob", daemon=True).start()
+
+    def current_win_table(self):
+        # the loaded table if it belongs to the game on screen, else None; checked again here
+        # because a new game can start between the thread's check and its store
+        loaded = self.win_table
+        return loaded[1] if loaded and loaded[0] == self.win_generation else None
+
+    # ---------- SCREENS ----------
+    def show_screen(self, name):
+        # raises the named screen, building it on first use with build_<name>()
+        f = self.screens.get(name)
+        if f is None:
+            f = tk.Frame(self.stack)
+            f.grid(row=0, column=0, sticky='nsew')
+            getattr(self, 'build_' + name)(f)
+            self.screens[name] = f
+        f.tkraise()
+        self.current_screen = name
+        return f
+
+    def setup_summary(self):
+        n = len(self.original_players)
+        evil = self.rules.evil(n)
+        good = n - evil
+        double_fail = ", ".join(str(r) for r in self.rules.double_fail(n))
+        return (
+            f"Players: {n}" + "     " +
+            f"Good: {good}" + "     " +
+            f"Evil: {evil}" + "     " +
+            f"Merlin/Assassin: {'Yes' if self.use_merlin.get() else 'No'}" + "     " +
+            f"Percival/Morgana: {'Yes' if self.use_percival.get() else 'No'}" + "     " +
+            f"Oberon: {'Yes' if self.use_oberon.get() else 'No'}" + "     " +
+            f"Mordred: {'Yes' if self.use_mordred.get() else 'No'}" + "     " +
+            f"Missions: {self.rules.missions}" + "     " +
+            f"Double-Fail Missions: {double_fail or 'None'}"
+        )
 
     # ---------- SETUP UI ----------
     def setup_ui(self):
-        self.clear_root()
-        tk.Label(self.root, text="Enter 5–10 player names:", font=("Arial",14)).pack(pady=10)
-        frame = tk.Frame(self.root); frame.pack()
-        for i in range(10):
+        self.show_screen('setup')
+
+    def build_setup(self, f):
+        tk.Label(f, text=f"Enter {self.rules.min_players}–{self.rules.max_players} player names:", font=("Arial",14)).pack(pady=10)
+        frame = tk.Frame(f); frame.pack()
+        for i in range(self.rules.max_players):
             e = tk.Entry(frame, width=20)
             e.grid(row=i, column=0, padx=5, pady=2)
             self.entries.append(e)
-        cb = tk.Frame(self.root); cb.pack(pady=10)
+        cb = tk.Frame(f); cb.pack(pady=10)
         tk.Checkbutton(cb, text="Include Merlin & Assassin", variable=self.use_merlin).pack(anchor='w')
         tk.Checkbutton(cb, text="Include Percival & Morgana", variable=self.use_percival).pack(anchor='w')
         tk.Checkbutton(cb, text="Include Oberon", variable=self.use_oberon).pack(anchor='w')
         tk.Checkbutton(cb, text="Include Mordred", variable=self.use_mordred).pack(anchor='w')
-        tk.Button(self.root, text="Start Game", command=self.validate_and_confirm).pack(pady=15)
+        tk.Button(f, text="Start Game", command=self.validate_and_confirm).pack(pady=15)
 
     def validate_and_confirm(self):
         names = [e.get().strip() for e in self.entries if e.get().strip()]
-        if not 5 <= len(names) <= 10:
-            messagebox.showerror("Invalid Player Count","Enter between 5 and 10 names.")
-            return
-
-        has_duplicates = len(names) != len(set(names))
-        if has_duplicates:
-            messagebox.showerror(
-                "Duplicate Names Inputted",
-                "You have entered duplicate names;\n"
-                "please remove any duplicates before proceeding."
-            )
-            return
-
-        if self.use_percival.get() and not self.use_merlin.get():
-            messagebox.showerror("Invalid Roles","Percival/Morgana require Merlin/Assassin.")
-            return
-
-        n = len(names)
-        # how many evils total in this player‑count
-        evil_count = {5:2, 6:2, 7:3, 8:3, 9:3, 10:4}[n]
-
-        # count how many special‐Evil toggles are ON:
-        evil_specials = (
-            self.use_merlin.get()    # implies Assassin
-          + self.use_percival.get()  # implies Morgana
-          + self.use_oberon.get()
-          + self.use_mordred.get()
-        )
-        if evil_specials > evil_count:
-            messagebox.showerror(
-                "Too Many Evil Roles",
-                f"You selected {evil_specials} special Evil roles,\n"
-                f"but only {evil_count} Evil players exist."
-            )
+        toggles = (self.use_merlin.get(), self.use_percival.get(), self.use_oberon.get(), self.use_mordred.get())
+        err = setup_error(names, *toggles, self.rules)
+        if err:
+            messagebox.showerror(*err)
             return
 
         self.original_players = names
-        self.metadata.append(f"Game start: players {', '.join(names)}")
+        self.engine = AvalonEngine(names, *toggles, self.rules, seed=self.seed)
+        self.load_win_table()
+        if self.journal_path:
+            self.journal = Journal.start(self.journal_path, {'players': names, 'toggles': toggles,
+                                                             'rules': self.rules.to_dict(), 'seed': self.engine.seed})
         self.show_confirmation()
 
+    def build_confirmation(self, f):
+        self.confirm_var = tk.StringVar()
+        tk.Label(f, text="Game Setup Summary", font=("Arial",16,"bold")).pack(pady=10)
+        tk.Label(f, textvariable=self.confirm_var, font=("Arial",12), justify="left").pack(padx=20)
+        tk.Button(f, text="Continue", command=self.assign_roles).pack(pady=15)
+
     def show_confirmation(self):
-        self.clear_root()
+        self.show_screen('confirmation')
         n = len(self.original_players)
-        evil = {5:2,6:2,7:3,8:3,9:3,10:4}[n]
-        good = n - evil
-        summary = (
-            f"Players: {n}" + "     " +
-            f"Good: {good}" + "     " +
-            f"Evil: {evil}" + "     " +
-            f"Merlin/Assassin: {'Yes' if self.use_merlin.get() else 'No'}" + "     " +
-            f"Percival/Morgana: {'Yes' if self.use_percival.get() else 'No'}" + "     " +
-            f"Oberon: {'Yes' if self.use_oberon.get() else 'No'}" + "     " +
-            f"Mordred: {'Yes' if self.use_mordred.get() else 'No'}" + "     " +
-            f"Missions: 5" + "     " +
-            f"4th-Mission Double-Fail: {'Yes' if (n >= 7) else 'No'}"
-        )
-        tk.Label(self.root, text="Game Setup Summary", font=("Arial",16,"bold")).pack(pady=10)
-        tk.Label(self.root, text=summary, font=("Arial",12), justify="left").pack(padx=20)
-        tk.Button(self.root, text="Continue", command=self.assign_roles).pack(pady=15)
-        self.metadata.append(f'''
+        double_fail = ", ".join(str(r) for r in self.rules.double_fail(n))
+        self.confirm_var.set(self.setup_summary())
+        self.engine.metadata.append(f'''
 Summary:
 {n} players;
-5 missions; 
+{self.rules.missions} missions; 
 Merlin/Assassin {'enabled' if self.use_merlin.get() else 'disabled'};
 Percival/Morgana {'enabled' if self.use_percival.get() else 'disabled'};
 Oberon {'enabled' if self.use_oberon.get() else 'disabled'};
 Mordred {'enabled' if self.use_mordred.get() else 'disabled'};
-4th-mission double-fail {'enabled' if (n >= 7) else 'disabled'}.
+double-fail missions: {double_fail or 'none'}.
         ''')
 
     # ---------- ROLE ASSIGNMENT ----------
     def assign_roles(self):
-        n = len(self.original_players)
-        evil = {5:2,6:2,7:3,8:3,9:3,10:4}[n]
-        good = n - evil
-        roles = ['Evil']*evil + ['Good']*good
-        specials = []
-        if self.use_merlin.get():
-            roles.remove('Good'); specials.append('Merlin')
-            roles.remove('Evil'); specials.append('Assassin')
-        if self.use_percival.get():
-            roles.remove('Good'); specials.append('Percival')
-            roles.remove('Evil'); specials.append('Morgana')
-        if self.use_oberon.get():
-            roles.remove('Evil')
-            specials.append('Oberon')
-        if self.use_mordred.get():
-            roles.remove('Evil')
-            specials.append('Mordred')
-        deck = roles + specials
-        random.shuffle(deck)
-        # assign in input order
-        self.roles = dict(zip(self.original_players, deck))
-        self.metadata.append("Roles assigned.")
+        # deals the deck and picks the first leader
+        self.record('R', undoable=False)
+        self.engine.assign_roles()
+        self.posterior = EvilPosterior(self.engine.n, self.engine.evil_count)
+        self.constraints = EvilConstraints(self.engine.n, self.engine.evil_count)
         self.current_player_index = 0
-        self.leader_index = random.randint(0, len(self.original_players) - 1)
         self.show_role_privacy()
 
     # ---------- PRIVACY & ROLE REVEAL ----------
+    def build_role_privacy(self, f):
+        self.privacy_var = tk.StringVar()
+        tk.Label(f, textvariable=self.privacy_var, font=("Arial",14)).pack(pady=30)
+        tk.Button(f, text="Show Role", command=self.show_actual_role).pack(pady=15)
+
     def show_role_privacy(self):
-        self.clear_root()
         if self.current_player_index >= len(self.original_players):
             self.start_team_proposal()
             return
+        self.show_screen('role_privacy')
         p = self.original_players[self.current_player_index]
-        tk.Label(self.root, text=f"{p}, pass phone and press to view your role.", font=("Arial",14)).pack(pady=30)
-        tk.Button(self.root, text="Show Role", command=self.show_actual_role).pack(pady=15)
+        self.privacy_var.set(f"{p}, pass phone and press to view your role.")
+
+    def build_actual_role(self, f):
+        self.reveal_vars = {k: tk.StringVar() for k in ('name', 'role', 'team', 'info', 'note')}
+        tk.Label(f, textvariable=self.reveal_vars['name'], font=("Arial",16)).pack(pady=10)
+        self.reveal_role = tk.Label(f, textvariable=self.reveal_vars['role'], font=("Arial",24,"bold"))
+        self.reveal_role.pack(pady=5)
+        self.reveal_team = tk.Label(f, textvariable=self.reveal_vars['team'], font=("Arial",14))
+        self.reveal_team.pack(pady=5)
+        tk.Label(f, textvariable=self.reveal_vars['info'], font=("Arial",12), justify="center").pack(pady=10)
+        tk.Label(f, textvariable=self.reveal_vars['note'], font=("Arial",12,"bold"), fg="grey", justify="center").pack(pady=10)
+        tk.Button(f, text="Continue", command=self.next_reveal).pack(pady=15)
 
     def show_actual_role(self):
-        self.clear_root()
-        p = self.original_players[self.current_player_index]
-        r = self.roles[p]
-        col = 'blue' if r in ['Good','Merlin','Percival'] else 'red'
-        tk.Label(self.root, text=f"{p}, your role:", font=("Arial",16)).pack(pady=10)
-        tk.Label(self.root, text=r, font=("Arial",24,"bold"), fg=col).pack(pady=5)
-        tk.Label(self.root, text=f"Team: {'Good guys' if col=='blue' else 'Evil guys'}", font=("Arial",14), fg=col).pack(pady=5)
+        self.record('V', undoable=False)
+        self.show_screen('actual_role')
+        eng = self.engine
+        i = self.current_player_index
+        p = self.original_players[i]
+        r = ROLE_NAMES[eng.role_of[i]]
+        col = 'blue' if r in GOOD_ROLES else 'red'
+        v = self.reveal_vars
+        v['name'].set(f"{p}, your role:")
+        v['role'].set(r)
+        v['team'].set(f"Team: {'Good guys' if col=='blue' else 'Evil guys'}")
+        self.reveal_role.config(fg=col)
+        self.reveal_team.config(fg=col)
+        # who this player sees was worked out once when the deck was dealt
+        seen = eng.names(eng.knowledge[i])
         info = ""
         note = ""
         if r == 'Merlin':
-            ev = [x for x,y in self.roles.items() if y in ['Evil','Assassin','Morgana','Oberon']]
-            info = "Evil guys:\n" + "\n".join(ev)
-            if self.use_mordred.get():
+            info = "Evil guys:\n" + "\n".join(seen)
+            if eng.use_mordred:
                 note = "\n There is a an unknown Mordred among the Evils.\n"
         elif r == 'Percival':
-            ml = [x for x,y in self.roles.items() if y in ['Merlin','Morgana']]
-            random.shuffle(ml)
-            info = "Merlin is one of:\n" + "\n".join(ml)
-        elif r in ['Evil','Assassin','Morgana','Mordred']:
-            mates = [x for x, y in self.roles.items() if y in ['Evil','Assassin','Morgana','Mordred'] and x!=p]
-            info = "Your fellow Evil:\n" + ", ".join(mates)
-            if self.use_oberon.get():
-                note = "\n There is an unknown Oberon among your fellow Evils.\n"
+            # seat order gives nothing away, both seats were dealt at random
+            info = "Merlin is one of:\n" + "\n".join(seen)
         elif r == 'Oberon':
             info = "You are Evil, but you know no other Evils (they don’t know you)."
+        elif r in EVIL_ROLES:
+            info = "Your fellow Evil:\n" + ", ".join(seen)
+            if eng.use_oberon:
+                note = "\n There is an unknown Oberon among your fellow Evils.\n"
         # (talt2-3) lowk dont think I need this... already defined previously
         '''
         elif r == 'Mordred':
-            mates = [x for x, y in self.roles.items() if y in ['Evil', 'Assassin', 'Morgana', 'Mordred'] and x!=p]
+            mates = [x for x, y in self.engine.roles.items() if y in ['Evil', 'Assassin', 'Morgana', 'Mordred'] and x!=p]
             info = "Your fellow Evil:\n" + ", ".join(mates)
         '''
-        if info:
-            tk.Label(self.root, text=info, font=("Arial",12), justify="center").pack(pady=10)
-            tk.Label(self.root, text=note, font=("Arial",12,"bold"), fg="grey", justify="center").pack(pady=10)
-        tk.Button(self.root, text="Continue", command=self.next_reveal).pack(pady=15)
+        # the previous player's info must never linger on the shared screen
+        v['info'].set(info)
+        v['note'].set(note)
 
     def next_reveal(self):
+        self.record('N', undoable=False)
         self.current_player_index += 1
         self.show_role_privacy()
 
     # ---------- TEAM PROPOSAL & VOTING ----------
+    def build_proposal(self, f):
+        # built once per game: the player list is fixed after setup
+        self.proposal_vars = {k: tk.StringVar() for k in ('info', 'chances', 'rotation', 'past_title', 'past',
+                                                          'odds_title', 'odds', 'sugg_title', 'sugg', 'note',
+                                                          'summary')}
+        v = self.proposal_vars
+        tk.Label(f, text="Team Proposal Phase", font=("Arial",14,"bold")).pack()
+        tk.Label(f, textvariable=v['info'], font=("Arial",10), justify="left").pack(padx=10)
+        tk.Label(f, textvariable=v['chances'], font=("Arial",10,"bold"), fg='blue').pack()
+        # Display leadership rotation with current leader in brackets
+        tk.Label(f, text="Leadership Order:", font=("Arial", 10, "underline")).pack(pady=(5, 0))
+        tk.Label(f, textvariable=v['rotation'], font=("Arial", 10), wraplength=1150, justify="center").pack()
+        tk.Label(f, textvariable=v['past_title'], font=("Arial",12,"underline")).pack(pady=(5,0))
+        tk.Label(f, textvariable=v['past'], font=("Arial",10), justify="left").pack(padx=10)
+
+        # Horizontal layout: team voting on left, metadata on right
+        side_by_side = tk.Frame(f)
+        side_by_side.pack(pady=10)
+
+        # Right panel = metadata
+        right = tk.Frame(side_by_side)
+        tk.Label(right, text="Metadata:", font=("Arial", 12, "underline")).pack(pady=(0, 5))
+        self.log_panel = LogPanel(right, self.engine.metadata)
+        tk.Label(right, textvariable=v['odds_title'], font=("Arial", 10, "underline")).pack(pady=(5, 0))
+        tk.Label(right, textvariable=v['odds'], font=("Arial", 10), justify="left").pack()
+        tk.Label(right, textvariable=v['sugg_title'], font=("Arial", 10, "underline")).pack(pady=(5, 0))
+        tk.Label(right, textvariable=v['sugg'], font=("Arial", 10), justify="left").pack()
+        right.pack(anchor='ne', side='right', padx=10)
+
+        # Left panel = team selection checkboxes
+        left = tk.Frame(side_by_side)
+        tk.Label(left, text="Select Team Members:", font=("Arial", 12, "underline")).pack(pady=(0, 5))
+        self.check_vars = {}
+        for p in self.original_players:
+            cv = tk.BooleanVar()
+            cb = tk.Checkbutton(left, text=p, variable=cv)
+            cb.pack(anchor='w')
+            self.check_vars[p] = cv
+        tk.Button(left, text="Submit Team", command=lambda: self.ask_vote(self.engine.team_size())).pack(pady=10)
+        left.pack(side='left', padx=10)
+
+        # this indicative assignment is kinda risky if I plan in the future to use a similar note feature elsewhere.
+        tk.Label(f, textvariable=v['note'], font=("Arial", 12, "bold"), fg="grey", justify='center').pack(pady=10)
+        # persistent summary
+        tk.Label(f, textvariable=v['summary'], font=("Arial", 8), fg='gray', anchor='center', justify='center').pack(
+            side='bottom', pady=10)
+        v['summary'].set(self.setup_summary())
+
     def start_team_proposal(self):
-        self.clear_root()
-
-        # log round start once
-        if self.failed_proposals == 0 and not any(f"Round {self.round_number} start" in m for m in self.metadata):
-            self.metadata.append(f"Round {self.round_number} start")
-        # Choose leader based on rotating index
-        self.current_leader = self.original_players[self.leader_index]
-        self.leader_index = (self.leader_index + 1) % len(self.original_players)
-        self.metadata.append(f"Leader '{self.current_leader}' selected for Round {self.round_number}")
+        # the engine has already rotated the leader and logged the round start
+        self.show_screen('proposal')
+        eng = self.engine
+        v = self.proposal_vars
         # team size
         n = len(self.original_players)
-        # Prepare mission sizes with asterisk on Mission 4 for 7+ players (new edit, not tested yet)
-        sizes = {5: [2, 3, 2, 3, 3], 6: [2, 3, 4, 3, 4], 7: [2, 3, 3, 4, 4], 8: [3, 4, 4, 5, 5], 9: [3, 4, 4, 5, 5],
-                 10: [3, 4, 4, 5, 5]}
-        msizes = sizes[n][:]  # copy the list
-        if n >= 7:
-            msizes[3] = str(msizes[3]) + "*"  # add asterisk to Mission 4
-
-        ts = sizes[n][self.round_number-1]
+        # Prepare mission sizes with asterisk on double-fail missions (Mission 4 for 7+ players)
+        msizes = list(self.rules.sizes(n))  # copy the sizes
+        for r in self.rules.double_fail(n):
+            msizes[r-1] = str(msizes[r-1]) + "*"  # add asterisk
+
+        ts = eng.team_size()
         # past missions
         past = ""
-        for i,m in enumerate(self.past_missions,1):
+        for i,m in enumerate(eng.past_missions,1):
             res = "Passed" if m['pass'] else 'Failed'
             past += f"M{i}: Leader {m['leader']} team {m['team']} -> {res}"
             '''if not m['pass']:'''
             past += f" (Fails: {m['fails']})"
             past += "\n"
-        # UI
-        tk.Label(self.root, text="Team Proposal Phase", font=("Arial",14,"bold")).pack()
-        info = (
-            f"Round {self.round_number}/5 | Leader: {self.current_leader}\n"
+        v['info'].set(
+            f"Round {eng.round_number}/{self.rules.missions} | Leader: {eng.current_leader}\n"
             f"Team size: {ts}\n"
-            f"Failed proposals: {self.failed_proposals}/{self.max_failed_proposals}\n"
+            f"Failed proposals: {eng.failed_proposals}/{eng.max_failed_proposals}\n"
             # changed from {sizes[n]} to {msizes}
             f"Mission sizes: {msizes}"
         )
-        tk.Label(self.root, text=info, font=("Arial",10), justify="left").pack(padx=10)
-        # Leadership rotation display
-
-        # Display leadership rotation with current leader in brackets
-        tk.Label(self.root, text="Leadership Order:", font=("Arial", 10, "underline")).pack(pady=(5, 0))
-
         rotated = []
         for p in self.original_players:
-            if p == self.current_leader:
+            if p == eng.current_leader:
                 rotated.append(f"[{p}]")  # Highlight current leader
             else:
                 rotated.append(p)
+        v['rotation'].set(" → ".join(rotated))
+        # a lookup only; blank until the background thread has the table
+        table = self.current_win_table()
+        v['chances'].set(f"Good's chances to win from here: {table.p_engine(eng):.0%}" if table else "")
+        v['past_title'].set("Past Missions:" if past else "")
+        v['past'].set(past)
+
+        # only the entries logged since the last proposal are added
+        self.log_panel.refresh()
+
+        # deduction aid from the mission history only, so it is safe to show everyone
+        if self.posterior.observed:
+            pe = self.posterior.p_evil()
+            v['odds_title'].set("Probability Evil:")
+            # what the fails prove outright, whatever the odds say
+            proven = {'Evil': " (certainly Evil)", 'Good': " (certainly Good)", 'unknown': ""}
+            status = self.constraints.status()
+            v['odds'].set("\n".join(f"{p}: {pe[i]:.0%}{proven[status[i]]}" for i, p in enumerate(self.original_players)))
+            # teams most likely to pass on the public evidence
+            picks = best_teams(self.posterior, self.rules, eng.round_number)
+            v['sugg_title'].set("Suggested teams:")
+            v['sugg'].set("\n".join(f"{', '.join(eng.names(t))} ({p:.0%})" for t, p in picks))
+        else:
+            # nothing observed yet, e.g. after undoing the first mission
+            for k in ('odds_title', 'odds', 'sugg_title', 'sugg'):
+                v[k].set("")
 
-        rotation_str = " → ".join(rotated)
-        tk.Label(self.root, text=rotation_str, font=("Arial", 10), wraplength=1150, justify="center").pack()
-
-        if past:
-            tk.Label(self.root, text="Past Missions:", font=("Arial",12,"underline")).pack(pady=(5,0))
-            tk.Label(self.root, text=past, font=("Arial",10), justify="left").pack(padx=10)
-
-        # Horizontal layout: team voting on left, metadata on right
-        side_by_side = tk.Frame(self.root)
-        side_by_side.pack(pady=10)
-
-        # Right panel = metadata
-        right = tk.Frame(side_by_side)
-        tk.Label(right, text="Metadata:", font=("Arial", 12, "underline")).pack(pady=(0, 5))
-        txt = scrolledtext.ScrolledText(right, width=40, height=10)
-        for line in reversed(self.metadata): txt.insert('end', line + "\n")
-        txt.config(state='disabled')
-        txt.pack()
-        right.pack(anchor='ne', side='right', padx=10)
-
-        # Left panel = team selection checkboxes
-        left = tk.Frame(side_by_side)
-        tk.Label(left, text="Select Team Members:", font=("Arial", 12, "underline")).pack(pady=(0, 5))
-        self.check_vars = {}
-        for p in self.original_players:
-            v = tk.BooleanVar()
-            cb = tk.Checkbutton(left, text=p, variable=v)
-            cb.pack(anchor='w')
-            self.check_vars[p] = v
-        tk.Button(left, text="Submit Team", command=lambda: self.ask_vote(ts)).pack(pady=10)
-        left.pack(side='left', padx=10)
+        # last proposal's ticks are cleared for the new leader
+        for cv in self.check_vars.values():
+            cv.set(False)
 
         '''
         tk.Label(scroll_frame, text="Metadata:", font=("Arial",12,"underline")).pack(pady=(5,0))
@@ -298,164 +616,212 @@ Mordred {'enabled' if self.use_mordred.get() else 'disabled'};
         tk.Button(scroll_frame, text="Submit Team", command=lambda: self.ask_vote(ts)).pack(pady=10)
         '''
 
-        # this indicative assignment is kinda risky if I plan in the future to use a similar note feature elsewhere.
         gameplay_note = ""
-        if (self.round_number == 4) and n >= 7:
+        if eng.needs_double_fail():
             gameplay_note = "This round requires 2 fail submissions to count as failed."
-        tk.Label(self.root, text=gameplay_note, font=("Arial", 12, "bold"), fg="grey", justify='center').pack(pady=10)
-
-        # persistent summary
-        evil = {5:2,6:2,7:3,8:3,9:3,10:4}[n]
-        good = n - evil
-
-        summary = (
-            f"Players: {n}" + "     " +
-            f"Good: {good}" + "     " +
-            f"Evil: {evil}" + "     " +
-            f"Merlin/Assassin: {'Yes' if self.use_merlin.get() else 'No'}" + "     " +
-            f"Percival/Morgana: {'Yes' if self.use_percival.get() else 'No'}" + "     " +
-            f"Oberon: {'Yes' if self.use_oberon.get() else 'No'}" + "     " +
-            f"Mordred: {'Yes' if self.use_mordred.get() else 'No'}" + "     " +
-            f"Missions: 5" + "     " +
-            f"4th-Mission Double-Fail: {'Yes' if (n >= 7) else 'No'}"
-        )
-        tk.Label(self.root, text=summary, font=("Arial", 8), fg='gray', anchor='center', justify='center').pack(
-            side='bottom', pady=10)
+        v['note'].set(gameplay_note)
+
+    def build_team_vote(self, f):
+        # one tick per player, so each vote is recorded rather than just the majority
+        self.team_vote_var = tk.StringVar()
+        tk.Label(f, text="Team Vote", font=("Arial",16)).pack(pady=10)
+        tk.Label(f, textvariable=self.team_vote_var, font=("Arial",12)).pack(pady=5)
+        tk.Label(f, text="Tick everyone who approves:", font=("Arial",12)).pack(pady=5)
+        self.approve_vars = []
+        for p in self.original_players:
+            av = tk.BooleanVar()
+            tk.Checkbutton(f, text=p, variable=av).pack(anchor='w', padx=20)
+            self.approve_vars.append(av)
+        tk.Button(f, text="Record Votes", command=self.submit_team_votes).pack(pady=10)
+
+    def show_team_vote(self):
+        self.show_screen('team_vote')
+        eng = self.engine
+        self.team_vote_var.set(f"{eng.current_leader} proposes: {', '.join(eng.selected_team)}")
+        for av in self.approve_vars:
+            av.set(False)
+
+    def submit_team_votes(self):
+        approvals = 0
+        for i, av in enumerate(self.approve_vars):
+            if av.get():
+                approvals |= 1 << i
+        self.team_vote(approvals)
 
     def ask_vote(self, req):
         sel = [p for p,v in self.check_vars.items() if v.get()]
         if len(sel) != req:
             messagebox.showerror("Team Size Incorrect", f"Select exactly {req} players.")
             return
-        self.selected_team = sel
-        self.metadata.append(f"Proposal by {self.current_leader}: {sel}")
-        self.clear_root()
-        tk.Label(self.root, text="Team Vote", font=("Arial",16)).pack(pady=10)
-        tk.Label(self.root, text="Approved by majority?", font=("Arial",12)).pack(pady=5)
-        tk.Button(self.root, text="Approved", command=self.team_approved).pack(pady=5)
-        tk.Button(self.root, text="Rejected", command=self.team_rejected).pack(pady=5)
-
-    def team_rejected(self):
-        self.failed_proposals += 1
-        self.metadata.append(f"Proposal by {self.current_leader} rejected")
-        if self.failed_proposals >= self.max_failed_proposals:
-            self.metadata.append(f"Mission {self.round_number} auto-fail after {self.failed_proposals} rejections")
-            self.past_missions.append({'leader': self.current_leader, 'team': [], 'pass': False, 'fails': 0})
-            self.mission_results.append(False)  # <-- THIS LINE COUNTS THE FAIL!
-            # check end of game
-            gw = self.mission_results.count(True)
-            ew = self.mission_results.count(False)
-            if ew >= 3:
-                self.winning_team = "Evil"
-                self.show_final_stats()
-                return
-            # advance round
-            self.round_number += 1
-            self.failed_proposals = 0
-            self.start_team_proposal()
+        self.propose(self.engine.mask(sel))
+
+    def propose(self, team):
+        self.record('T', team)
+        self.engine.propose_mask(team)
+        self.show_team_vote()
+
+    def team_vote(self, approvals):
+        # approvals: bitmask of the players voting Approve; the engine applies the majority
+        # and counts the auto-fail after too many rejections
+        self.record('W', approvals)
+        if self.engine.vote_team(approvals):
+            self.begin_mission_voting()
+        elif self.engine.phase == OVER:
+            self.show_final_stats()
         else:
             self.start_team_proposal()
 
-    def team_approved(self):
-        self.metadata.append(f"Proposal by {self.current_leader} approved: {self.selected_team}")
-        self.begin_mission_voting()
-
     # ---------- MISSION VOTING ----------
     def begin_mission_voting(self):
-        self.mission_votes = []
-        self.mission_vote_index = 0
         self.show_next_mission_vote()
 
+    def build_mission_vote(self, f):
+        self.mission_vote_var = tk.StringVar()
+        tk.Label(f, textvariable=self.mission_vote_var, font=("Arial",14)).pack(pady=10)
+        tk.Button(f, text="Pass", command=lambda: self.submit_mission_vote('Pass')).pack(pady=5)
+        tk.Button(f, text="Fail", command=lambda: self.submit_mission_vote('Fail')).pack(pady=5)
+
     def show_next_mission_vote(self):
-        self.clear_root()
-        if self.mission_vote_index >= len(self.selected_team):
+        p = self.engine.next_mission_voter()
+        if p is None:
             self.show_mission_reveal_privacy()
             return
-        p = self.selected_team[self.mission_vote_index]
-        is_evil = self.roles[p] in ['Evil','Assassin','Morgana','Oberon','Mordred']
-        tk.Label(self.root, text=f"{p}, your mission vote:", font=("Arial",14)).pack(pady=10)
-        def sub(v):
-            if not is_evil and v=='Fail': v='Pass'
-            self.mission_votes.append(v)
-            self.mission_vote_index += 1
-            self.show_next_mission_vote()
-        tk.Button(self.root, text="Pass", command=lambda: sub('Pass')).pack(pady=5)
-        tk.Button(self.root, text="Fail", command=lambda: sub('Fail')).pack(pady=5)
+        self.show_screen('mission_vote')
+        self.mission_vote_var.set(f"{p}, your mission vote:")
 
-    def show_mission_reveal_privacy(self):
-        self.clear_root()
-        tk.Label(self.root, text="Pass the phone to a neutral player.", font=("Arial", 14)).pack(pady=20)
-        tk.Label(self.root, text="Press the button below to reveal the mission result.", font=("Arial", 12)).pack(
+    def submit_mission_vote(self, v):
+        # good players' Fail is turned into Pass by the engine
+        self.record('F' if v == 'Fail' else 'P')
+        self.engine.submit_mission_vote(v)
+        self.show_next_mission_vote()
+
+    def build_mission_reveal_privacy(self, f):
+        tk.Label(f, text="Pass the phone to a neutral player.", font=("Arial", 14)).pack(pady=20)
+        tk.Label(f, text="Press the button below to reveal the mission result.", font=("Arial", 12)).pack(
             pady=10)
-        tk.Button(self.root, text="Reveal Mission Result", command=self.show_mission_result).pack(pady=20)
+        tk.Button(f, text="Reveal Mission Result", command=self.show_mission_result).pack(pady=20)
+
+    def show_mission_reveal_privacy(self):
+        self.show_screen('mission_reveal_privacy')
+
+    def build_mission_result(self, f):
+        self.result_fails_var = tk.StringVar()
+        self.result_var = tk.StringVar()
+        tk.Label(f, text="Mission Results", font=("Arial",16)).pack(pady=10)
+        tk.Label(f, textvariable=self.result_fails_var, font=("Arial",12)).pack()
+        self.result_label = tk.Label(f, textvariable=self.result_var, font=("Arial",14,"bold"))
+        self.result_label.pack(pady=5)
+        self.result_button = tk.Button(f, command=self.continue_game)
+        self.result_button.pack(pady=10)
 
     def show_mission_result(self):
-        self.clear_root()
-        fails = self.mission_votes.count('Fail')
-        # Apply special rule for Mission 4 (index 3), 7+ players:
-        if len(self.original_players) >= 7 and self.round_number == 4:
-            passed = (fails < 2)
-        else:
-            passed = (fails == 0)
-        self.past_missions.append({'leader': self.current_leader, 'team': self.selected_team, 'pass': passed, 'fails': fails})
-        self.metadata.append(f"Mission {self.round_number} result: {'Passed' if passed else 'Failed'} ({fails}/{len(self.selected_team)})")
-        tk.Label(self.root, text="Mission Results", font=("Arial",16)).pack(pady=10)
-        tk.Label(self.root, text=f"Fails: {fails}", font=("Arial",12)).pack()
-        tk.Label(self.root, text=("PASSED!" if passed else "FAILED!"), font=("Arial",14,"bold"), fg=('green' if passed else 'red')).pack(pady=5)
-        self.mission_results.append(passed)
-        gw = self.mission_results.count(True)
-        ew = self.mission_results.count(False)
+        self.record('M')
+        self.engine.show_mission_result()
+        if self.journal and not self.replaying:
+            self.journal.sync()
+        m = self.engine.missions[-1]
+        # undo now steps back over the whole mission vote, never onto a single card
+        self.engine.fold(m.team.bit_count() + 1)
+        self.posterior.observe(m.team, m.fails)
+        self.constraints.observe(m.team, m.fails)
+        self.render_mission_result()
+
+    def render_mission_result(self):
+        self.show_screen('mission_result')
+        m = self.engine.missions[-1]
+        self.result_fails_var.set(f"Fails: {m.fails}")
+        self.result_var.set("PASSED!" if m.passed else "FAILED!")
+        self.result_label.config(fg=('green' if m.passed else 'red'))
         # if good reached 3, show PASS then assassin
-        if gw >= 3:
-            if self.use_merlin.get():
-                tk.Button(self.root, text="Proceed to Assassin", command=self.assassin_phase).pack(pady=10)
-            else:
-                self.winning_team = "Good"
-                tk.Button(self.root, text="End Game", command=self.show_final_stats).pack(pady=10)
-        elif ew >= 3:
-            tk.Button(self.root, text="End Game", command=self.show_final_stats).pack(pady=10)
+        if self.engine.phase == ASSASSIN:
+            self.result_button.config(text="Proceed to Assassin")
+        elif self.engine.phase == OVER:
+            self.result_button.config(text="End Game")
+        else:
+            self.result_button.config(text="Continue")
+
+    def continue_game(self):
+        self.record('C')
+        if self.engine.phase == ASSASSIN:
+            self.assassin_phase()
+        elif self.engine.phase == OVER:
+            self.show_final_stats()
         else:
-            self.round_number += 1
-            self.failed_proposals = 0
-            tk.Button(self.root, text="Continue", command=self.start_team_proposal).pack(pady=10)
+            self.start_team_proposal()
 
     # ---------- ASSASSIN PHASE ----------
-    def assassin_phase(self):
-        self.clear_root()
-        assassin_name = next((p for p, r in self.roles.items() if r == 'Assassin'), None)
-        tk.Label(self.root, text="Final Mission PASSED!", font=("Arial", 16), fg='blue').pack(pady=10)
+    def build_assassin(self, f):
+        assassin_name = self.engine.assassin()
+        tk.Label(f, text="Final Mission PASSED!", font=("Arial", 16), fg='blue').pack(pady=10)
         if assassin_name:
-            tk.Label(self.root, text=f"Assassin: {assassin_name}, choose a player to kill:", font=("Arial", 12)).pack(
+            tk.Label(f, text=f"Assassin: {assassin_name}, choose a player to kill:", font=("Arial", 12)).pack(
                 pady=5)
         else:
-            tk.Label(self.root, text="Choose a player to assassinate:", font=("Arial", 12)).pack(pady=5)
-
+            tk.Label(f, text="Choose a player to assassinate:", font=("Arial", 12)).pack(pady=5)
+        self.kill_frame = tk.Frame(f)
+        self.kill_frame.pack()
         self.kill_vars = {}
-        for p in self.original_players:
-            if self.roles[p] in ['Good', 'Merlin', 'Percival']:
-                v = tk.BooleanVar()
-                cb = tk.Checkbutton(self.root, text=p, variable=v)
+        self.kill_checks = {}
+        for p in self.engine.assassin_targets():
+            v = tk.BooleanVar()
+            cb = tk.Checkbutton(self.kill_frame, text=p, variable=v)
+            cb.pack(anchor='w')
+            self.kill_vars[p] = v
+            self.kill_checks[p] = cb
+        self.analysis_button = tk.Button(f, text="Show Merlin Likelihoods", command=lambda: self.assassin_phase(True))
+        self.analysis_button.pack(pady=5)
+        self.assassinate_button = tk.Button(f, text="Assassinate", command=self.resolve_assassin)
+        self.assassinate_button.pack(pady=10)
+
+    def assassin_phase(self, analysis=False):
+        # analysis mode lists the Good players by how likely the history makes them Merlin;
+        # otherwise the screen is laid out afresh, which also undoes an analysis
+        self.show_screen('assassin')
+        for cb in self.kill_checks.values():
+            cb.pack_forget()
+        if analysis:
+            self.record('L')
+            for i, pr in rank_merlin(self.engine):
+                p = self.original_players[i]
+                self.kill_checks[p].config(text=f"{p} ({pr:.0%} Merlin)")
+                self.kill_checks[p].pack(anchor='w')
+            self.analysis_button.pack_forget()
+        else:
+            for p, cb in self.kill_checks.items():
+                cb.config(text=p)
                 cb.pack(anchor='w')
-                self.kill_vars[p] = v
-        tk.Button(self.root, text="Assassinate", command=self.resolve_assassin).pack(pady=10)
+            self.analysis_button.pack(pady=5, before=self.assassinate_button)
 
     def resolve_assassin(self):
         chosen = [p for p,v in self.kill_vars.items() if v.get()]
         if len(chosen) != 1:
             messagebox.showerror("Select One","Select exactly one to assassinate.")
             return
-        target = chosen[0]
-        if self.roles.get(target) == 'Merlin':
-            self.winning_team = "Evil"
+        self.assassinate(self.engine.index[chosen[0]])
+
+    def assassinate(self, i):
+        self.record('K', i)
+        target = self.original_players[i]
+        if self.engine.assassinate(i):
             messagebox.showinfo("Result", f"{target} was Merlin. Evil wins!")
         else:
-            self.winning_team = "Good"
             messagebox.showinfo("Result", f"{target} was not Merlin. Good wins!")
         self.show_final_stats()
 
     # ---------- FINAL STATS ----------
     def show_final_stats(self):
-        self.clear_root()
+        self.show_screen('final_stats')
+        # a finished game is not offered for resuming
+        if self.journal:
+            self.journal.finish()
+            self.journal = None
+        if self.archive_path:
+            if self.archive is None:
+                self.archive = ArchiveWriter(self.archive_path)
+            self.archive.put(game_record(self.engine))
+
+    def build_final_stats(self, f):
+        # shown once per game, so it is simply built from the finished engine
         # Determine who won (archival text- since replaced)
         '''gw = self.mission_results.count(True)
         ew = self.mission_results.count(False)
@@ -469,38 +835,102 @@ Mordred {'enabled' if self.use_mordred.get() else 'disabled'};
         else:
             win_text = "Game did not reach completion."
         '''
-        # New logic, uses self.winning_team
-        if self.winning_team == "Good":
+        # New logic, uses the engine's winning_team
+        if self.engine.winning_team == "Good":
             win_text = "Good Wins!"
-        elif self.winning_team == "Evil":
+        elif self.engine.winning_team == "Evil":
             win_text = "Evil Wins!"
         else:
             win_text = "Evil Wins!"
-        tk.Label(self.root, text=win_text, font=("Arial", 14, "bold"), fg="blue" if 'Good' in win_text else "red").pack(
+        tk.Label(f, text=win_text, font=("Arial", 14, "bold"), fg="blue" if 'Good' in win_text else "red").pack(
             pady=5)
 
-        tk.Label(self.root, text="Game Over - Final Stats", font=("Arial",16,"bold")).pack(pady=10)
+        tk.Label(f, text="Game Over - Final Stats", font=("Arial",16,"bold")).pack(pady=10)
         # Roles reveal
-        tk.Label(self.root, text="Role Reveals:", font=("Arial",14)).pack(pady=5)
+        tk.Label(f, text="Role Reveals:", font=("Arial",14)).pack(pady=5)
         for p in self.original_players:
-            tk.Label(self.root, text=f"{p}: {self.roles[p]}").pack()
+            tk.Label(f, text=f"{p}: {self.engine.roles[p]}").pack()
         # Mission summary
-        tk.Label(self.root, text="\nMission Summary:", font=("Arial",14)).pack(pady=5)
-        for i,m in enumerate(self.past_missions,1):
+        tk.Label(f, text="\nMission Summary:", font=("Arial",14)).pack(pady=5)
+        for i,m in enumerate(self.engine.past_missions,1):
             res = "Passed" if m['pass'] else 'Failed'
-            tk.Label(self.root, text=f"Mission {i} (Leader: {m['leader']}) {res} ({m['fails']} fails)").pack()
-        tk.Button(self.root, text="Close", command=self.root.quit).pack(pady=15)
-        tk.Label(self.root, text="Program developed by Adway Patel", font=("Arial", 8), fg='gray', anchor='center',
+            tk.Label(f, text=f"Mission {i} (Leader: {m['leader']}) {res} ({m['fails']} fails)").pack()
+        table = self.current_win_table()
+        if table:
+            self.draw_win_history(f, table.history(self.engine))
+        buttons = tk.Frame(f)
+        buttons.pack(pady=15)
+        if self.archive_path:
+            tk.Button(buttons, text="Game Archive", command=self.show_archive).pack(side='left', padx=5)
+        tk.Button(buttons, text="Close", command=self.root.quit).pack(side='left', padx=5)
+        # only shown once the game is over; the seed gives away the deal
+        tk.Label(f, text=f"Game seed: {self.engine.seed}", font=("Arial", 8), fg='gray').pack(side='bottom')
+        tk.Label(f, text="Program developed by Adway Patel", font=("Arial", 8), fg='gray', anchor='center',
                  justify='center').pack(side='bottom', pady=10)
 
-    def clear_root(self):
-        for w in self.root.winfo_children(): w.destroy()
+
+    def draw_win_history(self, f, history, width=360, height=90, pad=8):
+        # Good's chances before each proposal, as a line over a dashed 50% mark
+        tk.Label(f, text="\nGood's Win Probability Over Time:", font=("Arial",14)).pack(pady=5)
+        c = tk.Canvas(f, width=width, height=height, bg='white')
+        c.pack()
+        y = lambda p: pad + (1 - p) * (height - 2*pad)
+        c.create_line(pad, y(0.5), width - pad, y(0.5), fill='gray', dash=(3, 3))
+        step = (width - 2*pad) / max(1, len(history) - 1)
+        points = [xy for i, p in enumerate(history) for xy in (pad + i*step, y(p))]
+        if len(points) >= 4:
+            c.create_line(*points, fill='blue', width=2)
+        for i, p in enumerate(history):
+            c.create_oval(pad + i*step - 2, y(p) - 2, pad + i*step + 2, y(p) + 2, fill='blue', outline='')
+
+    # ---------- GAME ARCHIVE ----------
+    def build_archive(self, f):
+        tk.Label(f, text="Game Archive", font=("Arial",16,"bold")).pack(pady=10)
+        row = tk.Frame(f)
+        row.pack(pady=5)
+        tk.Label(row, text="Player:").pack(side='left')
+        self.archive_player = tk.Entry(row, width=15)
+        self.archive_player.pack(side='left', padx=5)
+        tk.Label(row, text="Role:").pack(side='left')
+        self.archive_role = tk.StringVar(value='Any')
+        tk.OptionMenu(row, self.archive_role, 'Any', *ROLE_NAMES).pack(side='left', padx=5)
+        tk.Button(row, text="Look Up", command=self.archive_lookup).pack(side='left', padx=5)
+        self.archive_vars = {k: tk.StringVar() for k in ('count', 'seats', 'missions')}
+        tk.Label(f, textvariable=self.archive_vars['count'], font=("Arial", 10), fg='gray').pack()
+        tk.Label(f, textvariable=self.archive_vars['seats'], font=("Arial", 12)).pack(pady=10)
+        tk.Label(f, textvariable=self.archive_vars['missions'], font=("Arial", 10), justify="left").pack(pady=5)
+        tk.Button(f, text="Back", command=lambda: self.show_screen('final_stats')).pack(pady=15)
+
+    def show_archive(self):
+        self.show_screen('archive')
+        self.archive_lookup()
+
+    def archive_lookup(self):
+        # each figure is one indexed query; the writer thread may still be saving this game
+        if self.archive_conn is None:
+            self.archive_conn = connect(self.archive_path)
+        conn = self.archive_conn
+        v = self.archive_vars
+        player = self.archive_player.get().strip() or None
+        role = self.archive_role.get()
+        role = None if role == 'Any' else role
+        games, wins = win_rate(conn, player, role)
+        who = (player or "Everyone") + (f" as {role}" if role else "")
+        v['seats'].set(f"{who}: {wins} wins in {games} games ({wins / games:.0%})" if games else f"{who}: no games yet")
+        n = self.engine.n
+        rows = pass_rates(conn, n)
+        v['missions'].set(f"Mission pass rates, {n} players:\n" +
+                          "\n".join(f"Round {r}, team of {k}: {p / m:.0%} of {m}" for r, k, m, p in rows))
+        v['count'].set(f"{game_count(conn)} games archived")
 
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = AvalonApp(root)
     root.mainloop()
+    # let the writer thread finish saving the last game
+    if app.archive:
+        app.archive.close()
 
 # optimal double-fail requirement indications & gameplay indications developed, to a playable degree.
 # duplicate name failsafe included
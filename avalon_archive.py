@@ -0,0 +1,208 @@
+import argparse
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from avalon_rules import STANDARD
+from avalon_engine import AvalonEngine, ROLE_NAMES, derive_seed, setup_error
+from avalon_events import EventLog
+from avalon_players import PLAYERS, play_game
+from avalon_sim import toggle_label
+
+# Local SQLite archive of finished games.
+# One row per game, seat, proposal and mission, and one per event of the game's log
+# when it was logged (load_log() rebuilds the EventLog).  The indexes cover the
+# questions the stats screen asks ("win rate of Alice as Merlin", "pass rate of
+# 3-player round-1 teams"), so each one is an index range scan.  Rows are built from
+# the finished engine on the caller's thread and written by an ArchiveWriter thread
+# with its own connection, so saving a game never stalls the UI.
+
+ARCHIVE_PATH = "avalon_games.db"
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY, played_at REAL, seed TEXT, players INTEGER, config TEXT, rules TEXT,
+    winner TEXT, assassinated INTEGER);
+CREATE TABLE IF NOT EXISTS seats (
+    game INTEGER, seat INTEGER, player TEXT, role TEXT, evil INTEGER, won INTEGER);
+CREATE TABLE IF NOT EXISTS proposals (
+    game INTEGER, round INTEGER, leader INTEGER, team INTEGER, size INTEGER, approved INTEGER, votes INTEGER);
+CREATE TABLE IF NOT EXISTS missions (
+    game INTEGER, players INTEGER, round INTEGER, leader INTEGER, team INTEGER, size INTEGER, fails INTEGER,
+    passed INTEGER);
+CREATE TABLE IF NOT EXISTS events (
+    game INTEGER, seq INTEGER, kind INTEGER, round INTEGER, leader INTEGER, team INTEGER, value, flag INTEGER);
+CREATE INDEX IF NOT EXISTS games_config ON games (players, config, rules, winner);
+CREATE INDEX IF NOT EXISTS seats_player ON seats (player, role, won);
+CREATE INDEX IF NOT EXISTS seats_role ON seats (role, won);
+CREATE INDEX IF NOT EXISTS seats_game ON seats (game);
+CREATE INDEX IF NOT EXISTS proposals_game ON proposals (game);
+CREATE INDEX IF NOT EXISTS missions_game ON missions (game);
+CREATE INDEX IF NOT EXISTS missions_round ON missions (round, size, passed);
+CREATE INDEX IF NOT EXISTS missions_config ON missions (players, round, size, passed);
+CREATE INDEX IF NOT EXISTS events_game ON events (game, seq);
+CREATE INDEX IF NOT EXISTS events_kind ON events (kind, round);
+"""
+
+
+def connect(path=ARCHIVE_PATH):
+    conn = sqlite3.connect(path)
+    # WAL lets the stats screen read while the writer thread commits
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def game_record(eng):
+    # plain rows for one finished game; the engine is not touched after this
+    toggles = (eng.use_merlin, eng.use_percival, eng.use_oberon, eng.use_mordred)
+    # seeds are 64-bit unsigned, wider than an SQLite integer
+    game = (time.time(), str(eng.seed), eng.n, toggle_label(toggles), eng.rules.name, eng.winning_team, eng.assassinated)
+    seats = [(i, p, ROLE_NAMES[r], int(eng.evil_mask >> i & 1),
+              int((eng.winning_team == "Evil") == bool(eng.evil_mask >> i & 1)))
+             for i, (p, r) in enumerate(zip(eng.original_players, eng.role_of))]
+    proposals = [(p.round_number, p.leader, p.team, p.team.bit_count(), p.approved, p.votes) for p in eng.proposals]
+    missions = [(eng.n, r, m.leader, m.team, m.team.bit_count(), m.fails, int(m.passed))
+                for r, m in enumerate(eng.missions, 1)]
+    # empty for engines run with log=False, e.g. simulated games
+    events = [(seq,) + row for seq, row in enumerate(eng.metadata.rows())]
+    return game, seats, proposals, missions, events
+
+
+def save(conn, records):
+    # writes finished games in one transaction
+    with conn:
+        for game, seats, proposals, missions, events in records:
+            gid = conn.execute("INSERT INTO games (played_at, seed, players, config, rules, winner, assassinated) "
+                               "VALUES (?, ?, ?, ?, ?, ?, ?)", game).lastrowid
+            conn.executemany("INSERT INTO seats VALUES (?, ?, ?, ?, ?, ?)", [(gid,) + s for s in seats])
+            conn.executemany("INSERT INTO proposals VALUES (?, ?, ?, ?, ?, ?, ?)", [(gid,) + p for p in proposals])
+            conn.executemany("INSERT INTO missions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(gid,) + m for m in missions])
+            conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(gid,) + e for e in events])
+
+
+class ArchiveWriter:
+    # background thread that owns the write connection; put() only queues the rows
+    def __init__(self, path=ARCHIVE_PATH):
+        self.path = path
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="avalon-archive", daemon=True)
+        self.thread.start()
+
+    def put(self, record):
+        self.queue.put(record)
+
+    def close(self):
+        # waits for queued games to be written
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        conn = connect(self.path)
+        done = False
+        while not done:
+            batch = [self.queue.get()]
+            # whatever else is already waiting goes into the same transaction
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                done = True
+                batch = [r for r in batch if r is not None]
+            if batch:
+                # a failed write loses this batch, not the thread and every game after it
+                try:
+                    save(conn, batch)
+                except Exception:
+                    log.exception("Could not archive %d game(s)", len(batch))
+        conn.close()
+
+
+# ---------- QUERIES ----------
+def win_rate(conn, player=None, role=None, players=None, config=None):
+    # (games, wins) for seats matching the filters; None means any
+    where, args = [], []
+    for col, x in (("s.player", player), ("s.role", role), ("g.players", players), ("g.config", config)):
+        if x is not None:
+            where.append(f"{col} = ?")
+            args.append(x)
+    join = " JOIN games g ON g.id = s.game" if players is not None or config is not None else ""
+    sql = f"SELECT count(*), coalesce(sum(s.won), 0) FROM seats s{join}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return conn.execute(sql, args).fetchone()
+
+
+def pass_rate(conn, round_number=None, size=None, players=None):
+    # (missions, passed) for played missions matching the filters; auto-fails have no team
+    where, args = ["size > 0"], []
+    for col, x in (("players", players), ("round", round_number), ("size", size)):
+        if x is not None:
+            where.append(f"{col} = ?")
+            args.append(x)
+    sql = "SELECT count(*), coalesce(sum(passed), 0) FROM missions WHERE " + " AND ".join(where)
+    return conn.execute(sql, args).fetchone()
+
+
+def pass_rates(conn, players):
+    # [(round, team size, missions, passed)] for one player count
+    return conn.execute("SELECT round, size, count(*), sum(passed) FROM missions WHERE players = ? AND size > 0 "
+                        "GROUP BY round, size ORDER BY round, size", (players,)).fetchall()
+
+
+def load_log(conn, game):
+    # the game's EventLog as it was when archived; empty if the game was not logged
+    players = [p for p, in conn.execute("SELECT player FROM seats WHERE game = ? ORDER BY seat", (game,))]
+    rows = conn.execute("SELECT kind, round, leader, team, value, flag FROM events WHERE game = ? ORDER BY seq",
+                        (game,))
+    return EventLog.from_rows(players, ((k, r, ld, t, v, bool(f)) for k, r, ld, t, v, f in rows))
+
+
+def game_count(conn):
+    return conn.execute("SELECT count(*) FROM games").fetchone()[0]
+
+
+def fill(path, games, policy='random', counts=None, toggles=(True, True, False, False), rules=STANDARD, seed=0):
+    # archives simulated games, e.g. to try the stats on a large archive
+    counts = [n for n in (counts or rules.player_counts) if setup_error([f"P{i}" for i in range(n)], *toggles, rules) is None]
+    writer = ArchiveWriter(path)
+    for g in range(games):
+        game_seed = derive_seed(seed, g)
+        n = counts[game_seed % len(counts)]
+        eng = AvalonEngine([f"P{i}" for i in range(n)], *toggles, rules, log=False, seed=game_seed)
+        play_game(eng, [PLAYERS[policy]() for _ in range(n)])
+        writer.put(game_record(eng))
+    writer.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Query or fill the local Avalon game archive")
+    ap.add_argument("--db", default=ARCHIVE_PATH)
+    ap.add_argument("--fill", type=int, default=0, help="archive this many simulated games first")
+    ap.add_argument("--policy", default="random", choices=sorted(PLAYERS))
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--player", default=None)
+    ap.add_argument("--role", default=None, choices=ROLE_NAMES)
+    ap.add_argument("--players", type=int, default=None, help="player count filter")
+    ap.add_argument("--round", type=int, default=None)
+    ap.add_argument("--size", type=int, default=None, help="team size filter")
+    args = ap.parse_args()
+    if args.fill:
+        start = time.perf_counter()
+        fill(args.db, args.fill, args.policy, seed=args.seed)
+        print(f"Archived {args.fill} games in {time.perf_counter() - start:.2f}s")
+    conn = connect(args.db)
+    start = time.perf_counter()
+    g, w = win_rate(conn, args.player, args.role, args.players)
+    m, p = pass_rate(conn, args.round, args.size, args.players)
+    took = time.perf_counter() - start
+    print(f"{game_count(conn)} games archived")
+    print(f"Seats: {w} wins in {g} ({w / g:.1%})" if g else "Seats: none match")
+    print(f"Missions: {p} passed of {m} ({p / m:.1%})" if m else "Missions: none match")
+    print(f"Queries took {took * 1000:.1f}ms")
@@ -0,0 +1,275 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from avalon_server import GameServer, PORT, encode
+
+# Devices for the networked table (avalon_server.py).
+# Client is one connection.  It keeps the last public state and applies the server's
+# deltas to it, so recv() always hands out whole states; after a reconnect it catches up
+# from the seq of the state it kept, presenting the seat token the server gave it.
+# Bot plays a seat on its own, so a table of Bots over the loopback interface stands in
+# for real devices in tests (play_local).  console() is a plain text client for a person
+# (spectate() just watches):
+#   start [nopercival] [oberon] [mordred] | propose A B C | approve | reject |
+#   pass | fail | kill NAME | quit
+
+
+class Client:
+    def __init__(self, reader, writer, state=None, token=None):
+        self.reader = reader
+        self.writer = writer
+        self.state = state  # the table's public state as of state['seq']
+        self.token = token  # reclaims the seat after a dropped connection
+        self.held = None    # a message read while joining, handed out by the next recv()
+
+    @classmethod
+    async def connect(cls, host, port, name, room='', state=None, token=None):
+        # joins `room`, following the server to the shard that hosts it.
+        # state / token: what an earlier connection had seen and its seat token, to rejoin.
+        hello = {'op': 'join', 'name': name, 'room': room}
+        if token is not None:
+            hello['token'] = token
+        return await cls.open(host, port, state, **hello)
+
+    @classmethod
+    async def watch(cls, host, port, room='', state=None):
+        # a spectator's connection
+        return await cls.open(host, port, state, op='watch', room=room)
+
+    @classmethod
+    async def open(cls, host, port, state, **hello):
+        if state is not None:
+            hello['seq'] = state['seq']
+        while True:
+            reader, writer = await asyncio.open_connection(host, port)
+            client = cls(reader, writer, state, hello.get('token'))
+            await client.send(**hello)
+            client.held = await client.recv()
+            if client.held is None or client.held['type'] != 'redirect':
+                return client
+            await client.close()
+            port = client.held['port']
+
+    async def send(self, **msg):
+        self.writer.write(encode(msg))
+        await self.writer.drain()
+
+    async def recv(self):
+        # next message from the table, or None once it hangs up; a delta comes out as the whole state
+        if self.held is not None:
+            msg, self.held = self.held, None
+            return msg
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return None
+            msg = json.loads(line)
+            kind = msg['type']
+            if kind == 'seat':
+                self.token = msg['token']
+                continue
+            if kind == 'state':
+                self.state = msg
+                return msg
+            if kind != 'delta':
+                return msg
+            s = self.state
+            if s is None or msg['seq'] != s['seq'] + 1:
+                # missed some; the server resends from what we have
+                await self.send(op='sync', seq=None if s is None else s['seq'])
+                continue
+            for k, v in msg.items():
+                if k in ('log', 'missions'):
+                    s[k].extend(v)
+                elif k != 'type':
+                    s[k] = v
+            return s
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class Bot:
+    # random legal moves; Evil fails every mission it is on, and the assassin picks a seat it does not know is Evil
+    def __init__(self, name, seed=None):
+        self.name = name
+        self.rng = random.Random(seed)
+        self.role = None
+        self.acted = None    # (round, rejections, phase) of the last move, so each is made once
+        self.sent = {}       # message id -> (op, send time) until the server acks it
+        self.latencies = []  # (op, seconds from send to ack)
+
+    async def play(self, host, port, room='', start=None, games=1):
+        # start: {'count': players to wait for, toggles / seed...}; the bot given it starts each game.
+        # Returns the final state of the last game.
+        client = await Client.connect(host, port, self.name, room)
+        try:
+            while True:
+                msg = await client.recv()
+                if msg is None:
+                    return None
+                kind = msg['type']
+                if kind == 'lobby' and start and len(msg['players']) == start['count']:
+                    await self.send(client, op='start', **{k: v for k, v in start.items() if k != 'count'})
+                elif kind == 'role':
+                    self.role = msg
+                    self.acted = None
+                elif kind == 'state':
+                    if msg['phase'] == 'over':
+                        games -= 1
+                        if not games:
+                            return msg
+                        if start:
+                            await self.send(client, op='start', **{k: v for k, v in start.items()
+                                                                   if k not in ('count', 'seed')})
+                        continue
+                    move = self.move(msg)
+                    if move:
+                        await self.send(client, **move)
+                elif kind == 'ack':
+                    op, sent = self.sent.pop(msg['id'])
+                    self.latencies.append((op, time.perf_counter() - sent))
+                elif kind == 'error':
+                    raise RuntimeError(f"{self.name}: {msg['message']}")
+        finally:
+            await client.close()
+
+    async def send(self, client, **msg):
+        msg['id'] = len(self.latencies) + len(self.sent)
+        self.sent[msg['id']] = (msg['op'], time.perf_counter())
+        await client.send(**msg)
+
+    def move(self, s):
+        if self.name not in s['waiting']:
+            return None
+        key = (s['round'], s['failed_proposals'], s['phase'])
+        if key == self.acted:
+            return None
+        self.acted = key
+        rng = self.rng
+        phase = s['phase']
+        if phase == 'proposal':
+            return {'op': 'propose', 'team': rng.sample(s['players'], s['team_size'])}
+        if phase == 'team_vote':
+            last = s['failed_proposals'] + 1 >= s['max_failed_proposals']
+            return {'op': 'vote', 'approve': last or rng.random() < 0.6}
+        if phase == 'mission':
+            return {'op': 'mission', 'vote': 'Fail' if self.role['evil'] else 'Pass'}
+        known = set(self.role['sees']) | {self.name}
+        return {'op': 'assassinate', 'target': rng.choice([p for p in s['players'] if p not in known])}
+
+
+async def play_local(n=7, seed=None, host='127.0.0.1', **toggles):
+    # one whole game of Bots against a table on the loopback interface; returns the final state
+    server = await GameServer(host, 0, client_seeds=True).start()
+    bots = [Bot(f"Bot{i}", None if seed is None else seed + i) for i in range(n)]
+    start = dict(toggles, count=n, seed=seed)
+    try:
+        finals = await asyncio.gather(*(b.play(host, server.port, start=start if i == 0 else None)
+                                        for i, b in enumerate(bots)))
+    finally:
+        await server.close()
+    return finals[0]
+
+
+# ---------- CONSOLE ----------
+def render(msg, shown):
+    # text for one message; shown[0] is how many log lines were printed already
+    kind = msg['type']
+    if kind == 'lobby':
+        return "Players: " + ", ".join(msg['players'])
+    if kind == 'error':
+        return "! " + msg['message']
+    if kind == 'role':
+        text = f"You are {msg['role']} ({'Evil' if msg['evil'] else 'Good'})."
+        if msg['sees']:
+            text += f" {msg['sees_as']}: {', '.join(msg['sees'])}"
+        return text
+    lines = msg['log'][shown[0]:]
+    shown[0] = len(msg['log'])
+    if msg['phase'] == 'over':
+        lines.append(f"{msg['winner']} wins!")
+        lines += [f"  {p}: {r}" for p, r in msg['roles'].items()]
+    else:
+        lines.append(f"Round {msg['round']} | Leader {msg['leader']} | team of {msg['team_size']}"
+                     f"{' (2 fails needed)' if msg['double_fail'] else ''} | passed {msg['good_wins']}, "
+                     f"failed {msg['evil_wins']} | waiting for {', '.join(msg['waiting'])}"
+                     f"{'' if msg['deadline'] is None else ' (%gs left)' % msg['deadline']}"
+                     f"{' | missed the last vote: ' + ', '.join(msg['late']) if msg['late'] else ''}")
+    return "\n".join(lines)
+
+
+async def console(host, port, name, room=''):
+    client = await Client.connect(host, port, name, room)
+    loop = asyncio.get_running_loop()
+
+    async def keyboard():
+        while True:
+            words = (await loop.run_in_executor(None, input)).split()
+            cmd = words[0].lower() if words else ''
+            if cmd == 'start':
+                await client.send(op='start', percival='nopercival' not in words, oberon='oberon' in words,
+                                  mordred='mordred' in words)
+            elif cmd == 'propose':
+                await client.send(op='propose', team=words[1:])
+            elif cmd in ('approve', 'reject'):
+                await client.send(op='vote', approve=cmd == 'approve')
+            elif cmd in ('pass', 'fail'):
+                await client.send(op='mission', vote=cmd.capitalize())
+            elif cmd == 'kill' and len(words) == 2:
+                await client.send(op='assassinate', target=words[1])
+            elif cmd == 'quit':
+                break
+            else:
+                print("start [nopercival] [oberon] [mordred] | propose A B C | approve | reject | pass | fail "
+                      "| kill NAME | quit")
+        await client.close()
+
+    keys = asyncio.ensure_future(keyboard())
+    shown = [0]
+    while not keys.done():
+        msg = await client.recv()
+        if msg is None:
+            break
+        print(render(msg, shown))
+
+
+async def spectate(host, port, room=''):
+    client = await Client.watch(host, port, room)
+    shown = [0]
+    try:
+        while True:
+            msg = await client.recv()
+            if msg is None:
+                break
+            print(render(msg, shown))
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Join a networked Avalon table, or play a loopback game of bots")
+    ap.add_argument("--name", help="your name at the table")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--room", default="", help="table to join on a multi-room server")
+    ap.add_argument("--watch", action="store_true", help="watch the room as a spectator")
+    ap.add_argument("--bots", type=int, default=0, help="play one local game with this many bots instead")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+    if args.bots:
+        final = asyncio.run(play_local(args.bots, args.seed))
+        print(render(final, [0]))
+    elif args.watch:
+        asyncio.run(spectate(args.host, args.port, args.room))
+    elif args.name:
+        asyncio.run(console(args.host, args.port, args.name, args.room))
+    else:
+        ap.error("give --name to join a table, --watch to spectate, or --bots to watch bots play")
@@ -0,0 +1,261 @@
+from array import array
+from functools import lru_cache
+from heapq import nlargest
+from math import comb
+from operator import add
+
+from avalon_engine import bits, team_masks, R_MORDRED, R_OBERON
+
+# Deduction aids built on the public mission history.
+#
+# Mission outcomes only depend on *which* seats are Evil, not on who is Assassin,
+# Morgana etc., so the posterior over full role deals factors into a posterior over
+# Evil subsets (at most C(10,4) = 210 of them) times a uniform spread of the special
+# roles inside each side.  Each subset is a bitmask, so one mission update is a
+# popcount and a multiply per subset.
+
+DEFAULT_FAIL_RATE = 0.85  # chance an Evil player on a mission plays Fail
+
+
+class EvilPosterior:
+    __slots__ = ('n', 'evil_count', 'fail_rate', 'subsets', 'weights', 'observed', 'clean')
+
+    def __init__(self, n, evil_count, fail_rate=DEFAULT_FAIL_RATE):
+        self.n = n
+        self.evil_count = evil_count
+        self.fail_rate = fail_rate
+        self.subsets = team_masks(n, evil_count)  # every possible Evil side, shared cache
+        self.weights = [1.0 / len(self.subsets)] * len(self.subsets)
+        self.observed = 0
+        self.clean = None  # clean_table() cache, dropped whenever the weights change
+
+    @classmethod
+    def from_missions(cls, n, evil_count, missions, fail_rate=DEFAULT_FAIL_RATE):
+        # replays engine Mission records (team bitmask + fails)
+        post = cls(n, evil_count, fail_rate)
+        for m in missions:
+            post.observe(m.team, m.fails)
+        return post
+
+    def likelihoods(self, size, fails):
+        # P(fails | m Evil on the team) for m = 0..size; Good players can never fail
+        p = self.fail_rate
+        return [comb(m, fails) * p**fails * (1 - p)**(m - fails) if fails <= m else 0.0
+                for m in range(size + 1)]
+
+    def observe(self, team, fails):
+        # folds one mission result into the weights; an auto-failed mission (team 0) says nothing
+        if not team:
+            return
+        lik = self.likelihoods(team.bit_count(), fails)
+        w = self.weights
+        total = 0.0
+        for j, evil in enumerate(self.subsets):
+            x = w[j] * lik[(team & evil).bit_count()]
+            w[j] = x
+            total += x
+        if total == 0.0:
+            raise ValueError("Mission result is impossible under the current history.")
+        for j in range(len(w)):
+            w[j] /= total
+        self.observed += 1
+        self.clean = None
+
+    def restrict(self, known_good=0, known_evil=0):
+        # conditions on private knowledge (e.g. a player's own seat, or Merlin's view)
+        w = self.weights
+        total = 0.0
+        for j, evil in enumerate(self.subsets):
+            if evil & known_good or known_evil & ~evil:
+                w[j] = 0.0
+            total += w[j]
+        if total == 0.0:
+            raise ValueError("Known seats contradict the mission history.")
+        for j in range(len(w)):
+            w[j] /= total
+        self.clean = None
+
+    def p_evil(self):
+        # probability that each seat is Evil
+        out = [0.0] * self.n
+        for evil, x in zip(self.subsets, self.weights):
+            if x:
+                while evil:
+                    low = evil & -evil
+                    out[low.bit_length() - 1] += x
+                    evil ^= low
+        return out
+
+    def p_clean(self, team):
+        # probability that a team has no Evil on it
+        return sum(x for evil, x in zip(self.subsets, self.weights) if not team & evil)
+
+    def p_pass(self, team, fails_needed=1):
+        # probability that one team's mission passes if every Evil on it fails
+        return sum(x for evil, x in zip(self.subsets, self.weights) if (team & evil).bit_count() < fails_needed)
+
+
+# ---------- HARD CONSTRAINTS ----------
+# What the mission history proves, as opposed to what it suggests: a mission with k fails
+# had at least k Evil on it, since Good players can only pass.  With assume_fail, every
+# Evil on a mission is taken to fail it, so the fails are exactly its Evil count and a
+# clean pass clears the whole team.  The Evil subsets still possible are one int used as
+# a bitset over team_masks(n, evil_count); each mission ANDs in a cached mask of the
+# subsets it allows, so an update is a single AND and the report a pass over at most
+# C(10, 4) = 210 set bits.
+
+@lru_cache(maxsize=None)
+def allowed_subsets(n, evil_count, team, fails, exact):
+    # bitset of the Evil subsets under which `team` could have produced `fails` fails
+    out = 0
+    for j, evil in enumerate(team_masks(n, evil_count)):
+        m = (team & evil).bit_count()
+        if m == fails if exact else m >= fails:
+            out |= 1 << j
+    return out
+
+
+class EvilConstraints:
+    __slots__ = ('n', 'evil_count', 'assume_fail', 'subsets', 'feasible', 'observed', 'evil', 'maybe')
+
+    def __init__(self, n, evil_count, assume_fail=False):
+        self.n = n
+        self.evil_count = evil_count
+        self.assume_fail = assume_fail
+        self.subsets = team_masks(n, evil_count)
+        self.feasible = (1 << len(self.subsets)) - 1
+        self.observed = 0
+        self._summarize()
+
+    @classmethod
+    def from_missions(cls, n, evil_count, missions, assume_fail=False):
+        cons = cls(n, evil_count, assume_fail)
+        for m in missions:
+            cons.observe(m.team, m.fails)
+        return cons
+
+    def observe(self, team, fails):
+        # narrows the feasible set by one mission; an auto-failed mission (team 0) says nothing
+        # and, as in EvilPosterior, is not counted in `observed`
+        if not team:
+            return
+        self._narrow(allowed_subsets(self.n, self.evil_count, team, fails, self.assume_fail))
+        self.observed += 1
+
+    def _narrow(self, allowed):
+        feasible = self.feasible & allowed
+        if not feasible:
+            raise ValueError("No Evil side fits the mission history.")
+        self.feasible = feasible
+        self._summarize()
+
+    def _summarize(self):
+        # seats Evil in every feasible subset, and in at least one
+        evil, maybe = (1 << self.n) - 1, 0
+        subsets = self.subsets
+        for j in bits(self.feasible):
+            evil &= subsets[j]
+            maybe |= subsets[j]
+        self.evil = evil
+        self.maybe = maybe
+
+    def status(self):
+        # 'Evil', 'Good' or 'unknown' per seat
+        return ['Evil' if self.evil >> i & 1 else 'unknown' if self.maybe >> i & 1 else 'Good'
+                for i in range(self.n)]
+
+
+# ---------- TEAM PROPOSALS ----------
+@lru_cache(maxsize=None)
+def legal_proposals(rules, n, round_number):
+    # every legal team for this round as an array of bitmasks, built once per (rules, n, round);
+    # RuleSet keeps n within MAX_PLAYERS, so a team fits in 16 bits
+    return array('H', team_masks(n, rules.team_size(n, round_number)))
+
+
+def clean_table(post):
+    # f[S] = probability that the whole Evil side sits inside seat set S, for every S;
+    # one subset-sum pass over 2**n entries, after which any team is scored by lookup.
+    # Kept on the posterior until the next observation.
+    if post.clean is not None:
+        return post.clean
+    n = post.n
+    f = [0.0] * (1 << n)
+    for evil, x in zip(post.subsets, post.weights):
+        f[evil] += x
+    for i in range(n):
+        bit = 1 << i
+        # every block of 2*bit entries: the upper half (bit set) adds the lower half
+        for start in range(0, 1 << n, bit << 1):
+            hi = start + bit
+            f[hi:hi + bit] = map(add, f[hi:hi + bit], f[start:hi])
+    post.clean = f
+    return f
+
+
+def score_teams(post, teams, fails_needed=1):
+    # probability that each team's mission passes if every Evil on it fails
+    f = clean_table(post)
+    full = (1 << post.n) - 1
+    if fails_needed == 1:
+        return [f[full & ~t] for t in teams]
+    if fails_needed == 2:
+        # no Evil on the team, or exactly one: sum over seats i of P(Evil inside ~team + i) - P(inside ~team)
+        out = []
+        for t in teams:
+            c = full & ~t
+            base = f[c]
+            x = base
+            while t:
+                low = t & -t
+                x += f[c | low] - base
+                t ^= low
+            out.append(x)
+        return out
+    # rare house rules: count directly
+    return [sum(x for evil, x in zip(post.subsets, post.weights) if (t & evil).bit_count() < fails_needed)
+            for t in teams]
+
+
+def best_teams(post, rules, round_number, top=3, must_include=0):
+    # highest pass-probability teams for this round, as (team mask, probability) pairs
+    teams = legal_proposals(rules, post.n, round_number)
+    if must_include:
+        teams = [t for t in teams if t & must_include == must_include]
+    need = rules.fails_needed(post.n)[round_number-1]
+    scored = nlargest(top, zip(score_teams(post, teams, need), teams))
+    return [(t, p) for p, t in scored]
+
+
+# ---------- ASSASSIN ----------
+DEFAULT_MERLIN_SLIP = 0.15  # chance Merlin leads a team with an Evil they can see on it
+
+
+def merlin_scores(eng, slip=DEFAULT_MERLIN_SLIP):
+    # probability of being Merlin for every seat the assassin could target, from their point of view.
+    # The Evil team knows its own seats except Oberon; Merlin sees every Evil but Mordred.
+    # A Merlin leader rarely proposes a team with such a seat on it, while a plain Good
+    # leader does so at the rate of a random team, so each proposal they led is a
+    # likelihood ratio on "this seat is Merlin".
+    n = eng.n
+    masks = eng.role_masks
+    marked = eng.evil_mask & ~masks[R_OBERON] & ~masks[R_MORDRED]
+    m = marked.bit_count()
+    targets = eng.assassin_targets_mask()
+    cands = [i for i in range(n) if targets >> i & 1]
+    ratio = dict.fromkeys(cands, 1.0)
+    for prop in eng.proposals:
+        if prop.leader in ratio:
+            k = prop.team.bit_count()
+            clean_rate = comb(n - m, k) / comb(n, k)
+            if prop.team & marked:
+                ratio[prop.leader] *= slip / max(1.0 - clean_rate, 1e-9)
+            else:
+                ratio[prop.leader] *= (1.0 - slip) / max(clean_rate, 1e-9)
+    total = sum(ratio.values())
+    return [(i, ratio[i] / total) for i in cands]
+
+
+def rank_merlin(eng, slip=DEFAULT_MERLIN_SLIP):
+    # possible targets, most likely Merlin first
+    return sorted(merlin_scores(eng, slip), key=lambda ip: -ip[1])
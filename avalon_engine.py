@@ -0,0 +1,516 @@
+import random
+from functools import lru_cache
+from hashlib import blake2b
+from itertools import combinations
+
+from avalon_rules import STANDARD
+from avalon_events import (EventLog, GAME_START, ROLES_ASSIGNED, ROUND_START, LEADER, PROPOSAL as E_PROPOSAL, VOTE,
+                           REJECTED, APPROVED, AUTO_FAIL, MISSION_RESULT, ASSASSINATION)
+
+# Headless rules engine for "The Resistance: Avalon".
+# Drives the same transitions as AvalonApp (atr_2-3-1.py) without any tkinter,
+# so the GUI is only a view and games can be simulated on a headless box.
+#
+# Players are indices into original_players; teams and alliances are bitmasks
+# (bit i = player i), so membership tests are a single AND.  Roles are small ints.
+# Evil counts, mission sizes and the like come from a RuleSet (avalon_rules.py).
+# The game log (metadata) is a typed EventLog (avalon_events.py).
+
+# role ids; every id >= R_EVIL is on the Evil side
+R_GOOD, R_MERLIN, R_PERCIVAL, R_EVIL, R_ASSASSIN, R_MORGANA, R_OBERON, R_MORDRED = range(8)
+ROLE_NAMES = ('Good', 'Merlin', 'Percival', 'Evil', 'Assassin', 'Morgana', 'Oberon', 'Mordred')
+ROLE_IDS = {name: i for i, name in enumerate(ROLE_NAMES)}
+
+GOOD_ROLES = ROLE_NAMES[:R_EVIL]
+EVIL_ROLES = ROLE_NAMES[R_EVIL:]
+
+# phases
+PROPOSAL = 'proposal'     # waiting for the leader's team
+TEAM_VOTE = 'team_vote'   # waiting for approve / reject
+MISSION = 'mission'       # collecting mission votes
+ASSASSIN = 'assassin'     # good reached 3 passes with Merlin in play
+OVER = 'over'
+
+
+# ---------- BITMASK HELPERS ----------
+def bits(mask):
+    # player indices set in mask, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def mask_of(indices):
+    m = 0
+    for i in indices:
+        m |= 1 << i
+    return m
+
+
+@lru_cache(maxsize=None)
+def team_masks(n, k):
+    # every k-player team out of n as a bitmask, built once per (n, k)
+    return tuple(mask_of(c) for c in combinations(range(n), k))
+
+
+# ---------- SEEDS ----------
+# Every game owns a random.Random seeded from a 64-bit int, so a game, a bug report or a
+# simulation batch replays exactly from its seed.  Seeds for many games are derived by
+# hashing (base seed, keys...), which gives independent streams however the games are
+# split across processes.
+def new_seed():
+    return random.SystemRandom().getrandbits(64)
+
+
+def derive_seed(base, *keys):
+    return int.from_bytes(blake2b(repr((base,) + keys).encode(), digest_size=8).digest(), 'little')
+
+
+def setup_error(names, use_merlin=True, use_percival=True, use_oberon=False, use_mordred=False, rules=STANDARD):
+    # returns (title, message) for the first invalid setting, or None
+    if not rules.supports(len(names)):
+        return ("Invalid Player Count", f"Enter between {rules.min_players} and {rules.max_players} names.")
+    if len(names) != len(set(names)):
+        return ("Duplicate Names Inputted",
+                "You have entered duplicate names;\n"
+                "please remove any duplicates before proceeding.")
+    if use_percival and not use_merlin:
+        return ("Invalid Roles", "Percival/Morgana require Merlin/Assassin.")
+    evil_count = rules.evil(len(names))
+    evil_specials = use_merlin + use_percival + use_oberon + use_mordred
+    if evil_specials > evil_count:
+        return ("Too Many Evil Roles",
+                f"You selected {evil_specials} special Evil roles,\n"
+                f"but only {evil_count} Evil players exist.")
+    good_specials = use_merlin + use_percival
+    if good_specials > len(names) - evil_count:
+        return ("Too Many Good Roles",
+                f"You selected {good_specials} special Good roles,\n"
+                f"but only {len(names) - evil_count} Good players exist.")
+    return None
+
+
+def build_deck(n, use_merlin=True, use_percival=True, use_oberon=False, use_mordred=False, rules=STANDARD):
+    # list of role ids for n players, unshuffled
+    return list(_deck(n, use_merlin, use_percival, use_oberon, use_mordred, rules))
+
+
+@lru_cache(maxsize=None)
+def _deck(n, use_merlin, use_percival, use_oberon, use_mordred, rules):
+    evil = rules.evil(n)
+    good = n - evil
+    roles = [R_EVIL]*evil + [R_GOOD]*good
+    specials = []
+    if use_merlin:
+        roles.remove(R_GOOD); specials.append(R_MERLIN)
+        roles.remove(R_EVIL); specials.append(R_ASSASSIN)
+    if use_percival:
+        roles.remove(R_GOOD); specials.append(R_PERCIVAL)
+        roles.remove(R_EVIL); specials.append(R_MORGANA)
+    if use_oberon:
+        roles.remove(R_EVIL)
+        specials.append(R_OBERON)
+    if use_mordred:
+        roles.remove(R_EVIL)
+        specials.append(R_MORDRED)
+    return tuple(roles + specials)
+
+
+def deal_knowledge(deck, masks, evil_mask):
+    # who each player sees at the reveal, computed once per deal:
+    # Merlin sees every Evil but Mordred, Percival sees Merlin and Morgana (not which is which),
+    # Evil see each other except Oberon, and Oberon sees nobody
+    merlin_sees = evil_mask & ~masks[R_MORDRED]
+    percival_sees = masks[R_MERLIN] | masks[R_MORGANA]
+    evil_sees = evil_mask & ~masks[R_OBERON]
+    sees = [0]*len(deck)
+    for i, r in enumerate(deck):
+        if r == R_MERLIN:
+            sees[i] = merlin_sees
+        elif r == R_PERCIVAL:
+            sees[i] = percival_sees
+        elif r >= R_EVIL and r != R_OBERON:
+            sees[i] = evil_sees & ~(1 << i)
+    return sees
+
+
+class Proposal:
+    # one proposed team; approved stays None until the table votes,
+    # votes is the bitmask of approving players when each vote was recorded
+    __slots__ = ('round_number', 'leader', 'team', 'approved', 'votes')
+
+    def __init__(self, round_number, leader, team):
+        self.round_number = round_number
+        self.leader = leader
+        self.team = team
+        self.approved = None
+        self.votes = None
+
+
+class Mission:
+    # one resolved (or auto-failed) mission; team is a bitmask, 0 for an auto-fail
+    __slots__ = ('leader', 'team', 'fails', 'passed')
+
+    def __init__(self, leader, team, fails, passed):
+        self.leader = leader
+        self.team = team
+        self.fails = fails
+        self.passed = passed
+
+
+class AvalonEngine:
+    __slots__ = ('original_players', 'index', 'n', 'all_mask',
+                 'use_merlin', 'use_percival', 'use_oberon', 'use_mordred', 'rules', 'log', 'seed', 'rng',
+                 'max_failed_proposals', 'evil_count', 'mission_sizes', 'fails_needed', 'wins_needed',
+                 'role_of', 'role_masks', 'evil_mask', 'good_mask', 'knowledge',
+                 'leader_index', 'leader', 'phase', 'round_number', 'failed_proposals',
+                 'team', 'voters', 'votes_in', 'fail_votes',
+                 'proposals', 'missions', 'good_wins', 'evil_wins', 'metadata', 'winning_team', 'assassinated',
+                 'undo_stack', 'redo_stack', 'spare')
+
+    def __init__(self, players, use_merlin=True, use_percival=True, use_oberon=False, use_mordred=False,
+                 rules=STANDARD, log=True, seed=None):
+        err = setup_error(players, use_merlin, use_percival, use_oberon, use_mordred, rules)
+        if err:
+            raise ValueError(err[1])
+        self.original_players = list(players)
+        self.index = {p: i for i, p in enumerate(self.original_players)}
+        self.n = n = len(self.original_players)
+        self.all_mask = (1 << n) - 1
+        self.use_merlin = bool(use_merlin)
+        self.use_percival = bool(use_percival)
+        self.use_oberon = bool(use_oberon)
+        self.use_mordred = bool(use_mordred)
+        self.rules = rules
+        # simulations switch the event log off; it is the only per-move allocation
+        self.log = log
+        # this game's own generator; never the global one, so games replay from their seed
+        self.seed = new_seed() if seed is None else seed
+        self.rng = random.Random(self.seed)
+
+        # this table's rows of the rule set
+        self.max_failed_proposals = rules.max_failed_proposals
+        self.evil_count = rules.evil(n)
+        self.mission_sizes = rules.sizes(n)
+        self.fails_needed = rules.fails_needed(n)
+        self.wins_needed = rules.wins_needed
+
+        self.role_of = None        # role id per player index
+        self.role_masks = None     # bitmask of players per role id
+        self.evil_mask = 0
+        self.good_mask = 0
+        self.knowledge = None      # per player: bitmask of who they see at the reveal
+        self.leader_index = None   # next leader in the rotation
+        self.phase = None
+
+        # Game state
+        self.round_number = 1
+        self.failed_proposals = 0
+        self.leader = None         # index of the current leader
+        self.team = 0              # proposed / approved team
+        self.voters = ()           # team indices in voting order
+        self.votes_in = 0
+        self.fail_votes = 0        # bitmask of players whose Fail counted
+        self.proposals = []
+        self.missions = []
+        self.good_wins = 0
+        self.evil_wins = 0
+        self.metadata = EventLog(self.original_players)
+        self.winning_team = None  # "Good", "Evil", or None
+        self.assassinated = None
+
+        # undo / redo, only used when the view calls checkpoint()
+        self.undo_stack = []
+        self.redo_stack = []
+        self.spare = ([], [], [])  # undone proposals, missions and log events, newest undo last
+
+        if self.log:
+            self.metadata.add(GAME_START)
+
+    # ---------- NAME VIEWS ----------
+    # name-based views of the compact state, for the GUI and the text log
+    def names(self, mask):
+        return [self.original_players[i] for i in bits(mask)]
+
+    def mask(self, names):
+        return mask_of(self.index[p] for p in names)
+
+    @property
+    def roles(self):
+        return {p: ROLE_NAMES[r] for p, r in zip(self.original_players, self.role_of or ())}
+
+    @property
+    def current_leader(self):
+        return None if self.leader is None else self.original_players[self.leader]
+
+    @property
+    def selected_team(self):
+        return self.names(self.team)
+
+    @property
+    def mission_results(self):
+        return [m.passed for m in self.missions]  # True=pass, False=fail
+
+    @property
+    def past_missions(self):
+        return [{'leader': self.original_players[m.leader], 'team': self.names(m.team), 'pass': m.passed,
+                 'fails': m.fails} for m in self.missions]
+
+    # ---------- ROLE ASSIGNMENT ----------
+    def assign_roles(self, deck=None, leader_index=None):
+        # deck is a list of role ids in player order; dealt with the game's rng when omitted
+        n = self.n
+        if deck is None:
+            deck = build_deck(n, self.use_merlin, self.use_percival, self.use_oberon, self.use_mordred, self.rules)
+            self.rng.shuffle(deck)
+        self.role_of = deck
+        masks = [0]*len(ROLE_NAMES)
+        for i, r in enumerate(deck):
+            masks[r] |= 1 << i
+        self.role_masks = masks
+        self.evil_mask = masks[R_EVIL] | masks[R_ASSASSIN] | masks[R_MORGANA] | masks[R_OBERON] | masks[R_MORDRED]
+        self.good_mask = self.all_mask ^ self.evil_mask
+        self.knowledge = deal_knowledge(deck, masks, self.evil_mask)
+        if self.log:
+            self.metadata.add(ROLES_ASSIGNED)
+        if leader_index is None:
+            leader_index = self.rng.randrange(n)
+        self.leader_index = leader_index
+        self.start_team_proposal()
+
+    def is_evil(self, p):
+        return self.evil_mask >> self.index[p] & 1 == 1
+
+    # ---------- TEAM PROPOSAL & VOTING ----------
+    def team_size(self):
+        return self.mission_sizes[self.round_number-1]
+
+    def needs_double_fail(self):
+        return self.fails_needed[self.round_number-1] > 1
+
+    def start_team_proposal(self):
+        # log round start once
+        if self.log and not self.metadata.round_started(self.round_number):
+            self.metadata.add(ROUND_START, self.round_number)
+        # Choose leader based on rotating index
+        self.leader = self.leader_index
+        self.leader_index = (self.leader_index + 1) % self.n
+        if self.log:
+            self.metadata.add(LEADER, self.round_number, self.leader)
+        self.team = 0
+        self.phase = PROPOSAL
+
+    def propose_team(self, team):
+        for p in team:
+            if p not in self.index:
+                raise ValueError(f"Unknown player {p!r}.")
+        if len(set(team)) != len(team):
+            raise ValueError(f"Select exactly {self.team_size()} players.")
+        self.propose_mask(self.mask(team))
+
+    def propose_mask(self, team):
+        if self.phase != PROPOSAL:
+            raise RuntimeError(f"Cannot propose a team during the {self.phase} phase.")
+        if team.bit_count() != self.mission_sizes[self.round_number-1] or team & ~self.all_mask:
+            raise ValueError(f"Select exactly {self.team_size()} players.")
+        self.team = team
+        self.proposals.append(Proposal(self.round_number, self.leader, team))
+        if self.log:
+            self.metadata.add(E_PROPOSAL, self.round_number, self.leader, team)
+        self.phase = TEAM_VOTE
+
+    def vote_team(self, approvals):
+        # per-player team vote: approvals is the bitmask of players voting Approve,
+        # and the team goes ahead on a strict majority
+        if self.phase != TEAM_VOTE:
+            raise RuntimeError(f"No team vote during the {self.phase} phase.")
+        self.proposals[-1].votes = approvals & self.all_mask
+        if self.log:
+            self.metadata.add(VOTE, self.round_number, self.leader, self.team, approvals & self.all_mask)
+        if (approvals & self.all_mask).bit_count() * 2 > self.n:
+            self.team_approved()
+            return True
+        self.team_rejected()
+        return False
+
+    def team_rejected(self):
+        if self.phase != TEAM_VOTE:
+            raise RuntimeError(f"No team to reject during the {self.phase} phase.")
+        self.failed_proposals += 1
+        self.proposals[-1].approved = False
+        if self.log:
+            self.metadata.add(REJECTED, self.round_number, self.leader, self.team)
+        if self.failed_proposals >= self.max_failed_proposals:
+            if self.log:
+                self.metadata.add(AUTO_FAIL, self.round_number, self.leader, value=self.failed_proposals)
+            self.missions.append(Mission(self.leader, 0, 0, False))
+            self._finish_round(False)
+        else:
+            self.start_team_proposal()
+
+    def team_approved(self):
+        if self.phase != TEAM_VOTE:
+            raise RuntimeError(f"No team to approve during the {self.phase} phase.")
+        self.proposals[-1].approved = True
+        if self.log:
+            self.metadata.add(APPROVED, self.round_number, self.leader, self.team)
+        self.voters = ()
+        self.votes_in = 0
+        self.fail_votes = 0
+        self.phase = MISSION
+
+    # ---------- MISSION VOTING ----------
+    def next_mission_voter(self):
+        # team member whose vote is due, or None once every vote is in
+        if not self.voters:
+            self.voters = tuple(bits(self.team))
+        i = self.votes_in
+        return self.original_players[self.voters[i]] if i < len(self.voters) else None
+
+    def submit_mission_vote(self, v):
+        p = self.next_mission_voter() if self.phase == MISSION else None
+        if p is None:
+            raise RuntimeError("No mission vote is due.")
+        # good players can only pass
+        if v == 'Fail':
+            self.fail_votes |= (1 << self.voters[self.votes_in]) & self.evil_mask
+        self.votes_in += 1
+
+    def show_mission_result(self):
+        # resolves the votes collected one by one; returns (passed, fails)
+        if self.phase != MISSION or self.next_mission_voter() is not None:
+            raise RuntimeError("Mission votes are not complete.")
+        return self.resolve_mission(self.fail_votes)
+
+    def resolve_mission(self, fail_votes):
+        # fail_votes: bitmask of players playing Fail; Good players' cards are ignored
+        if self.phase != MISSION:
+            raise RuntimeError(f"No mission to resolve during the {self.phase} phase.")
+        fails = (fail_votes & self.team & self.evil_mask).bit_count()
+        # Mission 4 for 7+ players needs 2 fails under the standard rules
+        passed = fails < self.fails_needed[self.round_number-1]
+        self.missions.append(Mission(self.leader, self.team, fails, passed))
+        if self.log:
+            self.metadata.add(MISSION_RESULT, self.round_number, self.leader, self.team, fails, passed)
+        self._finish_round(passed)
+        return passed, fails
+
+    def _finish_round(self, passed):
+        if passed:
+            self.good_wins += 1
+        else:
+            self.evil_wins += 1
+        if self.good_wins >= self.wins_needed:
+            if self.use_merlin:
+                self.phase = ASSASSIN
+            else:
+                self.winning_team = "Good"
+                self.phase = OVER
+        elif self.evil_wins >= self.wins_needed:
+            self.winning_team = "Evil"
+            self.phase = OVER
+        else:
+            self.round_number += 1
+            self.failed_proposals = 0
+            self.start_team_proposal()
+
+    # ---------- ASSASSIN PHASE ----------
+    def assassin(self):
+        m = self.role_masks[R_ASSASSIN]
+        return self.original_players[m.bit_length() - 1] if m else None
+
+    def assassin_targets_mask(self):
+        # every seat the assassin cannot see as Evil: the Good seats, and Oberon hidden among them
+        return self.all_mask & ~(self.evil_mask & ~self.role_masks[R_OBERON])
+
+    def assassin_targets(self):
+        return self.names(self.assassin_targets_mask())
+
+    def resolve_assassin(self, target):
+        # returns True when the target was Merlin
+        if target not in self.index:
+            raise ValueError(f"Unknown player {target!r}.")
+        return self.assassinate(self.index[target])
+
+    def assassinate(self, i):
+        if self.phase != ASSASSIN:
+            raise RuntimeError(f"No assassination during the {self.phase} phase.")
+        self.assassinated = i
+        hit = self.role_of[i] == R_MERLIN
+        self.winning_team = "Evil" if hit else "Good"
+        if self.log:
+            self.metadata.add(ASSASSINATION, self.round_number, value=i, flag=hit)
+        self.phase = OVER
+        return hit
+
+    def is_over(self):
+        return self.phase == OVER
+
+    # ---------- UNDO / REDO ----------
+    # A snapshot is an immutable tuple: the scalar state, the deal (never changed once dealt,
+    # so shared), the lengths of the append-only lists (proposals, missions, log) and the last
+    # proposal's vote, the only list entry that changes after it is appended.  List entries are
+    # shared, not copied; undone ones wait in `spare` until a redo puts them back or a new
+    # action drops them, so a step only costs what that step changed.
+    # `view` is whatever the caller needs to redraw, e.g. the GUI's current screen.
+    STATE = ('phase', 'round_number', 'failed_proposals', 'leader', 'leader_index', 'team', 'voters',
+             'votes_in', 'fail_votes', 'good_wins', 'evil_wins', 'winning_team', 'assassinated')
+
+    def snapshot(self, view=None):
+        last = self.proposals[-1] if self.proposals else None
+        return (tuple(getattr(self, k) for k in self.STATE),
+                (self.role_of, self.role_masks, self.evil_mask, self.good_mask, self.knowledge),
+                self.rng.getstate() if self.role_of is None else None,  # so an undone deal deals the same
+                (len(self.proposals), len(self.missions), len(self.metadata)),
+                None if last is None else (last.approved, last.votes),
+                view)
+
+    def restore(self, snap):
+        state, deal, rng_state, sizes, last, view = snap
+        for k, x in zip(self.STATE, state):
+            setattr(self, k, x)
+        self.role_of, self.role_masks, self.evil_mask, self.good_mask, self.knowledge = deal
+        if rng_state is not None:
+            self.rng.setstate(rng_state)
+        for lst, size, tail in zip((self.proposals, self.missions), sizes, self.spare):
+            if len(lst) > size:
+                tail.extend(reversed(lst[size:]))
+                del lst[size:]
+            while len(lst) < size:
+                lst.append(tail.pop())
+        log, size, tail = self.metadata, sizes[2], self.spare[2]
+        if len(log) > size:
+            tail.extend(reversed(log.truncate(size)))
+        elif len(log) < size:
+            k = size - len(log)
+            log.extend(reversed(tail[-k:]))
+            del tail[-k:]
+        if last is not None:
+            self.proposals[-1].approved, self.proposals[-1].votes = last
+        return view
+
+    def checkpoint(self, view=None):
+        # call before every undoable action
+        self.undo_stack.append(self.snapshot(view))
+        self.redo_stack.clear()
+        for tail in self.spare:
+            tail.clear()
+
+    def fold(self, depth):
+        # merges the last `depth` undo steps into one, so undo skips the states between them;
+        # e.g. the mission cards, once the result has shown how many Fails there were
+        del self.undo_stack[max(1, len(self.undo_stack) - depth + 1):]
+
+    def undo(self, view=None):
+        # steps back one action; returns the view saved with it
+        if not self.undo_stack:
+            raise RuntimeError("Nothing to undo.")
+        self.redo_stack.append(self.snapshot(view))
+        return self.restore(self.undo_stack.pop())
+
+    def redo(self, view=None):
+        if not self.redo_stack:
+            raise RuntimeError("Nothing to redo.")
+        self.undo_stack.append(self.snapshot(view))
+        return self.restore(self.redo_stack.pop())
@@ -0,0 +1,168 @@
+from bisect import bisect_left
+from heapq import merge
+
+# Typed game log.
+# Every line of the old free-form metadata is now an Event record; the text is only
+# built when a line is displayed.  EventLog indexes events by kind and by round as
+# they are added, so questions like "has round 3 started?" are a dict lookup, the
+# log panel's filters read the kind index, and the same records feed analytics and
+# persistence (rows()/from_rows()).
+
+# event kinds
+(GAME_START, NOTE, ROLES_ASSIGNED, ROUND_START, LEADER, PROPOSAL, VOTE, REJECTED, APPROVED, AUTO_FAIL,
+ MISSION_RESULT, ASSASSINATION) = range(12)
+KIND_NAMES = ('game_start', 'note', 'roles_assigned', 'round_start', 'leader', 'proposal', 'vote', 'rejected',
+              'approved', 'auto_fail', 'mission_result', 'assassination')
+
+
+class Event:
+    # leader / team / value / flag mean different things per kind:
+    #   PROPOSAL, APPROVED: team = bitmask   VOTE: value = bitmask of approvers
+    #   AUTO_FAIL: value = rejections        MISSION_RESULT: team, value = fails, flag = passed
+    #   ASSASSINATION: value = target seat, flag = hit Merlin   NOTE: value = free text
+    __slots__ = ('kind', 'round_number', 'leader', 'team', 'value', 'flag')
+
+    def __init__(self, kind, round_number=0, leader=None, team=0, value=None, flag=False):
+        self.kind = kind
+        self.round_number = round_number
+        self.leader = leader
+        self.team = team
+        self.value = value
+        self.flag = flag
+
+    def row(self):
+        return (self.kind, self.round_number, self.leader, self.team, self.value, self.flag)
+
+
+class EventLog:
+    # reads like the old list of metadata strings: log[i] formats event i on demand
+    __slots__ = ('players', 'events', 'by_kind', 'by_round')
+
+    def __init__(self, players):
+        self.players = players
+        self.events = []
+        self.by_kind = [[] for _ in KIND_NAMES]  # kind -> event numbers, ascending
+        self.by_round = {}
+
+    def add(self, kind, round_number=0, leader=None, team=0, value=None, flag=False):
+        e = Event(kind, round_number, leader, team, value, flag)
+        i = len(self.events)
+        self.events.append(e)
+        self.by_kind[kind].append(i)
+        if round_number:
+            self.by_round.setdefault(round_number, []).append(i)
+        return e
+
+    def append(self, text):
+        # free text from the view (e.g. the setup summary)
+        self.add(NOTE, value=text)
+
+    def truncate(self, length):
+        # drops the events from `length` on (undo); returns them, oldest first
+        removed = self.events[length:]
+        del self.events[length:]
+        for ids in self.by_kind:
+            while ids and ids[-1] >= length:
+                ids.pop()
+        for e in removed:
+            if e.round_number:
+                ids = self.by_round[e.round_number]
+                ids.pop()
+                if not ids:
+                    del self.by_round[e.round_number]
+        return removed
+
+    def extend(self, events):
+        # puts undone events back (redo)
+        for e in events:
+            i = len(self.events)
+            self.events.append(e)
+            self.by_kind[e.kind].append(i)
+            if e.round_number:
+                self.by_round.setdefault(e.round_number, []).append(i)
+
+    def __len__(self):
+        return len(self.events)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.format(e) for e in self.events[i]]
+        return self.format(self.events[i])
+
+    def __iter__(self):
+        return (self.format(e) for e in self.events)
+
+    # ---------- LOOKUPS ----------
+    def of_kind(self, kind):
+        return [self.events[i] for i in self.by_kind[kind]]
+
+    def in_round(self, round_number):
+        return [self.events[i] for i in self.by_round.get(round_number, ())]
+
+    def ids(self, kinds=None, start=0):
+        # event numbers from `start` on, ascending, of the given kinds (None for all)
+        if kinds is None:
+            return list(range(start, len(self.events)))
+        runs = [ids[bisect_left(ids, start):] for ids in (self.by_kind[k] for k in kinds)]
+        return runs[0] if len(runs) == 1 else list(merge(*runs))
+
+    def count(self, kinds=None):
+        if kinds is None:
+            return len(self.events)
+        return sum(len(self.by_kind[k]) for k in kinds)
+
+    def round_started(self, round_number):
+        ids = self.by_round.get(round_number)
+        return bool(ids) and self.events[ids[0]].kind == ROUND_START
+
+    # ---------- TEXT ----------
+    def names(self, mask):
+        out = []
+        i = 0
+        while mask:
+            if mask & 1:
+                out.append(self.players[i])
+            mask >>= 1
+            i += 1
+        return out
+
+    def format(self, e):
+        k = e.kind
+        r = e.round_number
+        leader = None if e.leader is None else self.players[e.leader]
+        if k == GAME_START:
+            return f"Game start: players {', '.join(self.players)}"
+        if k == NOTE:
+            return e.value
+        if k == ROLES_ASSIGNED:
+            return "Roles assigned."
+        if k == ROUND_START:
+            return f"Round {r} start"
+        if k == LEADER:
+            return f"Leader '{leader}' selected for Round {r}"
+        if k == PROPOSAL:
+            return f"Proposal by {leader}: {self.names(e.team)}"
+        if k == VOTE:
+            return f"Votes on {leader}'s team: {', '.join(self.names(e.value)) or 'nobody'} approved"
+        if k == REJECTED:
+            return f"Proposal by {leader} rejected"
+        if k == APPROVED:
+            return f"Proposal by {leader} approved: {self.names(e.team)}"
+        if k == AUTO_FAIL:
+            return f"Mission {r} auto-fail after {e.value} rejections"
+        if k == MISSION_RESULT:
+            return f"Mission {r} result: {'Passed' if e.flag else 'Failed'} ({e.value}/{e.team.bit_count()})"
+        if k == ASSASSINATION:
+            return f"Assassin targeted {self.players[e.value]}: {'Evil' if e.flag else 'Good'} wins"
+        return KIND_NAMES[k]
+
+    # ---------- PERSISTENCE ----------
+    def rows(self, start=0):
+        return [e.row() for e in self.events[start:]]
+
+    @classmethod
+    def from_rows(cls, players, rows):
+        log = cls(players)
+        for row in rows:
+            log.add(*row)
+        return log
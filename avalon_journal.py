@@ -0,0 +1,84 @@
+import json
+import os
+
+# Crash-safe journal of the game being played in the GUI.
+# The first line is a JSON header (players, role toggles, rules, seed); every later line
+# is one user action: a one-letter code and an optional int, e.g. "T 13" for proposing
+# the team with bitmask 13.  The deal and the leaders come from the seed, so feeding the
+# actions back through AvalonApp rebuilds the game and lands on the screen it was on.
+# Each record reaches the OS as soon as it is written, so a crash of the app loses
+# nothing; the fsync that also survives a power cut is batched.
+
+JOURNAL_PATH = "avalon.journal"
+JOURNAL_VERSION = 1
+SYNC_EVERY = 16    # records between fsyncs
+GAME_OVER = 'E'    # last record of a finished game; nothing to resume after it
+
+
+class Journal:
+    __slots__ = ('path', 'file', 'pending')
+
+    def __init__(self, path, file):
+        self.path = path
+        self.file = file
+        self.pending = 0
+
+    @classmethod
+    def start(cls, path, header):
+        # a new game replaces whatever journal was there
+        f = open(path, 'w', encoding='utf-8', newline='\n')
+        j = cls(path, f)
+        f.write(json.dumps(dict(header, version=JOURNAL_VERSION), separators=(',', ':')) + "\n")
+        j.sync()
+        return j
+
+    @classmethod
+    def resume(cls, path):
+        # (journal reopened for appending, header, records) for an unfinished game, else None.
+        # A torn last line from a crash mid-write is cut off.
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        end = data.rfind(b"\n") + 1
+        lines = data[:end].decode('utf-8').splitlines()
+        if not lines:
+            return None
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return None
+        if not isinstance(header, dict) or header.get('version') != JOURNAL_VERSION:
+            return None
+        records = []
+        for line in lines[1:]:
+            code, _, arg = line.partition(' ')
+            records.append((code, int(arg) if arg else None))
+        if records and records[-1][0] == GAME_OVER:
+            return None
+        f = open(path, 'r+', encoding='utf-8', newline='\n')
+        f.truncate(end)
+        f.seek(end)
+        return cls(path, f), header, records
+
+    def write(self, code, arg=None):
+        self.file.write(code + "\n" if arg is None else f"{code} {arg}\n")
+        self.file.flush()
+        self.pending += 1
+        if self.pending >= SYNC_EVERY:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+
+    def finish(self):
+        self.write(GAME_OVER)
+        self.close()
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import resource
+import time
+
+from avalon_rules import STANDARD
+from avalon_server import GameServer, PORT, run_shard, shard_of
+from avalon_client import Bot
+
+# Load test for the multi-room server: ROOMS rooms of Bots play GAMES games each, all at
+# once, and every action is timed from send to the server's ack.  With --workers 0 the
+# server runs in this process, so its CPU time includes the bots'; with --workers K the
+# rooms are sharded across K server processes and only their CPU time is counted.
+# Rooms per core = rooms / (server CPU seconds / wall seconds).
+# Latency percentiles are reported overall and per action (start, propose, vote, mission,
+# assassinate), and each run is appended as one JSON line to LOADTEST_PATH so runs can be
+# compared over time.
+
+LOADTEST_PATH = "avalon_loadtest.jsonl"
+ACTIONS = ('start', 'propose', 'vote', 'mission', 'assassinate')
+
+
+def percentile(sorted_xs, q):
+    return sorted_xs[min(len(sorted_xs) - 1, int(q * len(sorted_xs)))] if sorted_xs else 0.0
+
+
+def latency_summary(latencies):
+    # count and p50 / p95 / p99 in milliseconds of unsorted seconds
+    xs = sorted(latencies)
+    return {'count': len(xs), 'p50_ms': percentile(xs, 0.50) * 1000, 'p95_ms': percentile(xs, 0.95) * 1000,
+            'p99_ms': percentile(xs, 0.99) * 1000}
+
+
+async def drive(host, port, rooms, players, games, workers, seed, toggles):
+    # plays every room to the end; returns the bots
+    bots, plays = [], []
+    for r in range(rooms):
+        room = f"room{r}"
+        # straight to the room's shard rather than through a redirect
+        room_port = port + shard_of(room, workers) if workers else port
+        start = dict(toggles, count=players)
+        for i in range(players):
+            bot = Bot(f"P{i}", None if seed is None else seed + r * players + i)
+            bots.append(bot)
+            plays.append(bot.play(host, room_port, room, start if i == 0 else None, games))
+    await asyncio.gather(*plays)
+    return bots
+
+
+async def wait_ready(host, port, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+            continue
+        writer.close()
+        return
+
+
+def load_test(rooms=100, players=7, games=1, workers=0, host='127.0.0.1', port=PORT, seed=0,
+              toggles=None):
+    toggles = toggles or {}
+    # every bot holds a socket, and so does the server when it runs here; the limit is
+    # only raised when that many do not fit under it
+    need = rooms * players * (1 if workers else 2) + 64
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < need:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (need if hard == resource.RLIM_INFINITY else min(need, hard), hard))
+
+    if workers:
+        procs = [multiprocessing.Process(target=run_shard, args=(host, port, STANDARD, k, workers), daemon=True)
+                 for k in range(workers)]
+        for p in procs:
+            p.start()
+
+        async def sharded():
+            for k in range(workers):
+                await wait_ready(host, port + k)
+            start = time.perf_counter()
+            bots = await drive(host, port, rooms, players, games, workers, seed, toggles)
+            return bots, time.perf_counter() - start
+
+        try:
+            bots, wall = asyncio.run(sharded())
+        finally:
+            for p in procs:
+                p.terminate()
+                p.join()
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu = usage.ru_utime + usage.ru_stime
+    else:
+        async def local():
+            server = await GameServer(host, 0, client_seeds=True).start()
+            start = time.perf_counter()
+            try:
+                bots = await drive(host, server.port, rooms, players, games, 0, seed, toggles)
+            finally:
+                await server.close()
+            return bots, time.perf_counter() - start
+
+        cpu = time.process_time()
+        bots, wall = asyncio.run(local())
+        cpu = time.process_time() - cpu
+
+    by_action = {op: [] for op in ACTIONS}
+    for b in bots:
+        for op, t in b.latencies:
+            by_action[op].append(t)
+    overall = latency_summary([t for ts in by_action.values() for t in ts])
+    return dict({'rooms': rooms, 'players': players, 'clients': rooms * players, 'games': rooms * games,
+                 'workers': workers, 'actions': overall['count'], 'seconds': wall, 'cpu_seconds': cpu,
+                 'actions_per_second': overall['count'] / wall, 'games_per_second': rooms * games / wall,
+                 'rooms_per_core': rooms / (cpu / wall) if cpu else None},
+                **{k: v for k, v in overall.items() if k != 'count'},
+                by_action={op: latency_summary(ts) for op, ts in by_action.items() if ts})
+
+
+def save_result(result, path=LOADTEST_PATH):
+    # one JSON line per run, stamped so a series of runs can be plotted
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(dict(result, time=time.time()), separators=(',', ':')) + "\n")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Load-test the multi-room Avalon server with simulated clients")
+    ap.add_argument("--rooms", type=int, default=100)
+    ap.add_argument("--players", type=int, default=7)
+    ap.add_argument("--games", type=int, default=1, help="games per room")
+    ap.add_argument("--workers", type=int, default=0, help="server processes; 0 runs the server in this one")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=PORT, help="base port of the sharded server")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=LOADTEST_PATH, help="JSON-lines file the result is appended to; '' for none")
+    args = ap.parse_args()
+    r = load_test(args.rooms, args.players, args.games, args.workers, args.host, args.port, args.seed)
+    print(f"{r['games']} games in {r['rooms']} rooms of {r['players']} ({r['clients']} clients) on "
+          f"{r['workers'] or 'the same'} process{'es' if r['workers'] > 1 else ''}: "
+          f"{r['actions']} actions in {r['seconds']:.2f}s ({r['actions_per_second']:,.0f}/s, "
+          f"{r['games_per_second']:,.1f} games/s)")
+    print(f"Latency p50 {r['p50_ms']:.2f}ms, p95 {r['p95_ms']:.2f}ms, p99 {r['p99_ms']:.2f}ms")
+    for op, a in r['by_action'].items():
+        print(f"  {op:<12}{a['count']:>8}  p50 {a['p50_ms']:.2f}ms, p95 {a['p95_ms']:.2f}ms, p99 {a['p99_ms']:.2f}ms")
+    print(f"Server CPU {r['cpu_seconds']:.2f}s, "
+          + (f"{r['rooms_per_core']:,.0f} rooms per core" if r['rooms_per_core'] else "no CPU time measured"))
+    if args.out:
+        save_result(r, args.out)
@@ -0,0 +1,142 @@
+from avalon_engine import team_masks, PROPOSAL, TEAM_VOTE, MISSION, ASSASSIN, R_ASSASSIN, R_PERCIVAL
+from avalon_deduce import EvilPosterior, best_teams, rank_merlin
+
+# Seat-level player policies for the headless engine.
+# play_game() asks each seat's Player for the decisions the GUI takes from buttons:
+# the leader's team (start_team_proposal), the team vote (ask_vote), the mission
+# card (show_next_mission_vote) and the assassin's target (resolve_assassin).
+#
+# A Player may read the public state of the engine plus its own seat's row:
+# eng.role_of[seat] and eng.knowledge[seat].  Anything else is cheating.
+
+
+class Player:
+    # base policy; subclasses override the decisions they care about
+    def start(self, eng, seat, rng):
+        # called once the deck is dealt
+        self.seat = seat
+        self.bit = 1 << seat
+        self.evil = eng.evil_mask & self.bit != 0
+
+    def propose(self, eng, rng):
+        # bitmask of eng.team_size() players
+        raise NotImplementedError
+
+    def vote_team(self, eng, rng):
+        # True to approve eng.team
+        raise NotImplementedError
+
+    def vote_mission(self, eng, rng):
+        # 'Pass' or 'Fail'; a Good player's Fail is counted as Pass anyway
+        return 'Fail' if self.evil else 'Pass'
+
+    def assassinate(self, eng, rng):
+        # seat index of the target; only called on the assassin
+        raise NotImplementedError
+
+
+class RandomPlayer(Player):
+    def propose(self, eng, rng):
+        return rng.choice(team_masks(eng.n, eng.team_size()))
+
+    def vote_team(self, eng, rng):
+        return rng.random() < 0.5
+
+    def vote_mission(self, eng, rng):
+        return 'Fail' if self.evil and rng.random() < 0.5 else 'Pass'
+
+    def assassinate(self, eng, rng):
+        targets = eng.assassin_targets_mask()
+        return rng.choice([i for i in range(eng.n) if targets >> i & 1])
+
+
+class TrustingPlayer(RandomPlayer):
+    # approves the first team it sees; a baseline for how much Evil gains from sabotage alone
+    def vote_team(self, eng, rng):
+        return True
+
+
+class DeductionPlayer(Player):
+    # keeps two Evil posteriors: the public one, and its own conditioned on what it saw at the reveal
+    approve_threshold = 0.3
+
+    def start(self, eng, seat, rng):
+        Player.start(self, eng, seat, rng)
+        self.public = EvilPosterior(eng.n, eng.evil_count)
+        self.private = EvilPosterior(eng.n, eng.evil_count)
+        seen = eng.knowledge[seat]
+        if self.evil:
+            self.private.restrict(known_evil=seen | self.bit)
+        elif seen and eng.role_of[seat] != R_PERCIVAL:  # Percival's pair says nothing about sides
+            self.private.restrict(known_good=self.bit, known_evil=seen)
+        else:
+            self.private.restrict(known_good=self.bit)
+
+    def _sync(self, eng):
+        for m in eng.missions[self.public.observed:]:
+            for post in (self.public, self.private):
+                if m.team:
+                    post.observe(m.team, m.fails)
+                else:
+                    post.observed += 1
+
+    def propose(self, eng, rng):
+        self._sync(eng)
+        # Evil picks what looks best to the table; Good what looks best to itself. Both sit on their team.
+        post = self.public if self.evil else self.private
+        return best_teams(post, eng.rules, eng.round_number, 1, self.bit)[0][0]
+
+    def vote_team(self, eng, rng):
+        if eng.failed_proposals + 1 >= eng.max_failed_proposals:
+            return True
+        self._sync(eng)
+        if self.evil:
+            return self.private.p_clean(eng.team) < 1.0  # approve teams carrying a known Evil
+        need = eng.fails_needed[eng.round_number-1]
+        return self.private.p_pass(eng.team, need) >= self.approve_threshold
+
+    def assassinate(self, eng, rng):
+        return rank_merlin(eng)[0][0]
+
+
+class BlindAssassinPlayer(DeductionPlayer):
+    # same table play, but the assassin guesses blindly; the gap to 'deduction' is what the model is worth
+    def assassinate(self, eng, rng):
+        return RandomPlayer.assassinate(self, eng, rng)
+
+
+PLAYERS = {'random': RandomPlayer, 'trusting': TrustingPlayer, 'deduction': DeductionPlayer,
+           'deduction-blind-assassin': BlindAssassinPlayer}
+
+
+def play_game(eng, players, deck=None, leader_index=None):
+    # plays one game to the end with one Player per seat; returns the winning team.
+    # All randomness, the players' included, comes from the game's seeded eng.rng.
+    rng = eng.rng
+    eng.assign_roles(deck, leader_index)
+    for seat, pl in enumerate(players):
+        pl.start(eng, seat, rng)
+    while True:
+        phase = eng.phase
+        if phase == PROPOSAL:
+            eng.propose_mask(players[eng.leader].propose(eng, rng))
+        elif phase == TEAM_VOTE:
+            approvals = 0
+            for seat, pl in enumerate(players):
+                if pl.vote_team(eng, rng):
+                    approvals |= 1 << seat
+            eng.vote_team(approvals)
+        elif phase == MISSION:
+            fails = 0
+            team = eng.team
+            while team:
+                low = team & -team
+                if players[low.bit_length() - 1].vote_mission(eng, rng) == 'Fail':
+                    fails |= low
+                team ^= low
+            eng.resolve_mission(fails)
+        elif phase == ASSASSIN:
+            assassin = eng.role_masks[R_ASSASSIN].bit_length() - 1
+            eng.assassinate(players[assassin].assassinate(eng, rng))
+        else:
+            return eng.winning_team
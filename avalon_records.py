@@ -0,0 +1,206 @@
+import argparse
+import mmap
+import os
+import struct
+import time
+
+try:
+    import numpy as np
+except ImportError:  # only the array view needs it; reading record by record does not
+    np = None
+
+from avalon_engine import ROLE_NAMES
+
+# Fixed-width binary records of finished games, for simulation-sized corpora.
+# Every game is RECORD_SIZE (26) bytes, little-endian:
+#   deal      u64      role id of every seat, 3 bits each, seat 0 in the low bits
+#   teams     5 x u16  team bitmask of each mission, 0 for an auto-fail or a mission not played
+#   meta      u16      players (5 bits) | role toggles M,P,O,D (4 bits) | winner (2 bits, 1 Good, 2 Evil)
+#                      | assassinated seat + 1 (5 bits, 0 for none)
+#   missions  5 x u8   leader seat (4 bits) | fails (3 bits) | passed (1 bit)
+#   rounds    u8       missions played (3 bits) | team proposals rejected (5 bits, saturates at 31)
+# A file is a 16-byte header and then records.  A torn last record (a crash mid-write)
+# is ignored by the reader and cut off before the writer appends.
+# The layout fits up to 16 players and 5 missions; a mission's fail count saturates at 7.
+
+RECORD = struct.Struct('<Q5HH5BB')
+RECORD_SIZE = RECORD.size
+HEADER = struct.Struct('<4sHH8x')  # magic, version, record size
+MAGIC = b'AVR1'
+VERSION = 1
+MAX_PLAYERS = 16
+MAX_MISSIONS = 5
+BATCH = 1 << 16  # records per write / per read chunk
+WINNERS = (None, "Good", "Evil")
+
+if np is not None:
+    # the same bytes as a NumPy structured array
+    DTYPE = np.dtype([('deal', '<u8'), ('teams', '<u2', (MAX_MISSIONS,)), ('meta', '<u2'),
+                      ('missions', 'u1', (MAX_MISSIONS,)), ('rounds', 'u1')])
+
+
+def pack_game(eng):
+    # record fields of one finished engine, in RECORD order
+    if eng.n > MAX_PLAYERS or len(eng.missions) > MAX_MISSIONS:
+        raise ValueError(f"Records hold up to {MAX_PLAYERS} players and {MAX_MISSIONS} missions.")
+    deal = 0
+    for i, r in enumerate(eng.role_of):
+        deal |= r << 3 * i
+    teams = [0] * MAX_MISSIONS
+    info = [0] * MAX_MISSIONS
+    for j, m in enumerate(eng.missions):
+        teams[j] = m.team
+        info[j] = m.leader | min(m.fails, 7) << 4 | m.passed << 7
+    toggles = eng.use_merlin | eng.use_percival << 1 | eng.use_oberon << 2 | eng.use_mordred << 3
+    winner = WINNERS.index(eng.winning_team)
+    killed = 0 if eng.assassinated is None else eng.assassinated + 1
+    rejected = sum(p.approved is False for p in eng.proposals)
+    return (deal, *teams, eng.n | toggles << 5 | winner << 9 | killed << 11, *info,
+            len(eng.missions) | min(rejected, 31) << 3)
+
+
+def pack(eng):
+    return RECORD.pack(*pack_game(eng))
+
+
+# ---------- DECODING ----------
+def meta_fields(meta):
+    # (players, toggles bits, winner, assassinated seat or None)
+    killed = meta >> 11 & 31
+    return meta & 31, meta >> 5 & 15, WINNERS[meta >> 9 & 3], killed - 1 if killed else None
+
+
+def deal_roles(deal, n):
+    return [deal >> 3 * i & 7 for i in range(n)]
+
+
+def decode(row):
+    # one raw record as the structures the app uses: roles by seat and past_missions-style dicts
+    deal, teams, meta, info, rounds = row[0], row[1:6], row[6], row[7:12], row[12]
+    n, toggles, winner, killed = meta_fields(meta)
+    missions = [{'leader': x & 15, 'team': t, 'fails': x >> 4 & 7, 'pass': x >> 7 == 1}
+                for t, x in zip(teams[:rounds & 7], info)]
+    return {'players': n, 'toggles': tuple(bool(toggles >> b & 1) for b in range(4)),
+            'roles': [ROLE_NAMES[r] for r in deal_roles(deal, n)], 'missions': missions,
+            'winner': winner, 'assassinated': killed, 'rejected': rounds >> 3}
+
+
+# ---------- FILES ----------
+class RecordWriter:
+    # appends records through one preallocated buffer, written out BATCH records at a time
+    def __init__(self, path, batch=BATCH):
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size:
+            with open(path, 'rb') as f:
+                _check_header(f.read(HEADER.size))
+            # cut off a torn record so appends stay aligned
+            whole = HEADER.size + (size - HEADER.size) // RECORD_SIZE * RECORD_SIZE
+            if whole != size:
+                os.truncate(path, whole)
+        self.file = open(path, 'ab')
+        if not size:
+            self.file.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE))
+        self.buf = bytearray(batch * RECORD_SIZE)
+        self.batch = batch
+        self.used = 0
+
+    def add(self, eng):
+        RECORD.pack_into(self.buf, self.used * RECORD_SIZE, *pack_game(eng))
+        self.used += 1
+        if self.used == self.batch:
+            self.flush()
+
+    def write_packed(self, data):
+        # records already packed elsewhere, e.g. by simulation workers
+        if len(data) % RECORD_SIZE:
+            raise ValueError("Packed data is not a whole number of records.")
+        self.flush()
+        self.file.write(data)
+
+    def flush(self):
+        if self.used:
+            self.file.write(memoryview(self.buf)[:self.used * RECORD_SIZE])
+            self.used = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordReader:
+    # memory-maps a record file; nothing is read until records are asked for, and
+    # the OS pages the file in as it is streamed
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER.size:
+            self.file.close()
+            raise ValueError(f"{path} is not an Avalon record file.")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        _check_header(self.map[:HEADER.size])
+        self.count = (size - HEADER.size) // RECORD_SIZE
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return self.rows()
+
+    def rows(self, start=0, stop=None, chunk=BATCH):
+        # raw record tuples, unpacked straight from the mapping a chunk at a time
+        stop = self.count if stop is None else min(stop, self.count)
+        with memoryview(self.map) as mv:
+            for first in range(start, stop, chunk):
+                last = min(first + chunk, stop)
+                yield from RECORD.iter_unpack(mv[HEADER.size + first * RECORD_SIZE:HEADER.size + last * RECORD_SIZE])
+
+    def array(self):
+        # every record as a read-only NumPy structured array over the mapping, no copy;
+        # drop the array before close()
+        if np is None:
+            raise ImportError("The array view needs NumPy; iterate the reader instead.")
+        return np.frombuffer(self.map, dtype=DTYPE, count=self.count, offset=HEADER.size)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _check_header(data):
+    # a file cut off inside its header is as unreadable as one with the wrong magic
+    if len(data) < HEADER.size:
+        raise ValueError("Not an Avalon record file of this version.")
+    magic, version, size = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION or size != RECORD_SIZE:
+        raise ValueError("Not an Avalon record file of this version.")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Summarise an Avalon record file (see avalon_sim.py --records)")
+    ap.add_argument("path")
+    args = ap.parse_args()
+    start = time.perf_counter()
+    with RecordReader(args.path) as reader:
+        if np is not None:
+            a = reader.array()
+            good = int(((a['meta'] >> 9 & 3) == 1).sum())
+            del a
+        else:
+            good = sum(row[6] >> 9 & 3 == 1 for row in reader)
+        total = len(reader)
+    took = time.perf_counter() - start
+    mb = total * RECORD_SIZE / 1e6
+    print(f"{total} games, Good won {good / total:.1%}" if total else "No games")
+    print(f"Read {mb:.1f} MB in {took:.2f}s ({mb / took:,.0f} MB/s)")
@@ -0,0 +1,131 @@
+import json
+
+# Rule tables for "The Resistance: Avalon".
+# A RuleSet is built once and never changes; everything the engine and GUI need
+# per player count (evil count, mission sizes, fails needed per round) is
+# precomputed into tuples indexed by player count, so each lookup is O(1).
+# House rules are just another RuleSet, e.g. RuleSet.load("my_rules.json").
+
+STANDARD_EVIL_COUNTS = {5:2, 6:2, 7:3, 8:3, 9:3, 10:4}
+STANDARD_MISSION_SIZES = {5: [2, 3, 2, 3, 3], 6: [2, 3, 4, 3, 4], 7: [2, 3, 3, 4, 4], 8: [3, 4, 4, 5, 5],
+                          9: [3, 4, 4, 5, 5], 10: [3, 4, 4, 5, 5]}
+# mission numbers (1-based) that need 2 fails, per player count
+STANDARD_DOUBLE_FAIL_ROUNDS = {7: [4], 8: [4], 9: [4], 10: [4]}
+# the deduction tables hold seat sets in 16 bits and score teams over 2**n entries
+MAX_PLAYERS = 16
+
+
+class RuleSet:
+    __slots__ = ('name', 'player_counts', 'min_players', 'max_players', 'missions', 'wins_needed',
+                 'max_failed_proposals', '_evil', '_sizes', '_fails_needed')
+
+    def __init__(self, evil_counts=None, mission_sizes=None, double_fail_rounds=None, max_failed_proposals=5,
+                 name="standard"):
+        evil_counts = STANDARD_EVIL_COUNTS if evil_counts is None else evil_counts
+        mission_sizes = STANDARD_MISSION_SIZES if mission_sizes is None else mission_sizes
+        double_fail_rounds = STANDARD_DOUBLE_FAIL_ROUNDS if double_fail_rounds is None else double_fail_rounds
+        # json keys come in as strings
+        evil_counts = {int(k): int(v) for k, v in evil_counts.items()}
+        mission_sizes = {int(k): [int(x) for x in v] for k, v in mission_sizes.items()}
+        double_fail_rounds = {int(k): [int(x) for x in v] for k, v in double_fail_rounds.items()}
+
+        counts = sorted(evil_counts)
+        if not counts or counts != sorted(mission_sizes):
+            raise ValueError("evil_counts and mission_sizes must cover the same player counts.")
+        if counts[0] < 2 or counts[-1] > MAX_PLAYERS:
+            raise ValueError(f"Player counts must be between 2 and {MAX_PLAYERS}.")
+        missions = len(mission_sizes[counts[0]])
+        if missions % 2 == 0:
+            raise ValueError("The number of missions must be odd.")
+        if max_failed_proposals < 1:
+            raise ValueError("max_failed_proposals must be at least 1.")
+
+        evil = [0]*(counts[-1] + 1)
+        sizes = [()]*(counts[-1] + 1)
+        fails_needed = [()]*(counts[-1] + 1)
+        for n in counts:
+            if not 1 <= evil_counts[n] < n:
+                raise ValueError(f"{n} players cannot have {evil_counts[n]} Evil.")
+            if len(mission_sizes[n]) != missions or not all(1 <= s <= n for s in mission_sizes[n]):
+                raise ValueError(f"Mission sizes for {n} players must be {missions} sizes between 1 and {n}.")
+            df = double_fail_rounds.get(n, [])
+            if not all(1 <= r <= missions for r in df):
+                raise ValueError(f"Double-fail rounds for {n} players must be between 1 and {missions}.")
+            evil[n] = evil_counts[n]
+            sizes[n] = tuple(mission_sizes[n])
+            fails_needed[n] = tuple(2 if r in df else 1 for r in range(1, missions + 1))
+
+        s = object.__setattr__
+        s(self, 'name', name)
+        s(self, 'player_counts', tuple(counts))
+        s(self, 'min_players', counts[0])
+        s(self, 'max_players', counts[-1])
+        s(self, 'missions', missions)
+        s(self, 'wins_needed', missions // 2 + 1)
+        s(self, 'max_failed_proposals', max_failed_proposals)
+        s(self, '_evil', tuple(evil))
+        s(self, '_sizes', tuple(sizes))
+        s(self, '_fails_needed', tuple(fails_needed))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("RuleSet is immutable")
+
+    def __reduce__(self):
+        # rebuild from the tables so rule sets can be sent to pool workers
+        return (RuleSet, (self.evil_counts(), self.mission_sizes(), self.double_fail_rounds(),
+                          self.max_failed_proposals, self.name))
+
+    def __repr__(self):
+        return f"RuleSet({self.name!r}, players {self.min_players}-{self.max_players})"
+
+    # ---------- LOOKUPS ----------
+    def supports(self, n):
+        return self.min_players <= n <= self.max_players and self._sizes[n] != ()
+
+    def evil(self, n):
+        return self._evil[n]
+
+    def good(self, n):
+        return n - self._evil[n]
+
+    def sizes(self, n):
+        return self._sizes[n]
+
+    def team_size(self, n, round_number):
+        return self._sizes[n][round_number-1]
+
+    def fails_needed(self, n):
+        # fails needed to fail each mission, per round
+        return self._fails_needed[n]
+
+    def double_fail(self, n):
+        # 1-based mission numbers that need 2 fails
+        return tuple(r for r, f in enumerate(self._fails_needed[n], 1) if f > 1)
+
+    # ---------- TABLES ----------
+    def evil_counts(self):
+        return {n: self._evil[n] for n in self.player_counts}
+
+    def mission_sizes(self):
+        return {n: list(self._sizes[n]) for n in self.player_counts}
+
+    def double_fail_rounds(self):
+        return {n: list(self.double_fail(n)) for n in self.player_counts if self.double_fail(n)}
+
+    def to_dict(self):
+        return {'name': self.name, 'evil_counts': self.evil_counts(), 'mission_sizes': self.mission_sizes(),
+                'double_fail_rounds': self.double_fail_rounds(), 'max_failed_proposals': self.max_failed_proposals}
+
+    @classmethod
+    def from_dict(cls, d):
+        # missing tables fall back to the standard ones
+        return cls(d.get('evil_counts'), d.get('mission_sizes'), d.get('double_fail_rounds'),
+                   d.get('max_failed_proposals', 5), d.get('name', 'custom'))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+STANDARD = RuleSet()
@@ -0,0 +1,506 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import secrets
+import zlib
+from collections import deque
+
+from avalon_rules import RuleSet, STANDARD
+from avalon_engine import (AvalonEngine, ROLE_NAMES, PROPOSAL, TEAM_VOTE, MISSION, ASSASSIN, OVER, R_ASSASSIN,
+                           R_PERCIVAL, setup_error)
+from avalon_votes import VoteRound
+
+# Networked tables: an asyncio server hosts engines and every player joins from their own
+# device, so nobody passes a phone around.  Messages are JSON objects, one per line.
+#   client -> server   {"op": "join", "name": "Alice", "room": "table 3", "seq": 41, "token": ...}
+#                                     room optional; seq and the seat's token when rejoining
+#                      {"op": "watch", "room": "table 3", "seq": 41}   a spectator, who never plays
+#                      {"op": "sync", "seq": 41}     resend everything after state 41
+#                      {"op": "start", "merlin": true, "percival": true, "oberon": false, "mordred": false}
+#                      {"op": "propose", "team": ["Alice", "Bob"]}
+#                      {"op": "vote", "approve": true}
+#                      {"op": "mission", "vote": "Pass"}
+#                      {"op": "assassinate", "target": "Bob"}
+#   server -> client   {"type": "seat", "name": ..., "token": ...}   once, to whoever takes a new seat
+#                      {"type": "lobby", "players": [...]}
+#                      {"type": "role", ...}      only to the player it belongs to
+#                      {"type": "state", "seq": ...}   the whole public state
+#                      {"type": "delta", "seq": ...}   only what changed since state seq - 1
+#                      {"type": "ack", "id": ...} / {"type": "error", "message": ..., "id": ...}
+#                      {"type": "redirect", "port": ...}   the room lives on another shard
+# A message carrying an "id" is answered with an ack or an error with the same id.
+# Deals come from seeds the server draws; a client's "seed" is only honoured on a server
+# started with client_seeds=True (loopback tests).  A dropped seat is only given back to a
+# device that presents the seat's token, since rejoining hands out the seat's role.
+# Secret actions are concurrent: everyone gets their role at the same moment, and the team
+# and mission votes are taken from all voters in parallel, in whatever order they arrive
+# (avalon_votes.py).  With a vote timeout, a vote closes at its deadline and whoever has
+# not voted is counted as Reject / Pass; the state then lists them under "late".
+# After the first full state of a game, every change goes out as a delta: the fields whose
+# values changed, plus the new "log" lines and "missions" to append.  A delta is encoded
+# once for everyone at the table and for every spectator.  The table keeps the last
+# HISTORY deltas and an encoded snapshot of the current state, so a device that rejoins
+# or syncs with the seq it last saw gets the deltas it missed, or the snapshot if it is
+# too far behind.
+# One process hosts any number of rooms; with --workers K, rooms are sharded across K
+# processes on ports PORT..PORT+K-1 by a hash of the room id, and a device that joins
+# on the wrong port is redirected.  A room nobody is seated at any more is reclaimed
+# once ROOM_GRACE seconds pass without a player rejoining, whatever phase its game is in.
+
+PORT = 8765
+HISTORY = 256  # deltas kept per table for catching up
+ROOM_GRACE = 600.0  # seconds a room with no connected players is kept for them to rejoin
+
+
+def encode(msg):
+    return (json.dumps(msg, separators=(',', ':')) + "\n").encode()
+
+
+def is_int(x):
+    return isinstance(x, int) and not isinstance(x, bool)
+
+
+def shard_of(room, shards):
+    # stable across processes, unlike hash()
+    return zlib.crc32(room.encode()) % shards
+
+
+class Table:
+    # one game and the devices playing it
+    __slots__ = ('rules', 'vote_timeout', 'client_seeds', 'names', 'tokens', 'writers', 'watchers', 'engine',
+                 'vote', 'late', 'seq', 'public', 'history', 'snapshot', 'reaper')
+
+    def __init__(self, rules=STANDARD, vote_timeout=None, client_seeds=False):
+        self.rules = rules
+        self.vote_timeout = vote_timeout  # seconds each vote stays open; None waits for everyone
+        self.client_seeds = client_seeds  # let 'start' pick the deal; tests only, it gives the deal away
+        self.names = []      # seats in join order
+        self.tokens = {}     # name -> secret that reclaims the seat
+        self.writers = {}    # name -> StreamWriter of the connected device
+        self.watchers = set()  # StreamWriters of spectators
+        self.engine = None
+        self.vote = None     # the open VoteRound during a team or mission vote
+        self.late = 0        # bitmask of players who missed the last vote's deadline
+        self.seq = 0         # bumped on every state broadcast
+        self.public = None   # the public state as last broadcast; None until the game's first state
+        self.history = deque(maxlen=HISTORY)  # (seq, encoded delta) of the latest broadcasts
+        self.snapshot = None  # encoded full state at self.seq, built when someone needs it
+        self.reaper = None   # timer that reclaims the room while no player is connected
+
+    # ---------- SENDING ----------
+    def send(self, name, msg):
+        w = self.writers.get(name)
+        if w is not None:
+            w.write(encode(msg))
+
+    def broadcast(self, msg):
+        self.broadcast_data(encode(msg))
+
+    def broadcast_data(self, data):
+        for w in self.writers.values():
+            w.write(data)
+        for w in self.watchers:
+            w.write(data)
+
+    def waiting(self):
+        # players the table is waiting on
+        eng = self.engine
+        if eng is None or eng.phase == OVER:
+            return []
+        if eng.phase == PROPOSAL:
+            return [eng.current_leader]
+        if eng.phase in (TEAM_VOTE, MISSION):
+            return eng.names(self.vote.waiting())
+        return [eng.assassin()]
+
+    def fields(self):
+        # the public state but for the append-only log and missions
+        eng = self.engine
+        over = eng.phase == OVER
+        vote = self.vote
+        return {'players': self.names, 'phase': eng.phase, 'round': eng.round_number, 'leader': eng.current_leader,
+                'team_size': eng.team_size(), 'double_fail': eng.needs_double_fail(), 'team': eng.selected_team,
+                'failed_proposals': eng.failed_proposals, 'max_failed_proposals': eng.max_failed_proposals,
+                'good_wins': eng.good_wins, 'evil_wins': eng.evil_wins, 'waiting': self.waiting(),
+                'late': eng.names(self.late),
+                'deadline': None if vote is None or vote.closes is None else round(vote.remaining(), 1),
+                'winner': eng.winning_team if over else None, 'roles': eng.roles if over else None}
+
+    def publish(self):
+        # broadcasts what changed since the last broadcast; the whole state for a new game
+        eng = self.engine
+        self.seq += 1
+        self.snapshot = None
+        pub = self.public
+        if pub is None:
+            self.public = dict(self.fields(), log=list(eng.metadata), missions=eng.past_missions)
+            self.history.clear()
+            self.broadcast_data(self.full())
+            return
+        delta = {'type': 'delta', 'seq': self.seq}
+        for k, v in self.fields().items():
+            if pub[k] != v:
+                pub[k] = delta[k] = v
+        # both lists only ever grow during a game
+        log = pub['log']
+        if len(eng.metadata) > len(log):
+            delta['log'] = eng.metadata[len(log):]
+            log.extend(delta['log'])
+        missions = pub['missions']
+        if len(eng.missions) > len(missions):
+            delta['missions'] = eng.past_missions[len(missions):]
+            missions.extend(delta['missions'])
+        data = encode(delta)
+        self.history.append((self.seq, data))
+        self.broadcast_data(data)
+
+    def full(self):
+        # the current state in one message, encoded once per change however many ask for it
+        if self.snapshot is None:
+            self.snapshot = encode(dict(self.public, type='state', seq=self.seq))
+        return self.snapshot
+
+    def sync(self, writer, seq=None):
+        # brings a device that last saw state `seq` up to date; returns an error string or None
+        if self.public is None:
+            return "No game has started."
+        h = self.history
+        if seq is None or seq > self.seq or seq < self.seq and (not h or h[0][0] > seq + 1):
+            writer.write(self.full())
+        else:
+            # the missed deltas are the newest self.seq - seq of the history
+            for i in range(len(h) - (self.seq - seq), len(h)):
+                writer.write(h[i][1])
+        return None
+
+    def role(self, name):
+        # what this player may know, as in the GUI's role reveal
+        eng = self.engine
+        i = eng.index[name]
+        r = eng.role_of[i]
+        seen = eng.knowledge[i]
+        return {'type': 'role', 'name': name, 'role': ROLE_NAMES[r], 'evil': eng.is_evil(name),
+                'sees': eng.names(seen),
+                'sees_as': None if not seen else 'Merlin or Morgana' if r == R_PERCIVAL else 'Evil'}
+
+    # ---------- MESSAGES ----------
+    def handle(self, name, msg):
+        # applies one message from player `name`; returns an error string or None
+        op = msg.get('op')
+        eng = self.engine
+        if op == 'start':
+            if eng is not None and eng.phase != OVER:
+                return "A game is already running."
+            toggles = (bool(msg.get('merlin', True)), bool(msg.get('percival', True)), bool(msg.get('oberon')),
+                       bool(msg.get('mordred')))
+            err = setup_error(self.names, *toggles, self.rules)
+            if err:
+                return err[1]
+            seed = msg.get('seed') if self.client_seeds else None
+            if seed is not None and not (is_int(seed) and 0 <= seed < 1 << 64):
+                return "Bad seed."
+            self.engine = eng = AvalonEngine(self.names, *toggles, self.rules, seed=seed)
+            eng.assign_roles()
+            self.late = 0
+            self.public = None  # the new game goes out in full
+            # every device gets its role at once
+            for p in self.names:
+                self.send(p, self.role(p))
+        elif eng is None or eng.phase == OVER:
+            return "No game is running."
+        elif op == 'propose':
+            if eng.phase != PROPOSAL or name != eng.current_leader:
+                return "Only the leader proposes, during the proposal phase."
+            team = msg.get('team')
+            if not isinstance(team, list) or not all(isinstance(p, str) for p in team):
+                return "Bad team."
+            try:
+                eng.propose_team(team)
+            except ValueError as e:
+                return str(e)
+            # everyone votes on the team; a missing vote is a Reject
+            self.open_vote(eng.all_mask, False)
+        elif op == 'vote':
+            vote = self.vote
+            if not isinstance(msg.get('approve'), bool):
+                return "Bad vote."
+            if eng.phase != TEAM_VOTE or not vote.cast(eng.index[name], msg['approve']):
+                return "No team vote is waiting for you."
+            # the last vote in closes the round, which broadcasts the outcome
+            if vote.closed:
+                return None
+        elif op == 'mission':
+            vote = self.vote
+            if msg.get('vote') not in ('Pass', 'Fail'):
+                return "Bad vote."
+            if eng.phase != MISSION or not vote.cast(eng.index[name], msg.get('vote') == 'Fail'):
+                return "No mission vote is waiting for you."
+            if vote.closed:
+                return None
+        elif op == 'assassinate':
+            if eng.phase != ASSASSIN or eng.role_of[eng.index[name]] != R_ASSASSIN:
+                return "Only the assassin chooses, after the last mission."
+            if not isinstance(msg.get('target'), str) or msg['target'] not in eng.index:
+                return "Unknown player."
+            eng.resolve_assassin(msg['target'])
+        else:
+            return f"Unknown request {op!r}."
+        # also after a single vote, so every device sees who is still to vote
+        self.publish()
+        return None
+
+    # ---------- VOTES ----------
+    def open_vote(self, voters, default):
+        if self.vote is not None:
+            self.vote.cancel()
+        self.vote = VoteRound(voters, default, self.vote_timeout, self.vote_closed)
+
+    def vote_closed(self, vote):
+        # every vote is in, or the deadline passed
+        eng = self.engine
+        self.vote = None
+        self.late = vote.late
+        if eng.phase == TEAM_VOTE:
+            eng.vote_team(vote.yes)
+        else:
+            # Good players' Fail cards are ignored by the engine
+            eng.resolve_mission(vote.yes)
+        if eng.phase == MISSION:
+            # only the team plays mission cards; a missing card is a Pass
+            self.open_vote(eng.team, False)
+        self.publish()
+
+    def join(self, name, writer, seq=None, token=None):
+        # seq and token: the last state this device saw and its seat's token, when it is rejoining
+        if name in self.writers:
+            return "That name is taken."
+        if name in self.names:
+            if token is None or not secrets.compare_digest(str(token), self.tokens[name]):
+                return "That seat is taken."
+        else:
+            if self.engine is not None:
+                return "The game has started; only its players can rejoin."
+            if len(self.names) >= self.rules.max_players:
+                return "The table is full."
+            self.names.append(name)
+            self.tokens[name] = secrets.token_hex(16)
+            writer.write(encode({'type': 'seat', 'name': name, 'token': self.tokens[name]}))
+        self.writers[name] = writer
+        if self.reaper is not None:
+            self.reaper.cancel()
+            self.reaper = None
+        if self.engine is None:
+            self.broadcast({'type': 'lobby', 'players': self.names})
+        else:
+            # a rejoining device gets its role and what it missed of the table
+            self.send(name, self.role(name))
+            self.sync(writer, seq)
+        return None
+
+    def watch(self, writer, seq=None):
+        self.watchers.add(writer)
+        if self.public is None:
+            writer.write(encode({'type': 'lobby', 'players': self.names}))
+        else:
+            self.sync(writer, seq)
+
+    def unwatch(self, writer):
+        self.watchers.discard(writer)
+
+    def leave(self, name):
+        self.writers.pop(name, None)
+        if self.engine is None and name in self.names:
+            self.names.remove(name)
+            del self.tokens[name]
+            self.broadcast({'type': 'lobby', 'players': self.names})
+
+    def idle(self):
+        # nobody connected and no game to come back to
+        return not self.writers and not self.watchers and (self.engine is None or self.engine.phase == OVER)
+
+    def close(self):
+        # the room is reclaimed: its vote is dropped and its spectators are hung up on
+        if self.vote is not None:
+            self.vote.cancel()
+        for w in self.watchers:
+            w.close()
+
+
+class GameServer:
+    # rooms of one process; shard / shards say which rooms are this process's to host
+    def __init__(self, host='127.0.0.1', port=PORT, rules=STANDARD, shard=0, shards=1, vote_timeout=None,
+                 client_seeds=False, grace=ROOM_GRACE):
+        self.host = host
+        self.port = port
+        self.rules = rules
+        self.vote_timeout = vote_timeout
+        self.client_seeds = client_seeds
+        self.grace = grace     # seconds an abandoned room waits for its players
+        self.shard = shard
+        self.shards = shards
+        self.rooms = {}        # room id -> Table
+        self.connections = {}  # StreamWriter -> task serving it
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.serve, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]  # when started on port 0
+        return self
+
+    async def close(self):
+        # hangs up on every device and waits for their handlers to finish
+        self.server.close()
+        tasks = list(self.connections.values())
+        for w in list(self.connections):
+            w.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def table(self):
+        return Table(self.rules, self.vote_timeout, self.client_seeds)
+
+    def join(self, room, name, writer, seq=None, token=None):
+        # a new room id opens a table; returns an error string or None
+        table = self.rooms.get(room)
+        if table is None:
+            table = self.table()
+        err = table.join(name, writer, seq, token)
+        if err is None:
+            self.rooms[room] = table
+        return err
+
+    def watch(self, room, writer, seq=None):
+        # spectators may wait in a room before anyone sits down
+        table = self.rooms.get(room)
+        if table is None:
+            table = self.rooms[room] = self.table()
+            self.reap_later(room, table)
+        table.watch(writer, seq)
+
+    def leave(self, room, table, name, writer):
+        if name is None:
+            table.unwatch(writer)
+        else:
+            table.leave(name)
+        if self.rooms.get(room) is not table:
+            return  # already reclaimed
+        if table.idle():
+            del self.rooms[room]
+        elif not table.writers:
+            self.reap_later(room, table)
+
+    def reap_later(self, room, table):
+        if table.reaper is None:
+            table.reaper = asyncio.get_running_loop().call_later(self.grace, self.reap, room, table)
+
+    def reap(self, room, table):
+        # the grace period ran out with nobody seated rejoining
+        table.reaper = None
+        if self.rooms.get(room) is table and not table.writers:
+            del self.rooms[room]
+            table.close()
+
+    async def serve(self, reader, writer):
+        # one connected device: the first message must be a join or a watch
+        name = room = table = None
+        self.connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    msg = None
+                if not isinstance(msg, dict):
+                    writer.write(encode({'type': 'error', 'message': "Bad message."}))
+                    await writer.drain()
+                    continue
+                op = msg.get('op')
+                if msg.get('seq') is not None and not is_int(msg['seq']):
+                    err = "Bad seq."
+                elif room is not None:
+                    if op == 'sync':
+                        err = table.sync(writer, msg.get('seq'))
+                    elif name is None:
+                        err = "Spectators only watch."
+                    else:
+                        err = table.handle(name, msg)
+                elif op not in ('join', 'watch'):
+                    err = "Join first."
+                else:
+                    want = str(msg.get('room', ''))
+                    shard = shard_of(want, self.shards)
+                    if shard != self.shard:
+                        writer.write(encode({'type': 'redirect', 'port': self.port - self.shard + shard}))
+                        break
+                    if op == 'watch':
+                        self.watch(want, writer, msg.get('seq'))
+                        err = None
+                        room, table = want, self.rooms[want]
+                    elif not isinstance(msg.get('name'), str) or not msg['name']:
+                        err = "Bad name."
+                    else:
+                        err = self.join(want, msg['name'], writer, msg.get('seq'), msg.get('token'))
+                        if err is None:
+                            name, room, table = msg['name'], want, self.rooms[want]
+                if err:
+                    reply = {'type': 'error', 'message': err}
+                    if 'id' in msg:
+                        reply['id'] = msg['id']
+                    writer.write(encode(reply))
+                elif 'id' in msg:
+                    writer.write(encode({'type': 'ack', 'id': msg['id']}))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.connections[writer]
+            if room is not None:
+                self.leave(room, table, name, writer)
+            writer.close()
+
+
+async def run(host, port, rules, shard=0, shards=1, vote_timeout=None):
+    server = await GameServer(host, port + shard, rules, shard, shards, vote_timeout).start()
+    print(f"Avalon rooms on {host}:{server.port}" + (f" (shard {shard + 1} of {shards})" if shards > 1 else ""))
+    async with server.server:
+        await server.server.serve_forever()
+
+
+def run_shard(host, port, rules, shard, shards, vote_timeout=None):
+    try:
+        asyncio.run(run(host, port, rules, shard, shards, vote_timeout))
+    except KeyboardInterrupt:
+        pass
+
+
+def serve_sharded(host, port, rules, shards, vote_timeout=None):
+    # one process per shard on ports port..port+shards-1
+    if not port:
+        raise ValueError("Sharding needs a fixed base port.")
+    procs = [multiprocessing.Process(target=run_shard, args=(host, port, rules, k, shards, vote_timeout), daemon=True)
+             for k in range(shards)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Host Avalon tables that players join from their own devices")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--rules", default=None, help="JSON file with house-rule tables")
+    ap.add_argument("--workers", type=int, default=1, help="processes to shard rooms across")
+    ap.add_argument("--vote-timeout", type=float, default=60.0,
+                    help="seconds each team / mission vote stays open; 0 waits for everyone")
+    args = ap.parse_args()
+    rules = RuleSet.load(args.rules) if args.rules else STANDARD
+    timeout = args.vote_timeout or None
+    if args.workers > 1:
+        serve_sharded(args.host, args.port, rules, args.workers, timeout)
+    else:
+        run_shard(args.host, args.port, rules, 0, 1, timeout)
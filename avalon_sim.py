@@ -0,0 +1,119 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from avalon_rules import RuleSet, STANDARD
+from avalon_records import RecordWriter, pack
+from avalon_engine import AvalonEngine, derive_seed, setup_error
+from avalon_players import PLAYERS, play_game
+
+# Monte Carlo win-rate simulator.
+# Plays whole games on the headless engine, with one Player of the chosen policy
+# (avalon_players.py) at every seat, and reports Good/Evil win rates for every player
+# count and Merlin/Percival/Oberon/Mordred toggle.
+
+# (merlin, percival, oberon, mordred); invalid mixes are skipped per player count
+ROLE_TOGGLES = list(itertools.product((True, False), repeat=4))
+
+
+def sim_names(n):
+    return [f"P{i}" for i in range(n)]
+
+
+def game_seed(seed, n, toggles, game):
+    # seed of one game in a sweep; replay it with play_game(AvalonEngine(..., seed=game_seed(...)), players)
+    return derive_seed(seed, n, toggles, game)
+
+
+def simulate(n, toggles, first, games, policy, seed, rules=STANDARD, records=None):
+    # plays games first..first+games-1 of one configuration with a `policy` Player class at
+    # every seat; returns [good_wins, evil_wins].
+    # records: a bytearray that gets every game's binary record (avalon_records.py)
+    names = sim_names(n)
+    wins = [0, 0]
+    for g in range(first, first + games):
+        eng = AvalonEngine(names, *toggles, rules, log=False, seed=game_seed(seed, n, toggles, g))
+        wins[play_game(eng, [policy() for _ in range(n)]) == "Evil"] += 1
+        if records is not None:
+            records += pack(eng)
+    return wins
+
+
+def _run_task(task):
+    n, toggles, first, games, policy_name, seed, rules, keep = task
+    records = bytearray() if keep else None
+    return (n, toggles), simulate(n, toggles, first, games, PLAYERS[policy_name], seed, rules, records), records
+
+
+def valid_configs(counts=None, toggles=ROLE_TOGGLES, rules=STANDARD):
+    counts = rules.player_counts if counts is None else counts
+    return [(n, t) for n in counts for t in toggles if setup_error(sim_names(n), *t, rules) is None]
+
+
+def sweep(games, policy_name='random', seed=0, workers=None, counts=None, toggles=ROLE_TOGGLES, rules=STANDARD,
+          records_path=None):
+    # splits every configuration into per-worker chunks and merges the chunk results
+    # into {(n, toggles): [good_wins, evil_wins]}; each game is seeded from (seed, config,
+    # game number), so the totals do not depend on how many workers ran them.
+    # With records_path every game is also appended there as a binary record, in task order.
+    workers = workers or os.cpu_count() or 1
+    tasks = []
+    for n, t in valid_configs(counts, toggles, rules):
+        chunk, extra = divmod(games, workers)
+        first = 0
+        for w in range(workers):
+            g = chunk + (w < extra)
+            if g:
+                tasks.append((n, t, first, g, policy_name, seed, rules, records_path is not None))
+            first += g
+    results = {}
+    writer = RecordWriter(records_path) if records_path else None
+    if workers == 1:
+        done = map(_run_task, tasks)
+    else:
+        pool = ProcessPoolExecutor(workers)
+        done = pool.map(_run_task, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+    for key, (g, e), records in done:
+        acc = results.setdefault(key, [0, 0])
+        acc[0] += g
+        acc[1] += e
+        if writer:
+            writer.write_packed(records)
+    if workers != 1:
+        pool.shutdown()
+    if writer:
+        writer.close()
+    return results
+
+
+def toggle_label(t):
+    return "".join(c if on else "-" for c, on in zip("MPOD", t))
+
+
+def format_results(results):
+    lines = ["Players  Roles  Games      Good    Evil"]
+    for (n, t), (g, e) in sorted(results.items(), key=lambda kv: (kv[0][0], [not x for x in kv[0][1]])):
+        total = g + e
+        lines.append(f"{n:>7}  {toggle_label(t)}   {total:<9}  {g/total:6.1%}  {e/total:6.1%}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Monte Carlo Avalon win rates (roles: M=Merlin, P=Percival, O=Oberon, D=Mordred)")
+    ap.add_argument("--games", type=int, default=10000, help="games per configuration")
+    ap.add_argument("--policy", choices=sorted(PLAYERS), default="random")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    ap.add_argument("--players", type=int, nargs="*", default=None, help="player counts (default: all the rules allow)")
+    ap.add_argument("--rules", default=None, help="JSON file with house-rule tables (see avalon_rules.py)")
+    ap.add_argument("--records", default=None, help="append every game to this binary record file")
+    args = ap.parse_args()
+    rules = RuleSet.load(args.rules) if args.rules else STANDARD
+    start = time.perf_counter()
+    res = sweep(args.games, args.policy, args.seed, args.workers, args.players, rules=rules, records_path=args.records)
+    took = time.perf_counter() - start
+    print(format_results(res))
+    played = sum(g + e for g, e in res.values())
+    print(f"\n{played} games in {took:.2f}s ({played/took:,.0f} games/s)")
@@ -0,0 +1,205 @@
+import argparse
+import time
+
+from avalon_engine import EVIL_ROLES
+from avalon_events import APPROVED, PROPOSAL
+from avalon_records import RecordReader, decode
+from avalon_sim import toggle_label
+
+# Streaming statistics over finished games: source -> filters -> Stats.
+# A source yields one game at a time in the shape the app already uses:
+#   {'id': position, 'players': n, 'config': "MP--", 'roles': {name: role},
+#    'past_missions': [{'leader', 'team', 'pass', 'fails'}, ...], 'winning_team': "Good"/"Evil",
+#    'proposals': {round: [proposed, approved]} from the game's event log, None without one}
+# Filters are generator functions, and Stats only keeps counters, so memory stays flat
+# however many games go through.  A Feed remembers how far it has read a growing source
+# (record file or archive) and update() folds in only the games appended since.
+
+
+# ---------- SOURCES ----------
+# each takes the position to start after and yields games whose 'id' is the position after them
+def engine_games(engines, start=0):
+    for i, eng in enumerate(engines):
+        if i >= start:
+            yield game_from_engine(eng, i + 1)
+
+
+def game_from_engine(eng, game_id=0):
+    toggles = (eng.use_merlin, eng.use_percival, eng.use_oberon, eng.use_mordred)
+    return {'id': game_id, 'players': eng.n, 'config': toggle_label(toggles), 'roles': eng.roles,
+            'past_missions': eng.past_missions, 'winning_team': eng.winning_team,
+            'proposals': proposal_counts(eng.metadata) if eng.log else None}
+
+
+def proposal_counts(log):
+    # {round: [proposed, approved]} off the event log's per-kind index
+    out = {}
+    for e in log.of_kind(PROPOSAL):
+        out.setdefault(e.round_number, [0, 0])[0] += 1
+    for e in log.of_kind(APPROVED):
+        out[e.round_number][1] += 1
+    return out
+
+
+def record_games(path, start=0):
+    # games from a binary record file (avalon_records.py); seats are named P0, P1, ...
+    with RecordReader(path) as reader:
+        rows = reader.rows(start)
+        try:
+            for i, row in enumerate(rows, start + 1):
+                g = decode(row)
+                names = [f"P{s}" for s in range(g['players'])]
+                yield {'id': i, 'players': g['players'], 'config': toggle_label(g['toggles']),
+                       'roles': dict(zip(names, g['roles'])),
+                       'past_missions': [{'leader': names[m['leader']], 'team': [names[s] for s in range(len(names))
+                                                                                 if m['team'] >> s & 1],
+                                          'pass': m['pass'], 'fails': m['fails']} for m in g['missions']],
+                       'winning_team': g['winner'], 'proposals': None}
+        finally:
+            rows.close()  # releases the view of the mapping before the reader closes it
+
+
+def archive_games(conn, start=0):
+    # games from the SQLite archive (avalon_archive.py), by game id
+    from avalon_archive import load_log
+    games = conn.execute("SELECT id, players, config, winner FROM games WHERE id > ? ORDER BY id", (start,))
+    for gid, n, config, winner in games:
+        seats = conn.execute("SELECT player, role FROM seats WHERE game = ? ORDER BY seat", (gid,)).fetchall()
+        names = [p for p, _ in seats]
+        missions = conn.execute("SELECT leader, team, passed, fails FROM missions WHERE game = ? ORDER BY round",
+                                (gid,)).fetchall()
+        yield {'id': gid, 'players': n, 'config': config, 'roles': dict(seats),
+               'past_missions': [{'leader': names[leader], 'team': [names[s] for s in range(n) if team >> s & 1],
+                                  'pass': bool(passed), 'fails': fails} for leader, team, passed, fails in missions],
+               'winning_team': winner, 'proposals': proposal_counts(load_log(conn, gid)) or None}
+
+
+# ---------- FILTERS ----------
+def where(players=None, config=None, winner=None, role=None):
+    # a filter keeping games that match every given condition; role: some seat has it
+    def keep(games):
+        for g in games:
+            if players is not None and g['players'] != players:
+                continue
+            if config is not None and g['config'] != config:
+                continue
+            if winner is not None and g['winning_team'] != winner:
+                continue
+            if role is not None and role not in g['roles'].values():
+                continue
+            yield g
+    return keep
+
+
+# ---------- AGGREGATES ----------
+class Stats:
+    __slots__ = ('games', 'roles', 'seats', 'configs', 'missions', 'proposals')
+
+    def __init__(self):
+        self.games = 0
+        self.roles = {}     # role -> [seats, wins]
+        self.seats = {}     # seat position -> [games, wins]
+        self.configs = {}   # (players, config) -> [games, good wins]
+        self.missions = {}  # (players, round) -> [played, passed]; auto-fails are not played
+        self.proposals = {}  # (players, round) -> [proposed, approved], from games with an event log
+
+    def add(self, g):
+        self.games += 1
+        good_won = g['winning_team'] == "Good"
+        for seat, role in enumerate(g['roles'].values()):
+            won = good_won != (role in EVIL_ROLES)
+            acc = self.roles.setdefault(role, [0, 0])
+            acc[0] += 1
+            acc[1] += won
+            acc = self.seats.setdefault(seat, [0, 0])
+            acc[0] += 1
+            acc[1] += won
+        acc = self.configs.setdefault((g['players'], g['config']), [0, 0])
+        acc[0] += 1
+        acc[1] += good_won
+        for r, m in enumerate(g['past_missions'], 1):
+            if m['team']:
+                acc = self.missions.setdefault((g['players'], r), [0, 0])
+                acc[0] += 1
+                acc[1] += m['pass']
+        for r, (proposed, approved) in (g['proposals'] or {}).items():
+            acc = self.proposals.setdefault((g['players'], r), [0, 0])
+            acc[0] += proposed
+            acc[1] += approved
+
+    def consume(self, games):
+        for g in games:
+            self.add(g)
+        return self
+
+    def report(self):
+        lines = [f"{self.games} games", "", "Role        Seats     Win rate"]
+        for role, (n, w) in sorted(self.roles.items()):
+            lines.append(f"{role:<10}  {n:<8}  {w / n:6.1%}")
+        lines += ["", "Seat  Games     Win rate"]
+        for seat, (n, w) in sorted(self.seats.items()):
+            lines.append(f"{seat:>4}  {n:<8}  {w / n:6.1%}")
+        lines += ["", "Players  Roles  Games     Good"]
+        for (p, c), (n, w) in sorted(self.configs.items()):
+            lines.append(f"{p:>7}  {c}   {n:<8}  {w / n:6.1%}")
+        lines += ["", "Players  Round  Played    Passed"]
+        for (p, r), (n, w) in sorted(self.missions.items()):
+            lines.append(f"{p:>7}  {r:>5}  {n:<8}  {w / n:6.1%}")
+        if self.proposals:
+            lines += ["", "Players  Round  Proposed  Approved"]
+            for (p, r), (n, w) in sorted(self.proposals.items()):
+                lines.append(f"{p:>7}  {r:>5}  {n:<8}  {w / n:6.1%}")
+        return "\n".join(lines)
+
+
+class Feed:
+    # source(start) -> games after position `start`; filters are applied in order
+    def __init__(self, source, filters=(), stats=None):
+        self.source = source
+        self.filters = filters
+        self.stats = Stats() if stats is None else stats
+        self.position = 0
+
+    def update(self):
+        # folds in the games appended since the last update; returns how many were read
+        read = 0
+
+        def tracked():
+            # the position moves past filtered-out games too
+            nonlocal read
+            for g in self.source(self.position):
+                self.position = g['id']
+                read += 1
+                yield g
+
+        games = tracked()
+        for f in self.filters:
+            games = f(games)
+        self.stats.consume(games)
+        return read
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Streaming statistics over archived or simulated Avalon games")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--records", help="binary record file (avalon_sim.py --records)")
+    src.add_argument("--db", help="SQLite game archive (avalon_archive.py)")
+    ap.add_argument("--players", type=int, default=None)
+    ap.add_argument("--config", default=None, help='role toggles, e.g. "MP--"')
+    ap.add_argument("--follow", type=float, default=0, help="re-read new games every this many seconds")
+    args = ap.parse_args()
+    if args.records:
+        source = lambda start: record_games(args.records, start)
+    else:
+        from avalon_archive import connect
+        conn = connect(args.db)
+        source = lambda start: archive_games(conn, start)
+    feed = Feed(source, [where(args.players, args.config)])
+    while True:
+        t = time.perf_counter()
+        read = feed.update()
+        print(feed.stats.report())
+        print(f"\nRead {read} new games in {time.perf_counter() - t:.2f}s")
+        if not args.follow:
+            break
+        time.sleep(args.follow)
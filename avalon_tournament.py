@@ -0,0 +1,132 @@
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from avalon_rules import RuleSet, STANDARD
+from avalon_engine import AvalonEngine, derive_seed, setup_error
+from avalon_players import PLAYERS, play_game
+
+# Self-play tournament between Player policies (avalon_players.py).
+# Every game seats a random mix of the entrants; batches of games run on a process
+# pool and come back as compact rows.  The parent streams every row to a CSV file as
+# it arrives and keeps Elo-style ratings.  Game g's seat mix and play come from
+# derive_seed(seed, g) alone, so replay_game() can rebuild any row of the CSV.
+
+ELO_K = 16
+
+
+def replay_game(entrants, counts, toggles, rules, seed, game, log=False):
+    # plays tournament game number `game` again; returns (engine, seat entrant indices)
+    game_seed = derive_seed(seed, game)
+    n = counts[game_seed % len(counts)]
+    eng = AvalonEngine([f"P{i}" for i in range(n)], *toggles, rules, log=log, seed=game_seed)
+    seats = [eng.rng.randrange(len(entrants)) for _ in range(n)]
+    play_game(eng, [PLAYERS[entrants[s]]() for s in seats])
+    return eng, seats
+
+
+def play_batch(task):
+    # worker side: plays games first..first+games-1 and returns (n, seats, evil mask, good won) rows
+    entrants, counts, toggles, rules, seed, first, games = task
+    rows = []
+    for g in range(first, first + games):
+        eng, seats = replay_game(entrants, counts, toggles, rules, seed, g)
+        rows.append((eng.n, seats, eng.evil_mask, eng.winning_team == "Good"))
+    return rows
+
+
+class EloTable:
+    # one rating per entrant plus one per side, so the side's built-in edge is not
+    # credited to whichever entrants happened to sit there
+    def __init__(self, entrants, k=ELO_K):
+        self.k = k
+        self.ratings = dict.fromkeys(entrants, 1500.0)
+        self.side = {"Good": 0.0, "Evil": 0.0}
+        self.games = dict.fromkeys(entrants, 0)
+        self.wins = dict.fromkeys(entrants, 0)
+
+    def update(self, good, evil, good_won):
+        # good / evil: entrant names per seat on each side
+        r = self.ratings
+        rg = sum(r[x] for x in good) / len(good) + self.side["Good"]
+        re = sum(r[x] for x in evil) / len(evil) + self.side["Evil"]
+        expected = 1.0 / (1.0 + 10 ** ((re - rg) / 400))
+        delta = self.k * (good_won - expected)
+        for x in good:
+            r[x] += delta / len(good)
+            self.games[x] += 1
+            self.wins[x] += good_won
+        for x in evil:
+            r[x] -= delta / len(evil)
+            self.games[x] += 1
+            self.wins[x] += not good_won
+        self.side["Good"] += delta
+        self.side["Evil"] -= delta
+
+    def table(self):
+        lines = ["Entrant          Elo   Seat win rate   Seats"]
+        for x in sorted(self.ratings, key=self.ratings.get, reverse=True):
+            g = self.games[x]
+            rate = self.wins[x] / g if g else 0.0
+            lines.append(f"{x:<14} {self.ratings[x]:6.0f}   {rate:12.1%}   {g}")
+        lines.append(f"Side offsets: Good {self.side['Good']:+.0f}, Evil {self.side['Evil']:+.0f}")
+        return "\n".join(lines)
+
+
+def run_tournament(entrants, games, out_path, counts=None, toggles=(True, True, False, False), rules=STANDARD,
+                   seed=0, workers=None, batch=200):
+    counts = [n for n in (counts or rules.player_counts) if setup_error([f"P{i}" for i in range(n)], *toggles, rules) is None]
+    if not counts:
+        raise ValueError("No player count supports the chosen roles.")
+    for x in entrants:
+        if x not in PLAYERS:
+            raise ValueError(f"Unknown player policy {x!r}.")
+    workers = workers or os.cpu_count() or 1
+    tasks = [(entrants, counts, toggles, rules, seed, first, min(batch, games - first))
+             for first in range(0, games, batch)]
+
+    elo = EloTable(entrants)
+    game_id = 0
+    with open(out_path, "w", newline="") as f:
+        out = csv.writer(f)
+        out.writerow(["game", "players", "winner", "good", "evil"])
+        if workers == 1:
+            done = map(play_batch, tasks)
+        else:
+            pool = ProcessPoolExecutor(workers)
+            done = pool.map(play_batch, tasks)
+        for rows in done:
+            for n, seats, evil_mask, good_won in rows:
+                good = [entrants[s] for i, s in enumerate(seats) if not evil_mask >> i & 1]
+                evil = [entrants[s] for i, s in enumerate(seats) if evil_mask >> i & 1]
+                elo.update(good, evil, good_won)
+                out.writerow([game_id, n, "Good" if good_won else "Evil", "+".join(good), "+".join(evil)])
+                game_id += 1
+            f.flush()
+        if workers != 1:
+            pool.shutdown()
+    return elo
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Self-play Avalon tournament between player policies")
+    ap.add_argument("entrants", nargs="*", default=sorted(PLAYERS), help=f"policies from {sorted(PLAYERS)}")
+    ap.add_argument("--games", type=int, default=2000)
+    ap.add_argument("--out", default="tournament.csv", help="per-game results, streamed as CSV")
+    ap.add_argument("--players", type=int, nargs="*", default=None)
+    ap.add_argument("--no-percival", action="store_true")
+    ap.add_argument("--oberon", action="store_true")
+    ap.add_argument("--mordred", action="store_true")
+    ap.add_argument("--rules", default=None, help="JSON file with house-rule tables")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+    rules = RuleSet.load(args.rules) if args.rules else STANDARD
+    toggles = (True, not args.no_percival, args.oberon, args.mordred)
+    start = time.perf_counter()
+    table = run_tournament(args.entrants, args.games, args.out, args.players, toggles, rules, args.seed, args.workers)
+    took = time.perf_counter() - start
+    print(table.table())
+    print(f"\n{args.games} games in {took:.2f}s, results in {args.out}")
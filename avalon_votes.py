@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+# Secret votes taken from every voter at once.
+# A VoteRound is one team vote or one mission vote: voters is a bitmask, votes arrive in
+# any order and are recorded per player, and the round closes as soon as the last voter
+# is in or its deadline passes, so it takes as long as the slowest player rather than
+# the sum of all of them.  Voters who miss the deadline get the default vote (Reject for
+# a team, Pass for a mission card) and are remembered in `late`.
+# The server casts votes as they come off the wire.
+
+
+class VoteRound:
+    # yes is the bitmask of Approve votes, or of Fail cards on a mission
+    __slots__ = ('voters', 'default', 'voted', 'yes', 'late', 'opened', 'closes', 'timer', 'on_close')
+
+    def __init__(self, voters, default=False, timeout=None, on_close=None):
+        self.voters = voters
+        self.default = default
+        self.voted = 0
+        self.yes = 0
+        self.late = 0
+        self.on_close = on_close  # called with the round once it closes
+        self.opened = time.monotonic()
+        self.closes = None if timeout is None else self.opened + timeout
+        self.timer = None if timeout is None else asyncio.get_running_loop().call_later(timeout, self.expire)
+
+    @property
+    def closed(self):
+        return self.voted == self.voters
+
+    def waiting(self):
+        # bitmask of voters still to vote
+        return self.voters & ~self.voted
+
+    def remaining(self):
+        # seconds to the deadline, or None without one
+        return None if self.closes is None else max(0.0, self.closes - time.monotonic())
+
+    def cast(self, i, yes):
+        # records player i's vote; False when no vote is due from them
+        bit = 1 << i
+        if not self.waiting() & bit:
+            return False
+        self.voted |= bit
+        if yes:
+            self.yes |= bit
+        if self.closed:
+            self._close()
+        return True
+
+    def expire(self):
+        # the deadline passed: whoever has not voted gets the default
+        missing = self.waiting()
+        if not missing:
+            return
+        self.late = missing
+        if self.default:
+            self.yes |= missing
+        self.voted = self.voters
+        self._close()
+
+    def cancel(self):
+        # drops the round without closing it, e.g. when the game is restarted
+        if self.timer is not None:
+            self.timer.cancel()
+        self.on_close = None
+
+    def _close(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        if self.on_close is not None:
+            self.on_close(self)
+
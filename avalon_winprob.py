@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from avalon_rules import RuleSet, STANDARD
+from avalon_engine import AvalonEngine, R_MERLIN
+from avalon_players import PLAYERS, play_game
+from avalon_sim import ROLE_TOGGLES, game_seed, sim_names, toggle_label, valid_configs
+
+# Probability that Good wins from every public state of a game.
+# A public state is (players, role toggles, good wins, evil wins, rejections this round);
+# the round is good wins + evil wins + 1.  For each configuration, simulated games give
+# the chance a proposal is approved per (round, rejections) and a mission passes per
+# round, and the chance the assassin finds Merlin; dynamic programming over the state
+# graph then gives Good's chances everywhere, including states the games never reached.
+# The table is one flat array of u16 (probability * 65535) with a slot per player count
+# and toggle mix, so a lookup is an index computation.  Saved as a JSON header line and
+# the array's bytes, little-endian.
+
+WINPROB_PATH = "avalon_winprob.bin"
+VERSION = 1
+SCALE = 65535
+
+
+def toggle_bits(toggles):
+    # (merlin, percival, oberon, mordred) as bits 0-3
+    return sum(bool(t) << k for k, t in enumerate(toggles))
+
+
+# ---------- ESTIMATING ----------
+def transition_counts(n, toggles, games, policy, seed=0, rules=STANDARD):
+    # ([proposals, approved] per (round, rejections) flattened, [missions, passed] per round, [shots, hits])
+    R = rules.max_failed_proposals
+    votes = [[0, 0] for _ in range(rules.missions * R)]
+    missions = [[0, 0] for _ in range(rules.missions)]
+    shots = [0, 0]
+    names = sim_names(n)
+    for g in range(games):
+        eng = AvalonEngine(names, *toggles, rules, log=False, seed=game_seed(seed, n, toggles, g))
+        play_game(eng, [policy() for _ in range(n)])
+        rnd = rejected = 0
+        for p in eng.proposals:
+            if p.round_number != rnd:
+                rnd, rejected = p.round_number, 0
+            c = votes[(rnd-1)*R + rejected]
+            c[0] += 1
+            c[1] += p.approved
+            rejected += not p.approved
+        for r, m in enumerate(eng.missions):
+            if m.team:  # auto-fails say nothing about missions
+                missions[r][0] += 1
+                missions[r][1] += m.passed
+        if eng.assassinated is not None:
+            shots[0] += 1
+            shots[1] += eng.role_of[eng.assassinated] == R_MERLIN
+    return votes, missions, shots
+
+
+def solve(counts, use_merlin, rules=STANDARD):
+    # Good's win probability per (good wins, evil wins, rejections), flattened as WinTable does.
+    # Rates are Laplace-smoothed, so a (round, rejections) the games never reached counts as a coin flip.
+    votes, missions, shots = counts
+    W, R = rules.wins_needed, rules.max_failed_proposals
+    approve = [(a + 1) / (k + 2) for k, a in votes]
+    passes = [(p + 1) / (k + 2) for k, p in missions]
+    hit = (shots[1] + 1) / (shots[0] + 2) if use_merlin else 0.0
+    p = [0.0] * ((W + 1) * (W + 1) * R)
+
+    def at(g, e, r):
+        return (g*(W+1) + e)*R + r
+
+    # later states first: more wins, then more rejections
+    for g in range(W, -1, -1):
+        for e in range(W, -1, -1):
+            if e == W:
+                continue  # Evil won; also the unreachable g == e == W
+            if g == W:
+                for r in range(R):
+                    p[at(g, e, r)] = 1.0 - hit
+                continue
+            rnd = g + e
+            mission = passes[rnd]*p[at(g+1, e, 0)] + (1 - passes[rnd])*p[at(g, e+1, 0)]
+            for r in range(R - 1, -1, -1):
+                a = approve[rnd*R + r]
+                # the last allowed rejection fails the mission
+                rejected = p[at(g, e+1, 0)] if r + 1 == R else p[at(g, e, r+1)]
+                p[at(g, e, r)] = a*mission + (1 - a)*rejected
+    return p
+
+
+def estimate(task):
+    # worker side: one configuration's probabilities
+    n, toggles, games, policy_name, seed, rules = task
+    counts = transition_counts(n, toggles, games, PLAYERS[policy_name], seed, rules)
+    return n, toggles, solve(counts, toggles[0], rules)
+
+
+# ---------- TABLE ----------
+class WinTable:
+    __slots__ = ('rules', 'size', 'values', 'filled', 'policy', 'games')
+
+    def __init__(self, rules=STANDARD, values=None, filled=0, policy=None, games=0):
+        self.rules = rules
+        W, R = rules.wins_needed, rules.max_failed_proposals
+        self.size = (W + 1) * (W + 1) * R  # entries per configuration
+        slots = (rules.max_players - rules.min_players + 1) * len(ROLE_TOGGLES)
+        self.values = array('H', bytes(2 * slots * self.size)) if values is None else values
+        self.filled = filled  # bit per configuration slot that has been estimated
+        self.policy = policy
+        self.games = games    # simulated games per configuration
+
+    def slot(self, n, toggles):
+        return (n - self.rules.min_players) * len(ROLE_TOGGLES) + toggle_bits(toggles)
+
+    def has(self, n, toggles):
+        return self.filled >> self.slot(n, toggles) & 1 == 1
+
+    def p_good(self, n, toggles, good_wins, evil_wins, rejections=0):
+        W, R = self.rules.wins_needed, self.rules.max_failed_proposals
+        return self.values[self.slot(n, toggles)*self.size + (good_wins*(W+1) + evil_wins)*R + rejections] / SCALE
+
+    def put(self, n, toggles, probs):
+        start = self.slot(n, toggles) * self.size
+        self.values[start:start + self.size] = array('H', (round(x * SCALE) for x in probs))
+        self.filled |= 1 << self.slot(n, toggles)
+
+    # ---------- GAMES ----------
+    def p_engine(self, eng):
+        # Good's chances in the engine's current public state
+        return self.p_good(eng.n, toggles_of(eng), eng.good_wins, eng.evil_wins, eng.failed_proposals)
+
+    def history(self, eng):
+        # Good's chances before every proposal of the game so far, then at the assassin phase and the end
+        n, toggles, R = eng.n, toggles_of(eng), self.rules.max_failed_proposals
+        g = e = r = 0
+        out = []
+        for p in eng.proposals:
+            if p.approved is None:
+                break
+            out.append(self.p_good(n, toggles, g, e, r))
+            if p.approved:
+                passed = eng.missions[g + e].passed
+                g += passed
+                e += not passed
+                r = 0
+            else:
+                r += 1
+                if r == R:
+                    e += 1
+                    r = 0
+        if g == self.rules.wins_needed and eng.use_merlin:
+            out.append(self.p_good(n, toggles, g, e))
+        if eng.winning_team is not None:
+            out.append(1.0 if eng.winning_team == "Good" else 0.0)
+        return out
+
+    # ---------- BUILDING ----------
+    @classmethod
+    def build(cls, games, policy_name='deduction', seed=0, workers=None, counts=None, rules=STANDARD):
+        # every valid configuration, one pool task each
+        table = cls(rules, policy=policy_name, games=games)
+        workers = workers or os.cpu_count() or 1
+        tasks = [(n, t, games, policy_name, seed, rules) for n, t in valid_configs(counts, ROLE_TOGGLES, rules)]
+        if workers == 1:
+            for res in map(estimate, tasks):
+                table.put(*res)
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                for res in pool.map(estimate, tasks):
+                    table.put(*res)
+        return table
+
+    # ---------- FILES ----------
+    def save(self, path=WINPROB_PATH):
+        header = {'version': VERSION, 'rules': self.rules.to_dict(), 'filled': self.filled, 'policy': self.policy,
+                  'games': self.games}
+        values = array('H', self.values)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(json.dumps(header, separators=(',', ':')).encode() + b"\n")
+            f.write(values.tobytes())
+        os.replace(tmp, path)  # a reader never sees half a table
+
+    @classmethod
+    def load(cls, path=WINPROB_PATH):
+        # the saved table, or None when there is none or it is from another version
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        if header.get('version') != VERSION:
+            return None
+        values = array('H')
+        values.frombytes(data)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        table = cls(RuleSet.from_dict(header['rules']), values, header['filled'], header['policy'], header['games'])
+        if len(values) != len(cls(table.rules).values):
+            return None
+        return table
+
+
+def toggles_of(eng):
+    return eng.use_merlin, eng.use_percival, eng.use_oberon, eng.use_mordred
+
+
+def format_table(table, n, toggles):
+    # Good's chances at the start of each proposal, no rejections, as a wins grid
+    W = table.rules.wins_needed
+    lines = [f"{n} players {toggle_label(toggles)}: Good's chances by (good wins down, evil wins across)",
+             "      " + "".join(f"{e:>7}" for e in range(W))]
+    for g in range(W + 1):
+        lines.append(f"{g:>6}" + "".join(f"{table.p_good(n, toggles, g, e):7.1%}" for e in range(W)))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build the table of Good's win probability per public game state")
+    ap.add_argument("--games", type=int, default=2000, help="simulated games per configuration")
+    ap.add_argument("--policy", choices=sorted(PLAYERS), default="deduction")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    ap.add_argument("--players", type=int, nargs="*", default=None, help="player counts (default: all the rules allow)")
+    ap.add_argument("--rules", default=None, help="JSON file with house-rule tables (see avalon_rules.py)")
+    ap.add_argument("--out", default=WINPROB_PATH)
+    args = ap.parse_args()
+    rules = RuleSet.load(args.rules) if args.rules else STANDARD
+    start = time.perf_counter()
+    table = WinTable.build(args.games, args.policy, args.seed, args.workers, args.players, rules)
+    table.save(args.out)
+    print(f"{bin(table.filled).count('1')} configurations in {time.perf_counter() - start:.2f}s "
+          f"-> {args.out} ({len(table.values) * 2:,} bytes)")
+    n = (args.players or [rules.max_players])[0]
+    print(format_table(table, n, (True, True, False, False)))
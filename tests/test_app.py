@@ -0,0 +1,84 @@
+import importlib.util
+import os
+import threading
+
+import pytest
+
+tk = pytest.importorskip("tkinter")
+
+# The GUI needs a display; without one these tests are skipped.
+PLAYERS = ["A", "B", "C", "D", "E"]
+ROLE_SCREENS = ('role_privacy', 'actual_role')
+
+
+@pytest.fixture
+def app():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display")
+    root.withdraw()
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "atr_2-3-1.py")
+    spec = importlib.util.spec_from_file_location("avalon_app", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    app = module.AvalonApp(root, seed=1, journal_path=None, archive_path=None, winprob_path=None)
+    for e, name in zip(app.entries, PLAYERS):
+        e.insert(0, name)
+    app.validate_and_confirm()
+    app.assign_roles()
+    for _ in PLAYERS:
+        app.show_actual_role()
+        app.next_reveal()
+    yield app
+    root.destroy()
+
+
+def test_undo_never_reaches_the_role_reveal(app):
+    assert app.current_screen == 'proposal'
+    assert not app.engine.undo_stack
+    app.undo()
+    assert app.current_screen == 'proposal'
+    app.propose((1 << app.engine.team_size()) - 1)
+    app.team_vote(app.engine.all_mask)
+    while app.engine.undo_stack:
+        app.undo()
+        assert app.current_screen not in ROLE_SCREENS
+    assert app.current_screen == 'proposal'
+
+
+def test_undo_after_a_result_skips_the_cards(app):
+    eng = app.engine
+    team = (1 << eng.team_size()) - 1
+    app.propose(team)
+    app.team_vote(eng.all_mask)
+    for _ in range(team.bit_count()):
+        app.submit_mission_vote('Fail')
+    app.show_mission_result()
+    app.undo()
+    # back before the first card: no single card can be replayed against the known result
+    assert app.current_screen == 'mission_vote'
+    assert eng.votes_in == 0 and eng.fail_votes == 0 and not eng.missions
+    app.undo()
+    assert app.current_screen == 'team_vote'
+
+
+def test_late_win_table_is_dropped(app, monkeypatch):
+    # a table read for the previous game must not show up in the one that replaced it
+    release = threading.Event()
+    table = type("Table", (), {'rules': app.rules, 'has': lambda self, n, toggles: True})()
+
+    def load(path):
+        release.wait(5)
+        return table
+
+    monkeypatch.setattr(app.load_win_table.__globals__['WinTable'], 'load', staticmethod(load))
+    app.winprob_path = "winprob.bin"
+    app.load_win_table()
+    app.winprob_path = None
+    app.load_win_table()  # the next game, with the chances switched off
+    release.set()
+    for t in threading.enumerate():
+        if t.name == "avalon-winprob":
+            t.join(5)
+    assert app.current_win_table() is None
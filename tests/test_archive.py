@@ -0,0 +1,26 @@
+from avalon_archive import ArchiveWriter, connect, game_count, game_record, pass_rate, win_rate
+from avalon_engine import AvalonEngine
+from avalon_players import PLAYERS, play_game
+
+
+def test_fresh_archive_has_the_config_column(tmp_path):
+    conn = connect(str(tmp_path / "games.db"))
+    columns = [c[1] for c in conn.execute("PRAGMA table_info(games)")]
+    assert "config" in columns and "roles" not in columns
+
+
+def test_writer_archives_games_for_the_queries(tmp_path):
+    path = str(tmp_path / "games.db")
+    writer = ArchiveWriter(path)
+    names = ["A", "B", "C", "D", "E"]
+    winners = []
+    for seed in range(5):
+        eng = AvalonEngine(names, seed=seed)
+        winners.append(play_game(eng, [PLAYERS['random']() for _ in names]))
+        writer.put(game_record(eng))
+    writer.close()
+    conn = connect(path)
+    assert game_count(conn) == 5
+    assert win_rate(conn, config="MP--") == (25, sum(2 if w == "Evil" else 3 for w in winners))
+    played, passed = pass_rate(conn, players=5)
+    assert 0 < played and 0 <= passed <= played
@@ -0,0 +1,222 @@
+import random
+from itertools import combinations
+from math import comb
+
+import pytest
+
+from avalon_deduce import DEFAULT_FAIL_RATE, EvilConstraints, EvilPosterior, best_teams, legal_proposals, merlin_scores, score_teams
+from avalon_engine import AvalonEngine, R_ASSASSIN, R_EVIL, R_GOOD, R_MERLIN, R_OBERON, R_PERCIVAL
+from avalon_rules import STANDARD
+
+# Every result is checked against brute force: all Evil sides of the table enumerated
+# as seat tuples, each weighted by the likelihood of the whole mission history.
+
+
+def random_history(n, evil_count, missions, seed, p=DEFAULT_FAIL_RATE):
+    # (true Evil seats, [(team mask, fails)]) with each Evil on a team failing at rate p
+    rng = random.Random(seed)
+    evil = set(rng.sample(range(n), evil_count))
+    history = []
+    for _ in range(missions):
+        team = rng.sample(range(n), rng.randint(2, n - 2))
+        fails = sum(i in evil and rng.random() < p for i in team)
+        history.append((sum(1 << i for i in team), fails))
+    return evil, history
+
+
+def brute_weights(n, evil_count, history, p=DEFAULT_FAIL_RATE, known_good=(), known_evil=()):
+    # {Evil seat tuple: posterior probability}
+    out = {}
+    for side in combinations(range(n), evil_count):
+        if set(side) & set(known_good) or not set(known_evil) <= set(side):
+            continue
+        w = 1.0
+        for team, fails in history:
+            m = sum(team >> i & 1 for i in side)
+            w *= comb(m, fails) * p**fails * (1 - p)**(m - fails) if fails <= m else 0.0
+        out[side] = w
+    total = sum(out.values())
+    return {side: w / total for side, w in out.items()}
+
+
+def brute_p_evil(n, weights):
+    return [sum(w for side, w in weights.items() if i in side) for i in range(n)]
+
+
+@pytest.mark.parametrize("n, evil_count", [(5, 2), (7, 3), (10, 4)])
+def test_posterior_matches_brute_force(n, evil_count):
+    for seed in range(20):
+        _, history = random_history(n, evil_count, 4, seed)
+        post = EvilPosterior(n, evil_count)
+        for team, fails in history:
+            post.observe(team, fails)
+        assert post.observed == len(history)
+        assert post.p_evil() == pytest.approx(brute_p_evil(n, brute_weights(n, evil_count, history)))
+
+
+def test_auto_fail_says_nothing():
+    post = EvilPosterior(7, 3)
+    post.observe(0, 0)
+    assert post.observed == 0
+    assert post.p_evil() == pytest.approx([3 / 7] * 7)
+
+
+def test_restrict_matches_brute_force():
+    n, evil_count = 7, 3
+    _, history = random_history(n, evil_count, 3, 11)
+    post = EvilPosterior(n, evil_count)
+    for team, fails in history:
+        post.observe(team, fails)
+    post.restrict(known_good=0b1, known_evil=0b10)
+    weights = brute_weights(n, evil_count, history, known_good=[0], known_evil=[1])
+    assert post.p_evil() == pytest.approx(brute_p_evil(n, weights))
+
+
+def test_impossible_history_raises():
+    post = EvilPosterior(5, 2)
+    with pytest.raises(ValueError):
+        post.observe(0b111, 3)
+
+
+def brute_p_pass(weights, team, fails_needed):
+    # the mission passes when fewer Evil than fails_needed sit on it
+    return sum(w for side, w in weights.items() if sum(team >> i & 1 for i in side) < fails_needed)
+
+
+def posterior_of(n, evil_count, history):
+    post = EvilPosterior(n, evil_count)
+    for team, fails in history:
+        post.observe(team, fails)
+    return post
+
+
+def test_legal_proposals():
+    for n in STANDARD.player_counts:
+        for r in range(1, STANDARD.missions + 1):
+            k = STANDARD.team_size(n, r)
+            expected = {sum(1 << i for i in c) for c in combinations(range(n), k)}
+            assert sorted(legal_proposals(STANDARD, n, r)) == sorted(expected)
+
+
+@pytest.mark.parametrize("n, evil_count, fails_needed", [(5, 2, 1), (7, 3, 1), (7, 3, 2), (10, 4, 2), (10, 4, 3)])
+def test_score_teams_matches_brute_force(n, evil_count, fails_needed):
+    for seed in range(8):
+        _, history = random_history(n, evil_count, 3, seed)
+        post = posterior_of(n, evil_count, history)
+        weights = brute_weights(n, evil_count, history)
+        teams = [sum(1 << i for i in c) for k in (2, 3, 4) for c in combinations(range(n), k)]
+        assert score_teams(post, teams, fails_needed) == pytest.approx(
+            [brute_p_pass(weights, t, fails_needed) for t in teams])
+
+
+def test_best_teams_on_a_double_fail_round():
+    # mission 4 with 7 players needs two fails, so teams are scored with fails_needed=2
+    n, evil_count = 7, 3
+    _, history = random_history(n, evil_count, 3, 5)
+    post = posterior_of(n, evil_count, history)
+    weights = brute_weights(n, evil_count, history)
+    assert STANDARD.fails_needed(n)[3] == 2
+    picks = best_teams(post, STANDARD, 4, top=5)
+    scored = sorted((brute_p_pass(weights, t, 2) for t in legal_proposals(STANDARD, n, 4)), reverse=True)
+    assert [p for _, p in picks] == pytest.approx(scored[:5])
+    for t, p in picks:
+        assert p == pytest.approx(brute_p_pass(weights, t, 2))
+    # must_include keeps only the teams with those seats on them
+    assert all(t & 0b101 == 0b101 for t, _ in best_teams(post, STANDARD, 4, must_include=0b101))
+
+
+@pytest.mark.parametrize("n, evil_count, fails_needed", [(5, 2, 1), (7, 3, 1), (7, 3, 2), (10, 4, 2)])
+def test_p_pass_matches_brute_force(n, evil_count, fails_needed):
+    for seed in range(8):
+        _, history = random_history(n, evil_count, 3, seed)
+        post = posterior_of(n, evil_count, history)
+        weights = brute_weights(n, evil_count, history)
+        for c in combinations(range(n), 4):
+            team = sum(1 << i for i in c)
+            assert post.p_pass(team, fails_needed) == pytest.approx(brute_p_pass(weights, team, fails_needed))
+
+
+def brute_status(n, evil_count, history, assume_fail):
+    # consistent Evil sides, seats Evil on every one of them, seats Evil on at least one
+    def fits(side, team, fails):
+        m = sum(team >> i & 1 for i in side)
+        return m == fails if assume_fail else m >= fails
+    sides = [side for side in combinations(range(n), evil_count)
+             if all(fits(side, team, fails) for team, fails in history)]
+    evil = maybe = 0
+    if sides:
+        evil = (1 << n) - 1
+        for side in sides:
+            mask = sum(1 << i for i in side)
+            evil &= mask
+            maybe |= mask
+    return len(sides), evil, maybe
+
+
+def constraints_of(n, evil_count, history, assume_fail):
+    cons = EvilConstraints(n, evil_count, assume_fail)
+    for team, fails in history:
+        cons.observe(team, fails)
+    return cons
+
+
+@pytest.mark.parametrize("assume_fail", [False, True])
+@pytest.mark.parametrize("n, evil_count", [(5, 2), (7, 3), (8, 3), (10, 4)])
+def test_constraints_match_brute_force(n, evil_count, assume_fail):
+    # with assume_fail every Evil on a team fails it, so the histories are drawn that way
+    p = 1.0 if assume_fail else DEFAULT_FAIL_RATE
+    for seed in range(10):
+        _, history = random_history(n, evil_count, 4, seed, p)
+        cons = constraints_of(n, evil_count, history, assume_fail)
+        count, evil, maybe = brute_status(n, evil_count, history, assume_fail)
+        assert (cons.feasible.bit_count(), cons.evil, cons.maybe) == (count, evil, maybe)
+        assert cons.status() == ['Evil' if evil >> i & 1 else 'unknown' if maybe >> i & 1 else 'Good'
+                                 for i in range(n)]
+
+
+@pytest.mark.parametrize("assume_fail", [False, True])
+def test_constraints_double_fail_round(assume_fail):
+    # 7 players, mission 4 needs two fails: a double fail on four seats, then a clean pair
+    n, evil_count = 7, 3
+    history = [(0b0001111, 2), (0b0000011, 0)]
+    cons = constraints_of(n, evil_count, history, assume_fail)
+    count, evil, maybe = brute_status(n, evil_count, history, assume_fail)
+    assert (cons.feasible.bit_count(), cons.evil, cons.maybe) == (count, evil, maybe)
+    if assume_fail:
+        # the clean pair is Good, so both fails came from seats 2 and 3
+        assert cons.evil == 0b0001100
+    else:
+        # a pass proves nothing without assume_fail
+        assert cons.evil == 0
+
+
+def test_constraints_double_fail_on_a_pair():
+    cons = constraints_of(7, 3, [(0b0000011, 2)], False)
+    assert cons.evil == 0b0000011
+    assert cons.maybe == 0b1111111
+
+
+def test_constraints_contradiction():
+    with pytest.raises(ValueError):
+        constraints_of(5, 2, [(0b111, 3)], False)
+
+
+def test_auto_fails_are_not_observed():
+    # a mission failed by rejected proposals has team 0 and counts in neither model
+    history = [(0b00111, 1), (0, 1), (0b11000, 0)]
+    post = EvilPosterior(5, 2)
+    cons = EvilConstraints(5, 2)
+    for team, fails in history:
+        post.observe(team, fails)
+        cons.observe(team, fails)
+    assert post.observed == cons.observed == 2
+    assert (cons.feasible.bit_count(), cons.evil, cons.maybe) == brute_status(5, 2, [history[0], history[2]], False)
+
+
+def test_merlin_candidates_are_the_assassins_view():
+    # Oberon is hidden from the assassin, so they stay a candidate; the Evil they see do not
+    eng = AvalonEngine(list("ABCDEFG"), use_oberon=True)
+    eng.assign_roles([R_MERLIN, R_ASSASSIN, R_GOOD, R_PERCIVAL, R_OBERON, R_GOOD, R_EVIL], 0)
+    cands = [i for i, _ in merlin_scores(eng)]
+    assert cands == [0, 2, 3, 4, 5]
+    assert sum(p for _, p in merlin_scores(eng)) == pytest.approx(1.0)
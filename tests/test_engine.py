@@ -0,0 +1,127 @@
+import pytest
+
+from avalon_engine import AvalonEngine, ASSASSIN, EVIL_ROLES, MISSION, OVER, PROPOSAL, TEAM_VOTE
+
+# Rule tests through the engine's name-based moves.  Each game is dealt at random with
+# seat 0 leading first, and the tests read the deal back to build their teams.
+PLAYERS = ["A", "B", "C", "D", "E", "F", "G", "H", "I", "J"]
+SIZES = {5: [2, 3, 2, 3, 3], 6: [2, 3, 4, 3, 4], 7: [2, 3, 3, 4, 4], 8: [3, 4, 4, 5, 5], 9: [3, 4, 4, 5, 5],
+         10: [3, 4, 4, 5, 5]}
+
+
+def new_game(n=7, **toggles):
+    eng = AvalonEngine(PLAYERS[:n], **toggles)
+    eng.assign_roles(leader_index=0)
+    return eng
+
+
+def sides(eng):
+    # (Good players, Evil players) in seat order
+    good = [p for p in eng.original_players if eng.roles[p] not in EVIL_ROLES]
+    evil = [p for p in eng.original_players if eng.roles[p] in EVIL_ROLES]
+    return good, evil
+
+
+def play_mission(eng, team, card='Pass'):
+    # the team goes ahead and everyone on it plays `card`; returns (passed, fails)
+    eng.propose_team(team)
+    eng.team_approved()
+    assert eng.phase == MISSION
+    while eng.next_mission_voter() is not None:
+        eng.submit_mission_vote(card)
+    return eng.show_mission_result()
+
+
+def test_team_sizes():
+    for n, sizes in SIZES.items():
+        eng = new_game(n)
+        assert list(eng.mission_sizes) == sizes
+        assert eng.team_size() == sizes[0]
+    eng = new_game()
+    with pytest.raises(ValueError):
+        eng.propose_team(PLAYERS[:3])
+    with pytest.raises(ValueError):
+        eng.propose_team(["A", "A"])
+    assert eng.phase == PROPOSAL
+    eng.propose_team(["A", "B"])
+    assert eng.phase == TEAM_VOTE
+
+
+def test_leaders_rotate():
+    eng = new_game()
+    for leader in PLAYERS[:4]:
+        assert eng.current_leader == leader
+        eng.propose_team(PLAYERS[:2])
+        eng.team_rejected()
+
+
+def test_fifth_rejection_fails_the_mission():
+    eng = new_game()
+    for k in range(5):
+        assert eng.phase == PROPOSAL and eng.failed_proposals == k and eng.round_number == 1
+        eng.propose_team(PLAYERS[:2])
+        eng.team_rejected()
+    assert eng.mission_results == [False]
+    assert eng.past_missions[-1]['team'] == []
+    assert eng.round_number == 2 and eng.failed_proposals == 0 and eng.phase == PROPOSAL
+    # the rotation carries on past the five leaders who were rejected
+    assert eng.current_leader == "F"
+
+
+def test_good_fail_cards_do_not_count():
+    eng = new_game()
+    good, _ = sides(eng)
+    assert play_mission(eng, good[:2], 'Fail') == (True, 0)
+
+
+def test_one_fail_fails_a_mission():
+    eng = new_game()
+    good, evil = sides(eng)
+    assert play_mission(eng, [good[0], evil[0]], 'Fail') == (False, 1)
+    assert eng.mission_results == [False] and eng.round_number == 2
+
+
+@pytest.mark.parametrize("evil_on_team, passed", [(1, True), (2, False)])
+def test_two_fail_mission(evil_on_team, passed):
+    # mission 4 with 7 or more players needs two Fail cards
+    eng = new_game()
+    good, evil = sides(eng)
+    play_mission(eng, good[:2])
+    play_mission(eng, [good[0], evil[0], good[1]], 'Fail')
+    play_mission(eng, good[:3])
+    assert eng.round_number == 4 and eng.needs_double_fail()
+    team = evil[:evil_on_team] + good[:4 - evil_on_team]
+    assert play_mission(eng, team, 'Fail') == (passed, evil_on_team)
+    assert eng.phase == (ASSASSIN if passed else PROPOSAL)
+
+
+def test_evil_wins_three_missions():
+    eng = new_game()
+    good, evil = sides(eng)
+    for k in (2, 3, 3):
+        play_mission(eng, evil[:1] + good[:k - 1], 'Fail')
+    assert eng.phase == OVER and eng.winning_team == "Evil"
+
+
+@pytest.mark.parametrize("merlin_hit", [True, False])
+def test_assassin_phase(merlin_hit):
+    eng = new_game()
+    good, evil = sides(eng)
+    for k in (2, 3, 3):
+        play_mission(eng, good[:k])
+    assert eng.phase == ASSASSIN
+    assert eng.roles[eng.assassin()] == 'Assassin'
+    with pytest.raises(RuntimeError):
+        eng.propose_team(good[:4])
+    merlin = next(p for p in good if eng.roles[p] == 'Merlin')
+    target = merlin if merlin_hit else next(p for p in good if p != merlin)
+    assert eng.resolve_assassin(target) == merlin_hit
+    assert eng.phase == OVER and eng.winning_team == ("Evil" if merlin_hit else "Good")
+
+
+def test_no_assassin_without_merlin():
+    eng = new_game(use_merlin=False, use_percival=False)
+    good, _ = sides(eng)
+    for k in (2, 3, 3):
+        play_mission(eng, good[:k])
+    assert eng.phase == OVER and eng.winning_team == "Good"
@@ -0,0 +1,78 @@
+from avalon_archive import connect, game_record, load_log, save
+from avalon_engine import AvalonEngine, R_ASSASSIN, R_EVIL, R_GOOD, R_MERLIN, R_MORGANA, R_PERCIVAL
+from avalon_events import APPROVED, MISSION_RESULT, PROPOSAL, REJECTED, VOTE
+from avalon_stats import Stats, archive_games, game_from_engine
+
+PLAYERS = ["A", "B", "C", "D", "E", "F", "G"]
+DECK = [R_MERLIN, R_PERCIVAL, R_GOOD, R_GOOD, R_ASSASSIN, R_MORGANA, R_EVIL]
+ALL = 0b1111111
+
+
+def played(rounds=2):
+    # one rejected proposal, then `rounds` missions that pass
+    eng = AvalonEngine(PLAYERS, seed=4)
+    eng.assign_roles(list(DECK), leader_index=0)
+    eng.propose_mask(0b0000011)
+    eng.vote_team(0)
+    for team in (0b0000011, 0b0000111, 0b0000111)[:rounds]:
+        eng.propose_mask(team)
+        eng.vote_team(ALL)
+        eng.resolve_mission(0)
+    return eng
+
+
+def scan(log, kinds):
+    return [i for i, e in enumerate(log.events) if kinds is None or e.kind in kinds]
+
+
+def test_kind_index_matches_a_scan():
+    log = played().metadata
+    for kinds in (None, (PROPOSAL,), (PROPOSAL, VOTE, REJECTED, APPROVED), (MISSION_RESULT,), ()):
+        assert log.ids(kinds) == scan(log, kinds)
+        assert log.count(kinds) == len(scan(log, kinds))
+        assert log.ids(kinds, 10) == [i for i in scan(log, kinds) if i >= 10]
+    assert [e.team for e in log.of_kind(PROPOSAL)] == [0b0000011, 0b0000011, 0b0000111]
+    assert [e.kind for e in log.in_round(1)] == [e.kind for e in log.events if e.round_number == 1]
+
+
+def test_kind_index_follows_undo_and_redo():
+    eng = played(1)
+    log = eng.metadata
+    before = log.ids((PROPOSAL, MISSION_RESULT))
+    eng.checkpoint()
+    eng.propose_mask(0b0000111)
+    eng.vote_team(ALL)
+    eng.resolve_mission(0)
+    after = log.ids((PROPOSAL, MISSION_RESULT))
+    eng.undo()
+    assert log.ids((PROPOSAL, MISSION_RESULT)) == before
+    eng.redo()
+    assert log.ids((PROPOSAL, MISSION_RESULT)) == after == scan(log, (PROPOSAL, MISSION_RESULT))
+
+
+def test_log_rows_round_trip_through_the_archive(tmp_path):
+    eng = played()
+    eng.metadata.append("House rules tonight")
+    conn = connect(str(tmp_path / "games.db"))
+    save(conn, [game_record(eng)])
+    log = load_log(conn, 1)
+    assert log.rows() == eng.metadata.rows()
+    assert list(log) == list(eng.metadata)
+    assert log.ids((REJECTED,)) == eng.metadata.ids((REJECTED,))
+    # the stats read proposal counts off the same log, wherever the game comes from
+    live = game_from_engine(eng)
+    archived = next(archive_games(conn))
+    assert live['proposals'] == archived['proposals'] == {1: [2, 1], 2: [1, 1]}
+    stats = Stats().consume([archived])
+    assert stats.proposals == {(7, 1): [2, 1], (7, 2): [1, 1]}
+    assert "Proposed" in stats.report()
+
+
+def test_unlogged_games_have_no_proposal_counts(tmp_path):
+    eng = AvalonEngine(PLAYERS, log=False, seed=4)
+    eng.assign_roles(list(DECK), leader_index=0)
+    conn = connect(str(tmp_path / "games.db"))
+    save(conn, [game_record(eng)])
+    assert len(load_log(conn, 1)) == 0
+    assert next(archive_games(conn))['proposals'] is None
+    assert game_from_engine(eng)['proposals'] is None
@@ -0,0 +1,59 @@
+import pytest
+
+from avalon_journal import Journal
+
+HEADER = {'players': ["A", "B", "C", "D", "E"], 'toggles': [True, True, False, False], 'seed': 42}
+
+
+def test_resume_returns_the_actions(tmp_path):
+    path = str(tmp_path / "game.journal")
+    j = Journal.start(path, HEADER)
+    for code, arg in (('R', None), ('T', 3), ('W', 31), ('U', None)):
+        j.write(code, arg)
+    j.close()
+    journal, header, records = Journal.resume(path)
+    assert header['players'] == HEADER['players'] and header['seed'] == 42
+    assert records == [('R', None), ('T', 3), ('W', 31), ('U', None)]
+    # appends after what was there
+    journal.write('Y')
+    journal.close()
+    assert Journal.resume(path)[2][-1] == ('Y', None)
+
+
+def test_torn_last_line_is_cut(tmp_path):
+    path = str(tmp_path / "game.journal")
+    j = Journal.start(path, HEADER)
+    j.write('T', 3)
+    j.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("W 3")  # the crash came mid-write
+    journal, _, records = Journal.resume(path)
+    journal.close()
+    assert records == [('T', 3)]
+    with open(path, encoding='utf-8') as f:
+        assert f.read().endswith("T 3\n")
+
+
+def test_finished_or_missing_game_is_not_offered(tmp_path):
+    path = str(tmp_path / "game.journal")
+    assert Journal.resume(path) is None
+    j = Journal.start(path, HEADER)
+    j.write('R')
+    j.finish()
+    assert Journal.resume(path) is None
+
+
+def test_corrupt_record_raises(tmp_path):
+    # the GUI catches this and discards the journal
+    path = tmp_path / "game.journal"
+    Journal.start(str(path), HEADER).close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("T x\n")
+    with pytest.raises(ValueError):
+        Journal.resume(str(path))
+
+
+def test_non_object_header_is_not_offered(tmp_path):
+    path = tmp_path / "game.journal"
+    path.write_text("[1, 2]\nR\n", encoding='utf-8')
+    assert Journal.resume(str(path)) is None
@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+from avalon_engine import AvalonEngine, OVER, R_ASSASSIN, R_EVIL, R_GOOD, R_MERLIN, R_OBERON, R_PERCIVAL
+from avalon_players import PLAYERS, RandomPlayer, play_game
+from avalon_sim import simulate
+
+PLAYERS7 = ["A", "B", "C", "D", "E", "F", "G"]
+# seat 4 is Oberon, whom the assassin cannot tell from the Good seats
+DECK = [R_MERLIN, R_ASSASSIN, R_GOOD, R_PERCIVAL, R_OBERON, R_GOOD, R_EVIL]
+
+
+@pytest.mark.parametrize("policy", sorted(PLAYERS))
+def test_every_policy_finishes_a_game(policy):
+    eng = AvalonEngine(PLAYERS7, use_oberon=True, seed=11)
+    assert play_game(eng, [PLAYERS[policy]() for _ in PLAYERS7]) in ("Good", "Evil")
+    assert eng.phase == OVER
+
+
+def test_random_assassin_picks_from_their_own_view():
+    eng = AvalonEngine(PLAYERS7, use_oberon=True, seed=2)
+    eng.assign_roles(list(DECK), leader_index=0)
+    pl = RandomPlayer()
+    pl.start(eng, 1, eng.rng)
+    rng = random.Random(0)
+    assert {pl.assassinate(eng, rng) for _ in range(200)} == {0, 2, 3, 4, 5}
+
+
+def test_simulate_seats_the_shared_players():
+    # the simulator seats avalon_players policies, and a seeded run is reproducible
+    wins = simulate(7, (True, True, False, False), 0, 20, PLAYERS['random'], seed=5)
+    assert sum(wins) == 20
+    assert simulate(7, (True, True, False, False), 0, 20, PLAYERS['random'], seed=5) == wins
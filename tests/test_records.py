@@ -0,0 +1,72 @@
+import pytest
+
+from avalon_engine import AvalonEngine, R_ASSASSIN, R_EVIL, R_GOOD, R_MERLIN, R_MORGANA, R_PERCIVAL
+from avalon_records import HEADER, RECORD, RECORD_SIZE, RecordReader, RecordWriter, decode, pack
+
+PLAYERS = ["A", "B", "C", "D", "E", "F", "G"]
+DECK = [R_MERLIN, R_PERCIVAL, R_GOOD, R_GOOD, R_ASSASSIN, R_MORGANA, R_EVIL]
+ALL = 0b1111111
+
+
+def finished_game(kill):
+    # Good passes three missions after one rejected proposal, then the assassin shoots `kill`
+    eng = AvalonEngine(PLAYERS, seed=3)
+    eng.assign_roles(list(DECK), leader_index=0)
+    eng.propose_mask(0b0000011)
+    eng.vote_team(0)
+    for team, fail_votes in ((0b0000011, 0), (0b0010011, 0b0010000), (0b0000111, 0), (0b0001111, 0)):
+        eng.propose_mask(team)
+        eng.vote_team(ALL)
+        eng.resolve_mission(fail_votes)
+    eng.resolve_assassin(PLAYERS[kill])
+    return eng
+
+
+def test_pack_decode_round_trip():
+    eng = finished_game(kill=0)
+    game = decode(RECORD.unpack(pack(eng)))
+    assert game['players'] == 7
+    assert game['toggles'] == (True, True, False, False)
+    assert game['roles'] == [eng.roles[p] for p in PLAYERS]
+    assert game['missions'] == [{'leader': m.leader, 'team': m.team, 'fails': m.fails, 'pass': m.passed}
+                                for m in eng.missions]
+    assert game['winner'] == "Evil" and game['assassinated'] == 0
+    assert game['rejected'] == 1
+    assert decode(RECORD.unpack(pack(finished_game(kill=2))))['winner'] == "Good"
+
+
+def test_writer_trims_a_torn_record(tmp_path):
+    path = str(tmp_path / "games.avr")
+    with RecordWriter(path) as w:
+        w.add(finished_game(0))
+        w.add(finished_game(2))
+    with open(path, 'ab') as f:
+        f.write(pack(finished_game(0))[:10])  # the crash came mid-record
+    with RecordReader(path) as r:
+        assert len(r) == 2
+    with RecordWriter(path) as w:
+        w.add(finished_game(2))
+    assert (tmp_path / "games.avr").stat().st_size == HEADER.size + 3 * RECORD_SIZE
+    with RecordReader(path) as r:
+        assert [decode(row)['winner'] for row in r] == ["Evil", "Good", "Good"]
+
+
+def test_bad_header_raises(tmp_path):
+    path = tmp_path / "games.avr"
+    path.write_bytes(b'NOPE' + bytes(HEADER.size - 4))
+    with pytest.raises(ValueError):
+        RecordWriter(str(path))
+    with pytest.raises(ValueError):
+        RecordReader(str(path))
+
+
+@pytest.mark.parametrize("data", [b'AV', b'AVR1' + bytes(3)])
+def test_short_header_raises(tmp_path, data):
+    # shorter than the header: a ValueError, not struct.error
+    path = tmp_path / "games.avr"
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        RecordWriter(str(path))
+    with pytest.raises(ValueError):
+        RecordReader(str(path))
+    assert path.read_bytes() == data  # left as it was
@@ -0,0 +1,74 @@
+import json
+import pickle
+
+import pytest
+
+from avalon_engine import AvalonEngine, OVER, setup_error
+from avalon_rules import MAX_PLAYERS, RuleSet, STANDARD, STANDARD_DOUBLE_FAIL_ROUNDS, STANDARD_EVIL_COUNTS, STANDARD_MISSION_SIZES
+
+# A small house-rule table: 4 or 5 players, three missions, two rejections allowed.
+HOUSE = {'evil_counts': {4: 1, 5: 2}, 'mission_sizes': {4: [2, 2, 3], 5: [2, 3, 3]},
+         'double_fail_rounds': {5: [3]}, 'max_failed_proposals': 2, 'name': "house"}
+
+
+def test_standard_tables():
+    assert STANDARD.player_counts == tuple(range(5, 11))
+    for n in STANDARD.player_counts:
+        assert STANDARD.evil(n) == STANDARD_EVIL_COUNTS[n]
+        assert STANDARD.good(n) == n - STANDARD_EVIL_COUNTS[n]
+        assert list(STANDARD.sizes(n)) == STANDARD_MISSION_SIZES[n]
+        assert STANDARD.team_size(n, 2) == STANDARD_MISSION_SIZES[n][1]
+        assert STANDARD.double_fail(n) == tuple(STANDARD_DOUBLE_FAIL_ROUNDS.get(n, ()))
+    assert STANDARD.fails_needed(7) == (1, 1, 1, 2, 1)
+    assert STANDARD.fails_needed(6) == (1, 1, 1, 1, 1)
+    assert (STANDARD.missions, STANDARD.wins_needed, STANDARD.max_failed_proposals) == (5, 3, 5)
+    assert not STANDARD.supports(4) and not STANDARD.supports(11)
+
+
+def test_rule_sets_are_immutable():
+    with pytest.raises(AttributeError):
+        STANDARD.max_failed_proposals = 3
+
+
+def test_round_trips():
+    rules = RuleSet.from_dict(HOUSE)
+    assert RuleSet.from_dict(json.loads(json.dumps(rules.to_dict()))).to_dict() == rules.to_dict()
+    assert pickle.loads(pickle.dumps(rules)).to_dict() == rules.to_dict()
+    assert rules.to_dict() == HOUSE
+
+
+@pytest.mark.parametrize("change", [
+    {'mission_sizes': {4: [2, 2, 3]}},            # tables cover different player counts
+    {'evil_counts': {1: 0}, 'mission_sizes': {1: [1, 1, 1]}},
+    {'mission_sizes': {4: [2, 2], 5: [2, 3]}},    # an even number of missions
+    {'evil_counts': {4: 4, 5: 2}},                # nobody Good
+    {'mission_sizes': {4: [2, 2, 5], 5: [2, 3, 3]}},
+    {'double_fail_rounds': {5: [4]}},
+    {'max_failed_proposals': 0},
+    {'evil_counts': {4: 1, 17: 5}, 'mission_sizes': {4: [2, 2, 3], 17: [5, 6, 6]}},  # past MAX_PLAYERS
+])
+def test_bad_tables_are_rejected(change):
+    with pytest.raises(ValueError):
+        RuleSet.from_dict(dict(HOUSE, **change))
+
+
+def test_engine_plays_house_rules():
+    rules = RuleSet.from_dict(HOUSE)
+    assert setup_error(["A", "B", "C"], rules=rules) is not None
+    assert setup_error(["A", "B", "C", "D"], False, False, rules=rules) is None
+    eng = AvalonEngine(["A", "B", "C", "D", "E"], False, False, rules=rules)
+    eng.assign_roles(leader_index=0)
+    assert eng.team_size() == 2
+    # two rejections fail a mission, and two failed missions lose the game
+    for _ in range(2 * rules.max_failed_proposals):
+        eng.propose_team(eng.original_players[:eng.team_size()])
+        eng.team_rejected()
+    assert eng.phase == OVER and eng.winning_team == "Evil"
+    assert eng.mission_results == [False, False]
+
+
+def test_largest_table_is_accepted():
+    n = MAX_PLAYERS
+    rules = RuleSet.from_dict(dict(HOUSE, evil_counts={4: 1, n: 5}, mission_sizes={4: [2, 2, 3], n: [5, 6, 6]},
+                                   double_fail_rounds={}))
+    assert rules.supports(n) and not rules.supports(n + 1)
@@ -0,0 +1,158 @@
+import asyncio
+import json
+from collections import deque
+
+from avalon_client import Client, play_local
+from avalon_server import GameServer, Table, encode
+
+
+def test_loopback_game():
+    final = asyncio.run(play_local(7, seed=3))
+    assert final['phase'] == 'over' and final['winner'] in ("Good", "Evil")
+    assert len(final['roles']) == 7
+    # the same seeds deal and play the same game
+    assert asyncio.run(play_local(7, seed=3))['roles'] == final['roles']
+
+
+
+def test_seat_needs_its_token():
+    # once the game has started, only the device holding the seat's token gets it back
+    async def run():
+        server = await GameServer('127.0.0.1', 0).start()
+        try:
+            seats = [await Client.connect('127.0.0.1', server.port, f"P{i}", "t") for i in range(5)]
+            assert all(c.token for c in seats)
+            await seats[0].send(op='start')
+            while (await seats[1].recv())['type'] != 'role':
+                pass
+            await seats[1].close()
+            thief = await Client.connect('127.0.0.1', server.port, "P1", "t")
+            assert thief.held == {'type': 'error', 'message': "That seat is taken."}
+            back = await Client.connect('127.0.0.1', server.port, "P1", "t", token=seats[1].token)
+            assert back.held['type'] == 'role'
+        finally:
+            await server.close()
+
+    asyncio.run(run())
+
+
+def test_join_needs_a_name():
+    # a missing, empty or non-string name is refused, not seated as "None" or "5"
+    async def run():
+        server = await GameServer('127.0.0.1', 0).start()
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            for join in ({'op': 'join', 'room': "t"}, {'op': 'join', 'room': "t", 'name': ""},
+                         {'op': 'join', 'room': "t", 'name': None}, {'op': 'join', 'room': "t", 'name': 5}):
+                writer.write(encode(join))
+                assert json.loads(await reader.readline()) == {'type': 'error', 'message': "Bad name."}
+            assert "t" not in server.rooms
+            writer.write(encode({'op': 'join', 'room': "t", 'name': "Alice"}))
+            assert json.loads(await reader.readline())['type'] == 'seat'
+            writer.close()
+        finally:
+            await server.close()
+
+    asyncio.run(run())
+
+def test_abandoned_room_is_reclaimed():
+    # a game left mid-way keeps its room for `grace` seconds, and a rejoin keeps it for good
+    async def run():
+        server = await GameServer('127.0.0.1', 0, grace=0.1).start()
+        try:
+            rooms = {}
+            for room in ("left", "back"):
+                seats = [await Client.connect('127.0.0.1', server.port, f"P{i}", room) for i in range(5)]
+                await seats[0].send(op='start')
+                while (await seats[0].recv())['type'] != 'role':
+                    pass
+                for c in seats:
+                    await c.close()
+                rooms[room] = seats
+            back = await Client.connect('127.0.0.1', server.port, "P0", "back", token=rooms["back"][0].token)
+            assert back.held['type'] == 'role'
+            await asyncio.sleep(0.3)
+            assert "left" not in server.rooms and "back" in server.rooms
+            await back.close()
+        finally:
+            await server.close()
+
+    asyncio.run(run())
+
+
+# ---------- DELTAS ----------
+class Wire:
+    # stands in for a device's StreamWriter and keeps what was sent to it
+    def __init__(self):
+        self.msgs = []
+
+    def write(self, data):
+        self.msgs.append(json.loads(data))
+
+
+def apply(state, msgs):
+    # what Client.recv does with a state or delta stream
+    for msg in msgs:
+        if msg['type'] == 'state':
+            state = dict(msg)
+        elif msg['type'] == 'delta':
+            assert msg['seq'] == state['seq'] + 1
+            for k, v in msg.items():
+                if k in ('log', 'missions'):
+                    state[k] = state[k] + v
+                elif k != 'type':
+                    state[k] = v
+    return state
+
+
+def new_table(n=5):
+    table = Table()
+    for i in range(n):
+        assert table.join(f"P{i}", Wire()) is None
+    assert table.handle("P0", {'op': 'start'}) is None
+    return table
+
+
+def play_round(table):
+    # the leader proposes the first seats and everyone approves, one vote at a time
+    s = json.loads(table.full())
+    assert table.handle(s['leader'], {'op': 'propose', 'team': s['players'][:s['team_size']]}) is None
+    for p in s['players']:
+        assert table.handle(p, {'op': 'vote', 'approve': True}) is None
+
+
+def test_spectator_follows_the_deltas():
+    table = new_table()
+    watcher = Wire()
+    table.watch(watcher)
+    play_round(table)
+    kinds = [m['type'] for m in watcher.msgs]
+    assert kinds[0] == 'state' and set(kinds[1:]) == {'delta'}
+    assert apply(None, watcher.msgs) == json.loads(table.full())
+
+
+def test_sync_sends_only_the_missed_deltas():
+    table = new_table()
+    seen = json.loads(table.full())
+    play_round(table)
+    missed = table.seq - seen['seq']
+    device = Wire()
+    assert table.sync(device, seen['seq']) is None
+    assert [m['type'] for m in device.msgs] == ['delta'] * missed
+    assert apply(seen, device.msgs) == json.loads(table.full())
+    # a device already up to date gets nothing
+    device = Wire()
+    table.sync(device, table.seq)
+    assert device.msgs == []
+
+
+def test_sync_too_far_behind_gets_the_full_state():
+    table = new_table()
+    table.history = deque(maxlen=2)
+    seen = json.loads(table.full())
+    play_round(table)
+    assert table.seq - seen['seq'] > 2
+    device = Wire()
+    table.sync(device, seen['seq'])
+    assert device.msgs == [json.loads(table.full())]
+    assert device.msgs[0]['type'] == 'state'
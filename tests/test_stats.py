@@ -0,0 +1,36 @@
+from avalon_engine import EVIL_ROLES, AvalonEngine
+from avalon_players import PLAYERS, play_game
+from avalon_records import RecordWriter
+from avalon_stats import Stats, engine_games, record_games
+
+
+def games(count=30, n=7):
+    names = [f"P{i}" for i in range(n)]
+    out = []
+    for seed in range(count):
+        eng = AvalonEngine(names, use_oberon=True, seed=seed)
+        play_game(eng, [PLAYERS['random']() for _ in names])
+        out.append(eng)
+    return out
+
+
+def test_role_wins_follow_the_engine_sides():
+    engines = games()
+    stats = Stats().consume(engine_games(engines))
+    evil_won = sum(e.winning_team == "Evil" for e in engines)
+    for role, (seats, wins) in stats.roles.items():
+        per_game = seats // len(engines)
+        assert wins == per_game * (evil_won if role in EVIL_ROLES else len(engines) - evil_won)
+    assert stats.roles['Oberon'][1] == evil_won
+
+
+def test_record_file_gives_the_same_stats(tmp_path):
+    engines = games()
+    path = str(tmp_path / "games.avr")
+    with RecordWriter(path) as w:
+        for eng in engines:
+            w.add(eng)
+    live = Stats().consume(engine_games(engines))
+    stored = Stats().consume(record_games(path))
+    for field in ('games', 'roles', 'seats', 'configs', 'missions'):
+        assert getattr(stored, field) == getattr(live, field)
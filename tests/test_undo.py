@@ -0,0 +1,94 @@
+import pytest
+
+from avalon_engine import AvalonEngine, PROPOSAL, R_ASSASSIN, R_EVIL, R_GOOD, R_MERLIN, R_MORGANA, R_PERCIVAL
+
+PLAYERS = ["A", "B", "C", "D", "E", "F", "G"]
+DECK = [R_MERLIN, R_PERCIVAL, R_GOOD, R_GOOD, R_ASSASSIN, R_MORGANA, R_EVIL]
+ALL = 0b1111111
+
+
+def new_game():
+    eng = AvalonEngine(PLAYERS, seed=1)
+    eng.assign_roles(list(DECK), leader_index=0)
+    return eng
+
+
+def first(k):
+    return (1 << k) - 1
+
+
+def state(eng):
+    return (eng.phase, eng.round_number, eng.failed_proposals, eng.leader, eng.team, eng.good_wins, eng.evil_wins,
+            eng.winning_team, [(p.team, p.approved, p.votes) for p in eng.proposals],
+            [(m.team, m.fails, m.passed) for m in eng.missions], list(eng.metadata))
+
+
+def test_undo_redo_round_trip():
+    eng = AvalonEngine(PLAYERS, seed=7)
+    steps = [
+        eng.assign_roles,
+        lambda: eng.propose_mask(first(2)),
+        lambda: eng.vote_team(0),
+        lambda: eng.propose_mask(0b0000110),
+        lambda: eng.vote_team(ALL),
+        lambda: eng.submit_mission_vote('Pass'),
+        lambda: eng.submit_mission_vote('Fail'),
+        eng.show_mission_result,
+        lambda: eng.propose_mask(first(3)),
+        lambda: eng.vote_team(ALL),
+    ]
+    seen = []
+    for i, step in enumerate(steps):
+        seen.append(state(eng))
+        eng.checkpoint(i)
+        step()
+    end = state(eng)
+    for i in reversed(range(len(steps))):
+        assert eng.undo('back') == i
+        assert state(eng) == seen[i]
+    assert eng.phase is None and not eng.undo_stack
+    for i in range(len(steps)):
+        assert eng.redo() == 'back'
+    assert state(eng) == end
+    # undoing the deal and dealing again gives the same seats, since the rng is restored
+    roles = eng.role_of
+    while eng.undo_stack:
+        eng.undo()
+    eng.assign_roles()
+    assert eng.role_of == roles
+    assert eng.phase == PROPOSAL
+
+
+def test_new_action_drops_redo():
+    eng = new_game()
+    eng.checkpoint()
+    eng.propose_mask(first(2))
+    eng.undo()
+    eng.checkpoint()
+    eng.propose_mask(0b0000110)
+    assert not eng.redo_stack
+    with pytest.raises(RuntimeError):
+        eng.redo()
+    assert eng.proposals[-1].team == 0b0000110
+
+
+def test_fold_skips_the_mission_cards():
+    eng = new_game()
+    eng.checkpoint('proposal')
+    eng.propose_mask(first(2))
+    eng.checkpoint('team_vote')
+    eng.vote_team(ALL)
+    for card in ('Pass', 'Fail'):
+        eng.checkpoint('card')
+        eng.submit_mission_vote(card)
+    eng.checkpoint('reveal')
+    eng.show_mission_result()
+    eng.fold(3)
+    # one step back is the mission before any card was played
+    assert eng.undo() == 'card'
+    assert eng.votes_in == 0 and eng.fail_votes == 0 and not eng.missions
+    assert eng.undo() == 'team_vote'
+    assert eng.undo() == 'proposal' and not eng.undo_stack
+    for _ in range(3):
+        eng.redo()
+    assert [(m.team, m.passed) for m in eng.missions] == [(first(2), True)]
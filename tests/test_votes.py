@@ -0,0 +1,70 @@
+import asyncio
+
+from avalon_votes import VoteRound
+
+VOTERS = 0b10110  # players 1, 2 and 4
+
+
+def test_closes_early_once_everyone_voted():
+    closed = []
+    vote = VoteRound(VOTERS, on_close=closed.append)
+    assert vote.remaining() is None
+    assert vote.cast(4, True)
+    assert vote.cast(1, False)
+    assert not vote.closed and vote.waiting() == 0b00100 and not closed
+    assert vote.cast(2, True)
+    assert vote.closed and closed == [vote]
+    assert vote.yes == 0b10100 and vote.late == 0
+
+
+def test_only_due_votes_count():
+    vote = VoteRound(VOTERS)
+    assert vote.cast(1, True)
+    assert not vote.cast(1, False)  # a second vote is ignored
+    assert not vote.cast(0, True)  # not a voter
+    assert vote.yes == 0b00010 and vote.voted == 0b00010
+
+
+def run_to_deadline(default):
+    # one vote in on time, then the deadline passes with players 2 and 4 silent
+    async def main():
+        done = asyncio.get_running_loop().create_future()
+        vote = VoteRound(VOTERS, default, timeout=0.05, on_close=done.set_result)
+        assert 0 < vote.remaining() <= 0.05
+        vote.cast(1, False)
+        return await asyncio.wait_for(done, 2)
+    return asyncio.run(main())
+
+
+def test_deadline_gives_the_default_vote():
+    vote = run_to_deadline(default=False)
+    assert vote.closed and vote.late == 0b10100 and vote.yes == 0
+    assert vote.remaining() == 0.0
+    # with default=True the silent players are counted as yes
+    vote = run_to_deadline(default=True)
+    assert vote.late == 0b10100 and vote.yes == 0b10100
+
+
+def test_early_close_cancels_the_deadline():
+    async def main():
+        closed = []
+        vote = VoteRound(VOTERS, timeout=0.05, on_close=closed.append)
+        for i in (1, 2, 4):
+            vote.cast(i, True)
+        await asyncio.sleep(0.1)
+        return vote, closed
+    vote, closed = asyncio.run(main())
+    assert len(closed) == 1 and vote.late == 0 and vote.yes == VOTERS
+
+
+def test_cancelled_round_never_closes():
+    async def main():
+        closed = []
+        vote = VoteRound(VOTERS, timeout=0.02, on_close=closed.append)
+        vote.cancel()
+        await asyncio.sleep(0.05)
+        vote.cast(1, True)
+        vote.cast(2, True)
+        vote.cast(4, True)
+        return closed
+    assert asyncio.run(main()) == []